@@ -1,19 +1,24 @@
+import os
+import sys
 import cv2
 import numpy as np
 from pyapriltags import Detector
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'opencv', 'balltrack'))
+from frame_source import FrameSource
+from preview import PreviewRenderer
+from virtual_camera import step_key
+
 # ---------- カメラ設定 ----------
 DEVICE = 0  # 接続されているカメラ番号
-cap = cv2.VideoCapture(DEVICE)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = FrameSource(DEVICE, width=1280, height=720, pacing=PACING).start()
 
 # ---------- AprilTag検出器 ----------
 detector = Detector(families='tag36h11')
 
-# ---------- ウィンドウ設定 ----------
-cv2.namedWindow('AprilTag Detection', cv2.WINDOW_NORMAL)
-
 # ---------- キャリブレーション結果 ----------
 camera_matrix = np.array([
     [1194.08741, 0.0, 602.932566],
@@ -28,25 +33,28 @@ cx, cy = camera_matrix[0, 2], camera_matrix[1, 2]
 # ---------- タグサイズ ----------
 tag_size = 0.06  # m
 
-# ---------- 実行ループ ----------
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("カメラから映像を取得できません")
-        break
+# ---------- 表示設定 ----------
+# "window": 毎フレーム表示 / "preview": 別スレッドで間引き表示 / "none": 表示なし
+DISPLAY_MODE = "window"
+PREVIEW_RATE = 5.0  # preview モードの表示レート [Hz]
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    tags = detector.detect(gray)
+obj_points = np.array([[-tag_size/2, -tag_size/2, 0],
+                       [ tag_size/2, -tag_size/2, 0],
+                       [ tag_size/2,  tag_size/2, 0],
+                       [-tag_size/2,  tag_size/2, 0]], dtype=np.float32)
 
-    for tag in tags:
-        corners = np.array(tag.corners, dtype=np.int32)
 
-        # --- タグ面を半透明で塗る ---
+# 検出結果の描画（preview モードでは表示スレッドで呼ばれる）
+# result: [(corners, center, tag_id, (yaw, pitch, roll) または None), ...]
+def draw(frame, result):
+    if result:
+        # --- タグ面を半透明で塗る（全タグまとめて1回） ---
         overlay = frame.copy()
-        cv2.fillPoly(overlay, [corners], (0, 255, 0))  # 緑で塗り
+        cv2.fillPoly(overlay, [corners for corners, _, _, _ in result], (0, 255, 0))  # 緑で塗り
         alpha = 0.3
         cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
 
+    for corners, center, tag_id, ypr in result:
         # --- タグ外枠 ---
         cv2.polylines(frame, [corners], True, (0,255,0), 2)
 
@@ -62,40 +70,57 @@ while True:
             cv2.line(frame, pt1, pt2, (255,0,0), 1)
 
         # --- 中心描画 ---
-        center = tuple(map(int, tag.center))
         cv2.circle(frame, center, 5, (0,0,255), -1)
-        cv2.putText(frame, f"ID:{tag.tag_id}", (center[0]+10, center[1]),
+        cv2.putText(frame, f"ID:{tag_id}", (center[0]+10, center[1]),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
 
+        if ypr is not None:
+            yaw, pitch, roll = ypr
+            cv2.putText(frame, f"Yaw:{yaw:.1f}", (10,30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,0,0), 2)
+            cv2.putText(frame, f"Pitch:{pitch:.1f}", (10,60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,0,0), 2)
+            cv2.putText(frame, f"Roll:{roll:.1f}", (10,90),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,0,0), 2)
+
+    return {'AprilTag Detection': frame}
+
+
+display = PreviewRenderer(draw, mode=DISPLAY_MODE, rate=PREVIEW_RATE, window_flags=cv2.WINDOW_NORMAL,
+                          on_key=lambda key: step_key(cap, key))
+
+# ---------- 実行ループ ----------
+while True:
+    ret, frame = cap.read()
+    if not ret:
+        print("カメラから映像を取得できません")
+        break
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    tags = detector.detect(gray)
+
+    result = []
+    for tag in tags:
+        corners = np.array(tag.corners, dtype=np.int32)
+        center = tuple(map(int, tag.center))
+
         # --- 姿勢推定 ---
-        obj_points = np.array([[-tag_size/2, -tag_size/2, 0],
-                               [ tag_size/2, -tag_size/2, 0],
-                               [ tag_size/2,  tag_size/2, 0],
-                               [-tag_size/2,  tag_size/2, 0]], dtype=np.float32)
         img_points = np.array(tag.corners, dtype=np.float32)
         ret_pnp, rvec, tvec = cv2.solvePnP(obj_points, img_points,
                                            camera_matrix, dist_coeffs)
+        ypr = None
         if ret_pnp:
             R, _ = cv2.Rodrigues(rvec)
             sy = np.sqrt(R[0,0]**2 + R[1,0]**2)
             yaw   = np.arctan2(R[2,1], R[2,2]) * 180/np.pi
             pitch = np.arctan2(-R[2,0], sy) * 180/np.pi
             roll  = np.arctan2(R[1,0], R[0,0]) * 180/np.pi
+            ypr = (yaw, pitch, roll)
+        result.append((corners, center, tag.tag_id, ypr))
 
-            cv2.putText(frame, f"Yaw:{yaw:.1f}", (10,30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,0,0), 2)
-            cv2.putText(frame, f"Pitch:{pitch:.1f}", (10,60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,0,0), 2)
-            cv2.putText(frame, f"Roll:{roll:.1f}", (10,90),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,0,0), 2)
-
-    # --- ウィンドウ表示 ---
-    cv2.imshow('AprilTag Detection', frame)
-
-    # Escキーで終了
-    if cv2.waitKey(1) & 0xFF == 27:
+    # --- ウィンドウ表示（Escキー、表示なしのときは Ctrl+C で終了） ---
+    if not display.show(frame, result):
         break
 
 cap.release()
-cv2.destroyAllWindows()
-
+display.close()
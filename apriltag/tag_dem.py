@@ -1,14 +1,45 @@
+import os
+import sys
 import cv2
 from pyapriltags import Detector
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'opencv', 'balltrack'))
+from frame_source import FrameSource
+from preview import PreviewRenderer
+from virtual_camera import step_key
+
 # カメラ起動
-cap = cv2.VideoCapture(4)
+DEVICE = 4
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = FrameSource(DEVICE, pacing=PACING).start()
 
 # Apriltag ディテクタ作成
 detector = Detector(families='tag36h11')  # familes でタグタイプ指定可能
 
-# ウィンドウをリサイズ可能にする
-cv2.namedWindow('AprilTag Detection', cv2.WINDOW_NORMAL)
+# ---------- 表示設定 ----------
+# "window": 毎フレーム表示 / "preview": 別スレッドで間引き表示 / "none": 表示なし
+DISPLAY_MODE = "window"
+PREVIEW_RATE = 5.0  # preview モードの表示レート [Hz]
+
+
+# 検出結果の描画（preview モードでは表示スレッドで呼ばれる）
+# result: [(corners, center, tag_id), ...]
+def draw(frame, result):
+    for corners, center, tag_id in result:
+        for i in range(4):
+            pt1 = tuple(map(int, corners[i]))
+            pt2 = tuple(map(int, corners[(i + 1) % 4]))
+            cv2.line(frame, pt1, pt2, (0, 255, 0), 2)
+        cv2.putText(frame, str(tag_id), center,
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+    return {'AprilTag Detection': frame}
+
+
+# ウィンドウはリサイズ可能にする
+display = PreviewRenderer(draw, mode=DISPLAY_MODE, rate=PREVIEW_RATE, window_flags=cv2.WINDOW_NORMAL,
+                          on_key=lambda key: step_key(cap, key))
 
 while True:
     ret, frame = cap.read()
@@ -25,21 +56,11 @@ while True:
             print(f"[Tag ID: {tag.tag_id}] Center: {tag.center}")
             print(f"Corners: {tag.corners}")
 
-    # 検出結果を描画
-    for tag in tags:
-        corners = tag.corners
-        for i in range(4):
-            pt1 = tuple(map(int, corners[i]))
-            pt2 = tuple(map(int, corners[(i + 1) % 4]))
-            cv2.line(frame, pt1, pt2, (0, 255, 0), 2)
-        center = tuple(map(int, tag.center))
-        cv2.putText(frame, str(tag.tag_id), center,
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-
-    cv2.imshow('AprilTag Detection', frame)
-    if cv2.waitKey(1) & 0xFF == 27:  # Escキーで終了
+    # 検出結果を描画（Escキー、表示なしのときは Ctrl+C で終了）
+    result = [(tag.corners, tuple(map(int, tag.center)), tag.tag_id) for tag in tags]
+    if not display.show(frame, result):
         break
 
 cap.release()
-cv2.destroyAllWindows()
+display.close()
 
@@ -1,14 +1,37 @@
+import os
+import sys
 import cv2
 from pyapriltags import Detector
 import numpy as np
+from time import perf_counter_ns
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'opencv', 'balltrack'))
+from frame_source import FrameSource
+from preview import PreviewRenderer
+from quality import TAG_LEVELS, QualityController
+from stage_timer import StageTimer
+from undistort_map import get_undistort_map
+from virtual_camera import step_key
+from yuyv import as_yuyv, y_plane
 
 # ---------- カメラ設定 ----------
 DEVICE = 0
-cap = cv2.VideoCapture(DEVICE)
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+# 取得形式（"bgr": 従来どおり BGR → グレー変換 / "yuyv": カメラの YUYV の輝度をそのまま検出に使う）
+CAPTURE_FORMAT = "bgr"
+if CAPTURE_FORMAT == "yuyv":
+    cap = FrameSource(DEVICE, fourcc="YUYV", convert_rgb=False, pacing=PACING)
+else:
+    cap = FrameSource(DEVICE, pacing=PACING)
 
 if not cap.isOpened():
     print(f"カメラ {DEVICE} を開けません")
     exit()
+# 幅は取り込みスレッドを動かす前に聞く（スレッドと同時に cap.cap を触らない）
+frame_width = int(cap.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+cap.start()
 
 # ---------- 最新キャリブレーション結果 ----------
 camera_matrix = np.array([
@@ -22,70 +45,153 @@ fx, fy = camera_matrix[0, 0], camera_matrix[1, 1]
 cx, cy = camera_matrix[0, 2], camera_matrix[1, 2]
 camera_params = (fx, fy, cx, cy)
 
+# 歪み補正モード
+# "frame"  : フレーム全体を補正してから検出
+# "points" : 生フレームで検出し、タグの4隅のみ補正して姿勢推定
+UNDISTORT_MODE = "frame"
+
 # ---------- Apriltag 設定 ----------
 tag_size = 0.06  # [m]
+# タグ座標系の4隅（pyapriltags の tag.corners と同じ順: (-1,+1), (+1,+1), (+1,-1), (-1,-1)）
+tag_obj_points = np.array([[-tag_size/2,  tag_size/2, 0],
+                           [ tag_size/2,  tag_size/2, 0],
+                           [ tag_size/2, -tag_size/2, 0],
+                           [-tag_size/2, -tag_size/2, 0]], dtype=np.float32)
 detector = Detector(families='tag36h11')
 
-cv2.namedWindow('AprilTag Detection', cv2.WINDOW_NORMAL)
+# 目標処理時間 [ms]。指定すると処理が間に合わないときにタグ検出の quad_decimate を段階的に上げ、
+# 余裕が戻ったら元に戻す
+QUALITY_TARGET_MS = None  # 例: 33.0
+quality = QualityController(QUALITY_TARGET_MS, levels=TAG_LEVELS) if QUALITY_TARGET_MS is not None else None
+if quality is not None:
+    quality.apply(tag_detector=detector)
 
 # タグ描画色（共通）
 tag_color = (0, 255, 0)  # 緑
 
+# 表示モード（"window": 毎フレーム表示 / "preview": 別スレッドで間引き表示 / "none": 表示なし）
+DISPLAY_MODE = "window"
+PREVIEW_RATE = 5.0  # preview モードの表示レート [Hz]
+
+
+# 検出結果の描画（preview モードでは表示スレッドで呼ばれる）
+# result: {"tags": [(タグの4隅, 中心, 平均距離 [m] または None), ...], "quality": 品質設定}
+def draw(frame, result):
+    if frame.ndim == 2:  # yuyv のときは輝度だけを表示する
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    if result["quality"] is not None:
+        cv2.putText(frame, f"Q{result['quality']['level']} decimate {result['quality']['decimate']}",
+                    (10, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    for corners, center, z_avg in result["tags"]:
+        # 画面に距離を描画
+        if z_avg is not None:
+            cv2.putText(frame, f"{z_avg:.2f} m",
+                        (center[0]+10, center[1]-10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, tag_color, 2)
+
+        # タグ枠を描画（共通色）
+        for i in range(4):
+            pt1 = tuple(map(int, corners[i]))
+            pt2 = tuple(map(int, corners[(i + 1) % 4]))
+            cv2.line(frame, pt1, pt2, tag_color, 2)
+    return {'AprilTag Detection': frame}
+
+
+display = PreviewRenderer(draw, mode=DISPLAY_MODE, rate=PREVIEW_RATE, window_flags=cv2.WINDOW_NORMAL,
+                          on_key=lambda key: step_key(cap, key))
+
 # 複数フレームで平均化するためのリスト
 distance_list = []
 
 # 距離補正係数（実測距離 / 推定距離）
 correction_factor = 0.6667
 
+# 処理段ごとの所要時間（LATENCY_REPORT 秒ごとに p50/p95/p99/最大を表示、終了時に LATENCY_DUMP へ保存）
+LATENCY_REPORT = 5.0   # None なら表示しない
+LATENCY_DUMP = None    # 例: "latency.json"
+timer = StageTimer(report_interval=LATENCY_REPORT)
+
+undistorter = None
+frame_undistorted = None
+
 while True:
-    ret, frame = cap.read()
+    frame_t0 = perf_counter_ns()
+    with timer.span("capture"):
+        ret, frame = cap.read()
     if not ret:
         print("カメラから映像を取得できません")
         break
 
+    process_t0 = perf_counter_ns()
+    if CAPTURE_FORMAT == "yuyv":
+        frame = y_plane(as_yuyv(frame, frame_width))  # BGR・グレー変換なし
+
     # ---------- 歪み補正 ----------
-    frame_undistorted = cv2.undistort(frame, camera_matrix, dist_coeffs)
-    gray = cv2.cvtColor(frame_undistorted, cv2.COLOR_BGR2GRAY)
+    if undistorter is None:
+        h, w = frame.shape[:2]
+        undistorter = get_undistort_map(camera_matrix, dist_coeffs, (w, h))
+    if UNDISTORT_MODE == "frame":
+        with timer.span("undistort"):
+            frame_undistorted = undistorter.undistort(frame, out=frame_undistorted)
+    else:
+        frame_undistorted = frame  # 生フレームのまま検出する
+    if frame_undistorted.ndim == 2:
+        gray = frame_undistorted
+    else:
+        gray = cv2.cvtColor(frame_undistorted, cv2.COLOR_BGR2GRAY)
 
     # タグ検出
-    tags = detector.detect(gray, estimate_tag_pose=True,
-                           camera_params=camera_params,
-                           tag_size=tag_size)
-
-    if tags:
-        for tag in tags:
-            # 並進ベクトルからZ距離を取得し補正
-            if tag.pose_t is not None:
-                t = tag.pose_t.flatten()
-                z = t[2]  # 推定距離
-                z_corrected = z * correction_factor  # 補正後距離
-
-                # 複数フレーム平均（直近5フレーム）
-                distance_list.append(z_corrected)
-                if len(distance_list) > 5:
-                    distance_list.pop(0)
-                z_avg = np.mean(distance_list)
-
-                # 画面に距離を描画
-                center = tuple(map(int, tag.center))
-                cv2.putText(frame_undistorted, f"{z_avg:.2f} m",
-                            (center[0]+10, center[1]-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, tag_color, 2)
-
-            # タグ枠を描画（共通色）
-            corners = tag.corners
-            for i in range(4):
-                pt1 = tuple(map(int, corners[i]))
-                pt2 = tuple(map(int, corners[(i + 1) % 4]))
-                cv2.line(frame_undistorted, pt1, pt2, tag_color, 2)
+    with timer.span("pose"):
+        if UNDISTORT_MODE == "frame":
+            tags = detector.detect(gray, estimate_tag_pose=True,
+                                   camera_params=camera_params,
+                                   tag_size=tag_size)
+            poses = [tag.pose_t for tag in tags]
+        else:
+            tags = detector.detect(gray)
+            # 全タグの4隅をまとめて1回で補正し、補正後の座標で姿勢推定
+            corners_all = undistorter.undistort_points(
+                np.array([tag.corners for tag in tags], dtype=np.float32).reshape(-1, 2))
+            poses = []
+            for i in range(len(tags)):
+                ret_pnp, rvec, tvec = cv2.solvePnP(tag_obj_points, corners_all[4*i:4*i+4],
+                                                   camera_matrix, None, flags=cv2.SOLVEPNP_IPPE_SQUARE)
+                poses.append(tvec if ret_pnp else None)
+
+    # 処理時間（取得待ち・表示を除く）で品質を調整
+    if quality is not None and quality.update((perf_counter_ns() - process_t0) / 1e6):
+        quality.apply(tag_detector=detector)
+
+    result = []
+    for tag, pose_t in zip(tags, poses):
+        z_avg = None
+        # 並進ベクトルからZ距離を取得し補正
+        if pose_t is not None:
+            t = pose_t.flatten()
+            z = t[2]  # 推定距離
+            z_corrected = z * correction_factor  # 補正後距離
+
+            # 複数フレーム平均（直近5フレーム）
+            distance_list.append(z_corrected)
+            if len(distance_list) > 5:
+                distance_list.pop(0)
+            z_avg = np.mean(distance_list)
+        result.append((tag.corners, tuple(map(int, tag.center)), z_avg))
 
     # ---------- 表示 ----------
-    cv2.imshow('AprilTag Detection', frame_undistorted)
-
-    # ESCキーで終了
-    if cv2.waitKey(1) & 0xFF == 27:
+    with timer.span("render"):
+        running = display.show(frame_undistorted, {
+            "tags": result, "quality": quality.settings if quality is not None else None})
+    timer.record("frame", perf_counter_ns() - frame_t0)
+    timer.tick()
+
+    # ESCキー（表示なしのときは Ctrl+C）で終了
+    if not running:
         break
 
 cap.release()
-cv2.destroyAllWindows()
+display.close()
+print(timer.format())
+if LATENCY_DUMP is not None:
+    timer.dump(LATENCY_DUMP)
 
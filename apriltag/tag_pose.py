@@ -1,9 +1,20 @@
+import os
+import sys
 import cv2
 from pyapriltags import Detector
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'opencv', 'balltrack'))
+from frame_source import FrameSource
+from preview import PreviewRenderer
+from virtual_camera import step_key
+
 # カメラ起動
-cap = cv2.VideoCapture(0)
+DEVICE = 0
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = FrameSource(DEVICE, pacing=PACING).start()
 
 # --- カメラ内部パラメータ（仮の例） ---
 # fx, fy: 焦点距離（画素単位）
@@ -20,7 +31,50 @@ tag_size = 0.05
 # Apriltag ディテクタ作成
 detector = Detector(families='tag36h11')
 
-cv2.namedWindow('AprilTag Detection', cv2.WINDOW_NORMAL)
+# ---------- 表示設定 ----------
+# "window": 毎フレーム表示 / "preview": 別スレッドで間引き表示 / "none": 表示なし
+DISPLAY_MODE = "window"
+PREVIEW_RATE = 5.0  # preview モードの表示レート [Hz]
+
+
+# 検出結果の描画（preview モードでは表示スレッドで呼ばれる）
+# result: [(corners, center, tag_id, pose_R, pose_t), ...]（姿勢が得られなければ pose_R は None）
+def draw(frame, result):
+    for corners, center, tag_id, R, t in result:
+        for i in range(4):
+            pt1 = tuple(map(int, corners[i]))
+            pt2 = tuple(map(int, corners[(i + 1) % 4]))
+            cv2.line(frame, pt1, pt2, (0, 255, 0), 2)
+        cv2.putText(frame, str(tag_id), center,
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+
+        # 姿勢ベクトルが得られていればカメラ座標系の軸を描画
+        if R is not None:
+            axis_len = 0.03  # 3cmの軸を描画
+
+            # 3D座標軸を2Dに投影
+            axis_points = np.float32([
+                [0, 0, 0],
+                [axis_len, 0, 0],
+                [0, axis_len, 0],
+                [0, 0, axis_len]
+            ])
+            axis_img, _ = cv2.projectPoints(axis_points, cv2.Rodrigues(R)[0], t,
+                                            np.array([[fx, 0, cx],
+                                                      [0, fy, cy],
+                                                      [0, 0, 1]]), None)
+
+            axis_img = axis_img.reshape(-1, 2).astype(int)
+            origin = tuple(axis_img[0])
+
+            cv2.line(frame, origin, tuple(axis_img[1]), (0, 0, 255), 2)  # X: 赤
+            cv2.line(frame, origin, tuple(axis_img[2]), (0, 255, 0), 2)  # Y: 緑
+            cv2.line(frame, origin, tuple(axis_img[3]), (255, 0, 0), 2)  # Z: 青
+    return {'AprilTag Detection': frame}
+
+
+display = PreviewRenderer(draw, mode=DISPLAY_MODE, rate=PREVIEW_RATE, window_flags=cv2.WINDOW_NORMAL,
+                          on_key=lambda key: step_key(cap, key))
 
 while True:
     ret, frame = cap.read()
@@ -52,46 +106,10 @@ while True:
                 print(f"Translation (x,y,z): {t.flatten()}")
                 print(f"Rotation (roll,pitch,yaw): {roll:.3f}, {pitch:.3f}, {yaw:.3f}")
 
-    # 検出結果を描画
-    for tag in tags:
-        corners = tag.corners
-        for i in range(4):
-            pt1 = tuple(map(int, corners[i]))
-            pt2 = tuple(map(int, corners[(i + 1) % 4]))
-            cv2.line(frame, pt1, pt2, (0, 255, 0), 2)
-        center = tuple(map(int, tag.center))
-        cv2.putText(frame, str(tag.tag_id), center,
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-
-        # 姿勢ベクトルが得られていればカメラ座標系の軸を描画
-        if tag.pose_R is not None:
-            R = tag.pose_R
-            t = tag.pose_t
-            axis_len = 0.03  # 3cmの軸を描画
-
-            # 3D座標軸を2Dに投影
-            axis_points = np.float32([
-                [0, 0, 0],
-                [axis_len, 0, 0],
-                [0, axis_len, 0],
-                [0, 0, axis_len]
-            ])
-            axis_img, _ = cv2.projectPoints(axis_points, cv2.Rodrigues(R)[0], t,
-                                            np.array([[fx, 0, cx],
-                                                      [0, fy, cy],
-                                                      [0, 0, 1]]), None)
-
-            axis_img = axis_img.reshape(-1, 2).astype(int)
-            origin = tuple(axis_img[0])
-
-            cv2.line(frame, origin, tuple(axis_img[1]), (0, 0, 255), 2)  # X: 赤
-            cv2.line(frame, origin, tuple(axis_img[2]), (0, 255, 0), 2)  # Y: 緑
-            cv2.line(frame, origin, tuple(axis_img[3]), (255, 0, 0), 2)  # Z: 青
-
-    cv2.imshow('AprilTag Detection', frame)
-    if cv2.waitKey(1) & 0xFF == 27:  # Escキーで終了
+    # 検出結果を描画（Escキー、表示なしのときは Ctrl+C で終了）
+    result = [(tag.corners, tuple(map(int, tag.center)), tag.tag_id, tag.pose_R, tag.pose_t) for tag in tags]
+    if not display.show(frame, result):
         break
 
 cap.release()
-cv2.destroyAllWindows()
-
+display.close()
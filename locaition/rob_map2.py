@@ -1,11 +1,20 @@
+import os
+import sys
 import cv2
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from pyapriltags import Detector
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'opencv', 'balltrack'))
+from frame_source import open_capture
+from virtual_camera import step_key
+
 # --- カメラ設定 ---
 DEVICE = 0  # 使うカメラ番号
-cap = cv2.VideoCapture(DEVICE)
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = open_capture(DEVICE, buffer_size=None, pacing=PACING)
 if not cap.isOpened():
     raise RuntimeError("カメラを開けませんでした")
 
@@ -25,6 +34,12 @@ ax_map.set_xlim(-2, 2)
 ax_map.set_ylim(-2, 2)
 ax_map.set_aspect("equal")
 
+# step のとき n・スペースで次のフレームへ
+def on_key(event):
+    if event.key is not None and len(event.key) == 1:
+        step_key(cap, ord(event.key))
+fig.canvas.mpl_connect('key_press_event', on_key)
+
 # AprilTag の位置を保持
 tag_positions = {}
 
@@ -1,3 +1,5 @@
+import os
+import sys
 import cv2
 import numpy as np
 import matplotlib
@@ -7,6 +9,11 @@ from matplotlib.patches import Polygon
 from pyapriltags import Detector
 from scipy.spatial.transform import Rotation as R
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'opencv', 'balltrack'))
+from frame_source import open_capture
+from undistort_map import get_undistort_map
+from virtual_camera import step_key
+
 # -----------------------------
 # 座標変換クラス
 # -----------------------------
@@ -69,7 +76,11 @@ detector = Detector(families='tag36h11')
 # -----------------------------
 # カメラ設定
 # -----------------------------
-cap = cv2.VideoCapture(0)
+DEVICE = 0
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = open_capture(DEVICE, buffer_size=None, pacing=PACING)
 if not cap.isOpened():
     raise RuntimeError("カメラを開けませんでした")
 
@@ -84,21 +95,27 @@ stop_flag = {"stop": False}
 def on_key(event):
     if event.key == 'escape':
         stop_flag["stop"] = True
+    elif event.key is not None and len(event.key) == 1:
+        step_key(cap, ord(event.key))
 fig_cam.canvas.mpl_connect('key_press_event', on_key)
 fig_map.canvas.mpl_connect('key_press_event', on_key)
 
 # -----------------------------
 # メインループ
 # -----------------------------
+undistorter = None
+undistorted = None
+
 while True:
     ret, img = cap.read()
     if not ret or stop_flag["stop"]:
         break
 
-    # 歪み補正
-    h, w = img.shape[:2]
-    new_cam_mtx, _ = cv2.getOptimalNewCameraMatrix(camera_matrix, dist_coeffs, (w,h), 1)
-    undistorted = cv2.undistort(img, camera_matrix, dist_coeffs, None, new_cam_mtx)
+    # 歪み補正（新カメラ行列と補正テーブルは初回のみ作成）
+    if undistorter is None:
+        h, w = img.shape[:2]
+        undistorter = get_undistort_map(camera_matrix, dist_coeffs, (w,h), alpha=1)
+    undistorted = undistorter.undistort(img, out=undistorted)
 
     gray = cv2.cvtColor(undistorted, cv2.COLOR_BGR2GRAY)
     tags = detector.detect(gray, estimate_tag_pose=True, camera_params=camera_params, tag_size=tag_size)
@@ -1,3 +1,5 @@
+import os
+import sys
 import matplotlib
 matplotlib.use('TkAgg')
 import cv2
@@ -7,6 +9,10 @@ from matplotlib.patches import Polygon
 from pyapriltags import Detector
 from scipy.spatial.transform import Rotation as R
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'opencv', 'balltrack'))
+from frame_source import open_capture
+from virtual_camera import step_key
+
 # --- カメラパラメータ ---
 fx, fy = 600, 600
 cx, cy = 320, 240
@@ -52,7 +58,11 @@ def draw_field(ax):
 
 # --- Apriltag検出 ---
 detector = Detector(families='tag36h11')
-cap = cv2.VideoCapture(0)
+DEVICE = 0
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = open_capture(DEVICE, buffer_size=None, pacing=PACING)
 if not cap.isOpened():
     raise RuntimeError("カメラを開けませんでした")
 
@@ -66,6 +76,8 @@ stop_flag = {"stop": False}
 def on_key(event):
     if event.key == 'escape':
         stop_flag["stop"] = True
+    elif event.key is not None and len(event.key) == 1:
+        step_key(cap, ord(event.key))
 fig_cam.canvas.mpl_connect('key_press_event', on_key)
 fig_map.canvas.mpl_connect('key_press_event', on_key)
 
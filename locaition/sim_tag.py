@@ -1,3 +1,5 @@
+import os
+import sys
 import matplotlib
 matplotlib.use('TkAgg')
 import cv2
@@ -8,6 +10,10 @@ from matplotlib.patches import Rectangle, Polygon, Arc
 import matplotlib.lines as mlines
 from pyapriltags import Detector
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'opencv', 'balltrack'))
+from frame_source import open_capture
+from virtual_camera import step_key
+
 # --- カメラパラメータ（要調整） ---
 fx, fy = 600, 600
 cx, cy = 320, 240
@@ -65,7 +71,11 @@ def draw_field(ax):
 
 # --- AprilTag検出器 ---
 detector = Detector(families='tag36h11')
-cap = cv2.VideoCapture(0)
+DEVICE = 0
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = open_capture(DEVICE, buffer_size=None, pacing=PACING)
 if not cap.isOpened():
     raise RuntimeError("カメラを開けませんでした")
 
@@ -73,6 +83,12 @@ fig, (ax_cam, ax_map) = plt.subplots(1, 2, figsize=(18, 9), gridspec_kw={'width_
 ax_cam.set_title("Camera")
 ax_map.set_title("Field Map")
 
+# step のとき n・スペースで次のフレームへ
+def on_key(event):
+    if event.key is not None and len(event.key) == 1:
+        step_key(cap, ord(event.key))
+fig.canvas.mpl_connect('key_press_event', on_key)
+
 # --- メイン更新関数 ---
 def update(frame):
     ret, img = cap.read()
@@ -0,0 +1,326 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from blob_analysis import analyze_labels, analyze_mask, concat_blobs, select_blobs, take_blobs
+from buffer_pool import BufferPool
+from color_lut import ColorClassifier
+from stage_timer import StageTimer
+from yuyv import blur_yuyv, resize_yuyv
+
+
+# 検出結果1個分の形式（detect_array の戻り値）
+BALL_DTYPE = np.dtype([
+    ("color_id", np.uint8),    # 色ラベル（colors[color_id - 1] が色名）
+    ("cx", np.float32),        # 中心 [px]
+    ("cy", np.float32),
+    ("r", np.float32),         # 半径 [px]
+    ("area", np.float32),      # 面積 [px^2]
+    ("score", np.float32),     # 円らしさ（面積 / 円の面積）
+    ("distance", np.float32),  # 推定距離（ball_diameter と同じ単位、未設定なら nan）
+])
+
+
+# 色ごとの非最大値抑制（score の高い順に残し、重なった同色の円を捨てる）
+# overlap: 中心間距離が (r1 + r2) × overlap 未満なら重複とみなす
+def nms_per_color(color_id, cx, cy, r, score, overlap=0.5):
+    order = np.lexsort((-score, color_id))
+    keep = []
+    for c in np.unique(color_id):
+        idx = order[color_id[order] == c]
+        alive = np.ones(len(idx), dtype=bool)
+        for i in range(len(idx)):
+            if not alive[i]:
+                continue
+            keep.append(idx[i])
+            rest = idx[i + 1:]
+            d2 = (cx[rest] - cx[idx[i]]) ** 2 + (cy[rest] - cy[idx[i]]) ** 2
+            lim = (r[rest] + r[idx[i]]) * overlap
+            alive[i + 1:] &= d2 >= lim ** 2
+    return np.array(keep, dtype=np.intp)
+
+
+# -----------------------------
+# ボール検出（各トラッカー共通の処理）
+# メディアンブラー → 色分類 → ノイズ除去 → 色ごとの輪郭 → 最小外接円
+# method="blobs" のときは輪郭の代わりに連結成分の統計量で一括判定する
+# detect_array は全ボールを事前確保した構造化配列（BALL_DTYPE）で返す
+# 中間画像はすべて pool（BufferPool）のバッファに dst= で書き、毎フレームの確保をしない
+# timer（StageTimer）を渡すと blur / color / morph / contours の所要時間を記録する
+#
+# workers を指定すると、色ごとの「マスク → ノイズ除去 → 輪郭（連結成分）」を独立に処理する
+#   workers >= 2 : 常駐スレッドプールで色ごとに並列実行（OpenCV の処理中は GIL が解放される）
+#   workers == 1 : 同じ処理を順番に実行（スレッドが使えない環境・比較用）
+# この場合 timer の contours には色ごとのノイズ除去の時間も含まれる
+#
+# scale < 1 のときは縮小した画像で検出し、結果は元の画像の座標・大きさに戻す
+# （min_area などの閾値は元の画像の画素数のまま指定する）
+#
+# space="yuyv" のときは frame にカメラの YUYV 画像（h, w, 2、yuyv.py）を渡す
+# BGR・HSV への変換をせずに分類し、切り出しの左端と幅は横2画素の組にそろえる
+# -----------------------------
+class BallDetector:
+    # classifier を渡すと色分類テーブルを他の検出器と共有する
+    def __init__(self, color_ranges, space="hsv", blur_ksize=5, morph_iterations=2, min_area=300,
+                 classifier=None, method="contours", min_circularity=0.5, max_aspect=2.0,
+                 focal_length=None, ball_diameter=None, nms_overlap=0.5, max_balls=64,
+                 radius_prior=None, field_mask=None, pool=None, timer=None, workers=None, scale=1.0,
+                 distance_model=None):
+        if method not in ("contours", "blobs"):
+            raise ValueError(f"未対応の検出方法です: {method}")
+        self.classifier = classifier if classifier is not None else ColorClassifier(color_ranges, space=space)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        self.blur_ksize = blur_ksize
+        self.morph_iterations = morph_iterations
+        self.min_area = min_area
+        self.method = method
+        self.min_circularity = min_circularity  # blobs のみ
+        self.max_aspect = max_aspect            # blobs のみ
+        self.focal_length = focal_length    # 距離計算用の焦点距離 [px]
+        self.ball_diameter = ball_diameter  # 距離計算用のボール直径
+        self.distance_model = distance_model  # 直径 → 距離の表（DistanceLUT、指定すると焦点距離より優先）
+        self.nms_overlap = nms_overlap
+        self.radius_prior = radius_prior    # 行ごとの半径範囲（RadiusPrior、None なら使わない）
+        self.field_mask = field_mask        # フィールド領域（FieldMask、None なら画像全体）
+        self.balls = np.zeros(max_balls, dtype=BALL_DTYPE)  # 検出結果の格納先
+        self.pool = pool if pool is not None else BufferPool()  # 中間画像のバッファ
+        self.timer = timer if timer is not None else StageTimer(enabled=False)
+        self.last_mask = None  # 直前に処理した画像の全色マスク（表示用）
+        self.scale = scale        # 処理解像度の倍率（QualityController が変更する）
+        self._work_scale = 1.0    # 処理中の画像の倍率（閾値の換算用）
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers) if workers is not None and workers > 1 else None
+
+    @property
+    def colors(self):
+        return self.classifier.names
+
+    # ノイズ除去済みのラベル画像を作る（region は 0 の画素を背景にするマスク）
+    # ノイズ除去は従来どおり色ごとのマスクに行う（全色まとめて行うと、別の色に接した細い領域が残る）
+    # 戻り値と last_mask はプールのバッファなので、次の呼び出しで上書きされる
+    def segment(self, frame, region=None):
+        labels = self._classify(frame, region)
+        pool = self.pool
+        shape = labels.shape
+        with self.timer.span("morph"):
+            out = pool.get("segmented", shape)
+            out.fill(0)
+            mask = pool.get("color_mask", shape)
+            cleaned = pool.get("cleaned", shape)
+            for color_id in range(1, len(self.classifier.names) + 1):
+                cv2.compare(labels, color_id, cv2.CMP_EQ, dst=mask)
+                cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=cleaned, iterations=self.morph_iterations)
+                # 0 / 255 のマスクを 0 / color_id にして重ねる（色ごとの結果は重ならない）
+                cv2.min(cleaned, color_id, dst=cleaned)
+                cv2.bitwise_or(out, cleaned, dst=out)
+            return out
+
+    # ノイズ除去前のラベル画像を作り、全色マスクを last_mask に入れる
+    def _classify(self, frame, region=None):
+        pool, timer = self.pool, self.timer
+        shape = frame.shape[:2]
+
+        with timer.span("blur"):
+            buf = pool.get("blurred", frame.shape)
+            if self.classifier.space == "yuyv":
+                blurred = blur_yuyv(frame, self.blur_ksize, out=buf)
+            else:
+                blurred = pool.check("blurred", buf, cv2.medianBlur(frame, self.blur_ksize, dst=buf))
+        with timer.span("color"):
+            if self.classifier.space == "hsv":
+                buf = pool.get("hsv", frame.shape)
+                blurred = pool.check("hsv", buf, cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV, dst=buf))
+            labels = self.classifier.classify(blurred, out=pool.get("labels", shape))
+            buf = pool.get("combined", shape)
+            combined_mask = pool.check("combined", buf, cv2.compare(labels, 0, cv2.CMP_GT, dst=buf))
+            if region is not None:
+                cv2.bitwise_and(combined_mask, region, dst=combined_mask)
+                cv2.bitwise_and(labels, combined_mask, dst=labels)
+        self.last_mask = combined_mask
+        return labels
+
+    # 1色分の輪郭から候補の行 [(color_id, cx, cy, r, area, score), ...] を作る
+    def _contour_rows(self, mask, color_id, offset):
+        rows = []
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+        for cnt in contours:
+            area = cv2.contourArea(cnt)
+            if area < self._min_area():
+                continue
+            (x, y), radius = cv2.minEnclosingCircle(cnt)
+            rows.append((color_id, x, y, radius, area, area / (np.pi * radius * radius)))
+        return rows
+
+    # 1色分の処理（workers 指定時、スレッドプールから呼ばれる）
+    # buffers はこの色専用の (マスク, ノイズ除去後, 連結成分ラベル) のバッファ
+    def _color_chain(self, labels, color_id, offset, buffers):
+        mask_buf, clean_buf, cc_buf = buffers
+        mask = cv2.compare(labels, color_id, cv2.CMP_EQ, dst=mask_buf)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=clean_buf,
+                                iterations=self.morph_iterations)
+        if self.method == "blobs":
+            return analyze_mask(mask, color_id, offset, cc_buf)
+        return self._contour_rows(mask, color_id, offset)
+
+    # 全色の処理を実行して色の順に結果を返す
+    def _run_colors(self, labels, offset):
+        shape = labels.shape
+        # バッファは呼び出し側のスレッドで先に取り出しておく（プールはスレッドセーフではない）
+        jobs = [(labels, color_id, offset,
+                 (self.pool.get(f"color_mask_{color_id}", shape),
+                  self.pool.get(f"cleaned_{color_id}", shape),
+                  self.pool.get(f"cc_labels_{color_id}", shape, np.int32)))
+                for color_id in range(1, len(self.classifier.names) + 1)]
+        if self._executor is None:
+            return [self._color_chain(*job) for job in jobs]
+        return list(self._executor.map(lambda job: self._color_chain(*job), jobs))
+
+    # スレッドプールを終了する
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # 検出候補を配列で返す (color_id, cx, cy, r, area, score)
+    def _candidates(self, frame, offset, region=None):
+        if self.method == "blobs":
+            b = self.detect_blobs(frame, offset, region)
+            return b["color_id"], b["cx"], b["cy"], b["radius"], b["area"], b["circularity"]
+
+        rows = []
+        if self.workers is not None:
+            labels = self._classify(frame, region)
+            with self.timer.span("contours"):
+                for color_rows in self._run_colors(labels, offset):
+                    rows.extend(color_rows)
+        else:
+            labels = self.segment(frame, region)
+            with self.timer.span("contours"):
+                for color_id, color in enumerate(self.classifier.names, 1):
+                    mask = self.classifier.mask(labels, color, out=self.pool.get("color_mask", labels.shape))
+                    rows.extend(self._contour_rows(mask, color_id, offset))
+        if not rows:
+            return (np.zeros(0, np.int32),) + tuple(np.zeros(0, np.float32) for _ in range(5))
+        cols = np.array(rows, dtype=np.float64).T
+        return (cols[0].astype(np.int32),) + tuple(c.astype(np.float32) for c in cols[1:])
+
+    # 縮小した画像で候補を求め、元の画像の座標・大きさに戻す
+    def _scaled_candidates(self, frame, offset, region=None):
+        s = self.scale
+        h, w = frame.shape[:2]
+        size = (max(1, int(round(w * s))), max(1, int(round(h * s))))
+        if self.classifier.space == "yuyv":
+            size = (max(2, size[0] - size[0] % 2), size[1])
+            frame = resize_yuyv(frame, size, out=self.pool.get("scaled", (size[1], size[0], 2)))
+        else:
+            frame = cv2.resize(frame, size, dst=self.pool.get("scaled", (size[1], size[0]) + frame.shape[2:]),
+                               interpolation=cv2.INTER_AREA)
+        if region is not None:
+            region = cv2.resize(region, size, dst=self.pool.get("scaled_region", (size[1], size[0])),
+                                interpolation=cv2.INTER_NEAREST)
+        sx, sy = size[0] / w, size[1] / h
+        self._work_scale = s
+        try:
+            color_id, cx, cy, r, area, score = self._candidates(frame, (0, 0), region)
+        finally:
+            self._work_scale = 1.0
+        return (color_id, (cx / sx + offset[0]).astype(np.float32), (cy / sy + offset[1]).astype(np.float32),
+                (r / s).astype(np.float32), (area / (sx * sy)).astype(np.float32), score)
+
+    # 全ボールを構造化配列（半径の大きい順）で返す
+    # 戻り値は self.balls のビューなので、次の呼び出しで上書きされる
+    def detect_array(self, frame, offset=(0, 0)):
+        # フィールド領域の外接矩形だけを処理し、領域外の画素は背景にする
+        region = None
+        if self.field_mask is not None:
+            h, w = frame.shape[:2]
+            x0, y0, x1, y1 = self.field_mask.clip(offset[0], offset[1], w, h)
+            if x1 <= x0 or y1 <= y0:
+                return self.balls[:0]
+            frame = frame[y0 - offset[1]:y1 - offset[1], x0 - offset[0]:x1 - offset[0]]
+            region = self.field_mask.mask[y0:y1, x0:x1]
+            offset = (x0, y0)
+        if self.classifier.space == "yuyv":
+            frame, offset, region = self._align_pairs(frame, offset, region)
+            if frame.shape[1] == 0:
+                return self.balls[:0]
+
+        if self.scale != 1.0:
+            color_id, cx, cy, r, area, score = self._scaled_candidates(frame, offset, region)
+        else:
+            color_id, cx, cy, r, area, score = self._candidates(frame, offset, region)
+        if self.radius_prior is not None:
+            ok = self.radius_prior.accept(cy, r)
+            color_id, cx, cy, r, area, score = (a[ok] for a in (color_id, cx, cy, r, area, score))
+        keep = nms_per_color(color_id, cx, cy, r, score, self.nms_overlap)
+        keep = keep[np.argsort(-r[keep], kind="stable")][:len(self.balls)]
+
+        n = len(keep)
+        out = self.balls[:n]
+        out["color_id"] = color_id[keep]
+        out["cx"] = cx[keep]
+        out["cy"] = cy[keep]
+        out["r"] = r[keep]
+        out["area"] = area[keep]
+        out["score"] = score[keep]
+        out["distance"] = self.distance(out["r"])
+        return out
+
+    # YUYV の切り出しを横2画素の組にそろえる（左端を偶数列に、幅を偶数に）
+    def _align_pairs(self, frame, offset, region):
+        x0 = offset[0] % 2
+        x1 = frame.shape[1] - (frame.shape[1] - x0) % 2
+        if x0 == 0 and x1 == frame.shape[1]:
+            return frame, offset, region
+        if region is not None:
+            region = region[:, x0:x1]
+        return frame[:, x0:x1], (offset[0] + x0, offset[1]), region
+
+    # 半径 [px] から距離を求める（distance_model も焦点距離・直径も未設定なら nan）
+    def distance(self, r):
+        if self.distance_model is not None:
+            return self.distance_model.from_radius(r)
+        if self.focal_length is None or self.ball_diameter is None:
+            return np.full(np.shape(r), np.nan, dtype=np.float32)
+        with np.errstate(divide="ignore"):
+            return (self.ball_diameter * self.focal_length / (2 * np.asarray(r, dtype=np.float32))).astype(np.float32)
+
+    # 円を検出して [(x, y, radius, color), ...] を返す
+    # offset は frame が切り出し画像のときの左上座標（結果は元画像の座標になる）
+    def detect(self, frame, offset=(0, 0)):
+        names = self.classifier.names
+        return [(float(b["cx"]), float(b["cy"]), float(b["r"]), names[b["color_id"] - 1])
+                for b in self.detect_array(frame, offset)]
+
+    # 全ブロブの特徴量を配列で求め、条件を満たすものを半径の大きい順に返す
+    def detect_blobs(self, frame, offset=(0, 0), region=None):
+        if self.workers is not None:
+            labels = self._classify(frame, region)
+            with self.timer.span("contours"):
+                blobs = concat_blobs(self._run_colors(labels, offset))
+                idx = select_blobs(blobs, self._min_area(), self.min_circularity, self.max_aspect)
+                return take_blobs(blobs, idx)
+
+        labels = self.segment(frame, region)
+        with self.timer.span("contours"):
+            blobs = analyze_labels(labels, len(self.classifier.names), offset,
+                                   mask=self.pool.get("color_mask", labels.shape),
+                                   cc_labels=self.pool.get("cc_labels", labels.shape, np.int32))
+            idx = select_blobs(blobs, self._min_area(), self.min_circularity, self.max_aspect)
+            return take_blobs(blobs, idx)
+
+    # 処理中の画像の画素数に換算した最小面積
+    def _min_area(self):
+        return self.min_area * self._work_scale * self._work_scale
+
+
+# 半径最大の円を従来の max_circle 形式で返す
+def max_circle(circles):
+    result = {"radius": 0, "center": None, "color": None}
+    for x, y, radius, color in circles:
+        if radius > result["radius"]:
+            result["radius"] = radius
+            result["center"] = (int(x), int(y))
+            result["color"] = color
+    return result
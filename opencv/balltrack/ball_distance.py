@@ -1,17 +1,29 @@
 import cv2
 import numpy as np
-import time
+from time import perf_counter_ns
+
+from ball_detector import BallDetector
+from color_lut import RANGES_PATH, shared_color_ranges
+from distance_model import DistanceModel
+from field_mask import FieldMask, camera_extrinsics, load_field_polygons
+from frame_source import FrameSource
+from preview import PreviewRenderer
+from radius_prior import RadiusPrior
+from stage_timer import StageTimer
+from undistort_map import get_undistort_map
+from virtual_camera import step_key
 
 # カメラ設定
 DEVICE = '/dev/video4'
-cap = cv2.VideoCapture(DEVICE)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-cap.set(cv2.CAP_PROP_FPS, 15)
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = FrameSource(DEVICE, width=1280, height=720, fps=15, pacing=PACING)
 
 if not cap.isOpened():
     print(f"カメラ {DEVICE} を開けませんでした")
     exit()
+cap.start()
 
 # 実際のボール直径（cm）
 BALL_DIAMETER = 5.5  
@@ -25,6 +37,22 @@ camera_matrix = np.array([
 
 dist_coeffs = np.array([0.04739503, -0.07422041, 0.00880341, 0.0123376, 0.02295108])
 
+# 歪み補正モード
+# "frame"  : フレーム全体を補正してから検出
+# "points" : 生フレームで検出し、検出したボールの中心と半径方向の点のみ補正
+UNDISTORT_MODE = "frame"
+
+# カメラの設置姿勢（locaition/sim_*.py と同じ）
+# USE_RADIUS_PRIOR = True にすると、床上のボールとしてありえない半径のブロブを行ごとに除外する
+USE_RADIUS_PRIOR = False
+CAMERA_HEIGHT = 0.80   # [m]
+CAMERA_PITCH = -70.0   # [deg]
+
+# USE_FIELD_MASK = True にすると、field_map.json のフィールド領域の外は処理しない
+USE_FIELD_MASK = False
+CAMERA_POS = (250.0, -200.0, 800.0)  # フィールド座標 [mm]（設置位置に合わせて変更）
+CAMERA_YAW = 90.0                    # [deg] フィールドの +y 方向を向く
+
 # HSV色範囲（赤・青・黄）
 color_ranges = {
     "red": (np.array([149, 46, 100]), np.array([179, 171, 255])),
@@ -32,86 +60,132 @@ color_ranges = {
     "yellow": (np.array([10, 70, 140]), np.array([40, 135, 255]))
 }
 
+# hsv_tuner.py で作った共通の色範囲ファイル（あればその色は上の color_ranges より優先、None なら使わない）
+COLOR_RANGES_FILE = RANGES_PATH
+color_ranges = shared_color_ranges(color_ranges, COLOR_RANGES_FILE)
+
 draw_colors = {
     "red": (0, 0, 255),
     "blue": (255, 0, 0),
     "yellow": (0, 255, 255)
 }
 
-kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+# 処理段ごとの所要時間（LATENCY_REPORT 秒ごとに p50/p95/p99/最大を表示、終了時に LATENCY_DUMP へ保存）
+LATENCY_REPORT = 5.0   # None なら表示しない
+LATENCY_DUMP = None    # 例: "latency.json"
+timer = StageTimer(report_interval=LATENCY_REPORT)
+
+# 距離モデル（glaf_focal.py で保存した JSON のパス）。None なら焦点距離 fx とボール直径から求める
+DISTANCE_MODEL = None  # 例: distance_model.DEFAULT_PATH
+distance_lut = DistanceModel.load(DISTANCE_MODEL).compile(unit="cm") if DISTANCE_MODEL is not None else None
+
+# ボール検出器（色分類は "hsv" または HSV変換を省略する "bgr"）
+detector = BallDetector(color_ranges, space="hsv",
+                        focal_length=camera_matrix[0, 0], ball_diameter=BALL_DIAMETER, timer=timer,
+                        distance_model=distance_lut)
+
+# 中心から上下左右に半径分ずらした点（points モードで半径を補正するため）
+RADIUS_DIRS = np.array([[0, 0], [1, 0], [-1, 0], [0, 1], [0, -1]], dtype=np.float32)
+
+# 表示モード（"window": 毎フレーム表示 / "preview": 別スレッドで間引き表示 / "none": 表示なし）
+DISPLAY_MODE = "window"
+PREVIEW_RATE = 5.0  # preview モードの表示レート [Hz]
 
-def update_max_circle(x, y, radius, color, current_max):
-    if radius > current_max["radius"]:
-        current_max["radius"] = radius
-        current_max["center"] = (int(x), int(y))
-        current_max["color"] = color
-    return current_max
+# 検出結果の描画（preview モードでは表示スレッドで呼ばれる）
+def draw(image, result):
+    drawn, balls = result["drawn"], result["balls"]
+
+    # 2個目以降のボールは細線で表示
+    for b in drawn[1:]:
+        cv2.circle(image, (int(b["cx"]), int(b["cy"])), int(b["r"]),
+                   draw_colors[detector.colors[b["color_id"] - 1]], 1)
+
+    if len(balls) > 0:
+        # 最大のボール
+        ball = balls[0]
+        color = detector.colors[ball["color_id"] - 1]
+        center = (int(drawn[0]["cx"]), int(drawn[0]["cy"]))
+        cv2.circle(image, center, int(drawn[0]["r"]), draw_colors[color], 2)
+        cv2.circle(image, center, 5, (0, 0, 0), -1)
+
+        ball_center = (int(ball["cx"]), int(ball["cy"]))
+        cv2.putText(image, f"{color.capitalize()} Ball Pos: {ball_center}",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[color], 2)
+
+        # 距離（DISTANCE_MODEL 未指定なら焦点距離 fx から）
+        if np.isfinite(ball["distance"]):
+            cv2.putText(image, f"Distance: {ball['distance']:.2f} cm",
+                        (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[color], 2)
+
+    return {"Combined Mask": result["mask"], "Undistorted View": image}
+
+display = PreviewRenderer(draw, mode=DISPLAY_MODE, rate=PREVIEW_RATE, on_key=lambda key: step_key(cap, key))
+
+undistorter = None
+frame_undistorted = None
 
 while True:
-    start_time = time.time()
+    frame_t0 = perf_counter_ns()
 
-    ret, frame = cap.read()
+    with timer.span("capture"):
+        ret, frame = cap.read()
     if not ret:
         print("フレーム取得に失敗")
         break
 
-    # 歪み補正
-    frame_undistorted = cv2.undistort(frame, camera_matrix, dist_coeffs)
-
-    blurred = cv2.medianBlur(frame_undistorted, 5)
-    hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
-
-    combined_mask = None
-    masks = {}
-
-    max_circle = {
-        "radius": 0,
-        "center": None,
-        "color": None
-    }
-
-    for color, (lower, upper) in color_ranges.items():
-        mask = cv2.inRange(hsv, lower, upper)
-        masks[color] = mask
-        combined_mask = mask if combined_mask is None else combined_mask | mask
-
-    for color, mask in masks.items():
-        mask_cleaned = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=2)
-        contours, _ = cv2.findContours(mask_cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            if area < 300:
-                continue
-            (x, y), radius = cv2.minEnclosingCircle(cnt)
-            max_circle = update_max_circle(x, y, radius, color, max_circle)
-
-    if max_circle["center"] is not None:
-        cv2.circle(frame_undistorted, max_circle["center"], int(max_circle["radius"]), draw_colors[max_circle["color"]], 2)
-        cv2.circle(frame_undistorted, max_circle["center"], 5, (0, 0, 0), -1)
-        cv2.putText(frame_undistorted, f"{max_circle['color'].capitalize()} Ball Pos: {max_circle['center']}",
-                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[max_circle["color"]], 2)
-
-        # 距離計算（焦点距離は fx を使用）
-        pixel_diameter = max_circle["radius"] * 2
-        if pixel_diameter > 0:
-            fx = camera_matrix[0, 0]
-            distance = (BALL_DIAMETER * fx) / pixel_diameter
-            cv2.putText(frame_undistorted, f"Distance: {distance:.2f} cm",
-                        (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[max_circle["color"]], 2)
+    # 歪み補正（補正テーブルは初回のみ作成）
+    if undistorter is None:
+        h, w = frame.shape[:2]
+        undistorter = get_undistort_map(camera_matrix, dist_coeffs, (w, h))
+        if USE_RADIUS_PRIOR:
+            detector.radius_prior = RadiusPrior(camera_matrix, h, CAMERA_HEIGHT, CAMERA_PITCH,
+                                                BALL_DIAMETER / 100)
+        if USE_FIELD_MASK:
+            rvec, tvec = camera_extrinsics(CAMERA_POS, CAMERA_YAW, CAMERA_PITCH)
+            # frame モードは補正後の画像なので歪み係数なしで投影する
+            detector.field_mask = FieldMask(load_field_polygons(), undistorter.new_camera_matrix,
+                                            dist_coeffs if UNDISTORT_MODE == "points" else None,
+                                            rvec, tvec, (w, h))
+    if UNDISTORT_MODE == "frame":
+        with timer.span("undistort"):
+            frame_undistorted = undistorter.undistort(frame, out=frame_undistorted)
+    else:
+        frame_undistorted = frame  # 生フレームのまま検出する
+
+    # 全ボール（半径の大きい順の構造化配列）
+    balls = detector.detect_array(frame_undistorted)
+
+    # 位置・半径・距離（補正後の座標系）、表示は検出した画像上の座標（drawn）
+    drawn = balls
+    if UNDISTORT_MODE == "points" and len(balls) > 0:
+        with timer.span("undistort"):
+            drawn = balls.copy()
+            # 全ボールの中心と半径方向の点をまとめて1回で補正
+            pts = (np.stack([balls["cx"], balls["cy"]], axis=1)[:, None, :] +
+                   balls["r"][:, None, None] * RADIUS_DIRS[None, :, :])
+            pts = undistorter.undistort_points(pts.reshape(-1, 2)).reshape(len(balls), 5, 2)
+            balls["cx"] = pts[:, 0, 0]
+            balls["cy"] = pts[:, 0, 1]
+            balls["r"] = np.linalg.norm(pts[:, 1:] - pts[:, :1], axis=2).mean(axis=1)
+            balls["distance"] = detector.distance(balls["r"])
 
     # 表示
-    cv2.imshow("Combined Mask", combined_mask)
-    cv2.imshow("Undistorted View", frame_undistorted)
-
-    fps = 1 / (time.time() - start_time)
-    print(f"FPS: {fps:.2f}", end='\r')
+    with timer.span("render"):
+        running = display.show(frame_undistorted, {"drawn": drawn, "balls": balls,
+                                                   "mask": detector.last_mask})
 
-    time.sleep(0.1)
+    # FPS表示（取得待ち・処理・表示を含む1フレームの時間から）
+    frame_ns = perf_counter_ns() - frame_t0
+    timer.record("frame", frame_ns)
+    print(f"FPS: {1e9 / frame_ns:.2f}  Dropped: {cap.dropped}", end='\r')
+    timer.tick()
 
-    if cv2.waitKey(1) & 0xFF == 27:
+    if not running:
         break
 
 cap.release()
-cv2.destroyAllWindows()
+display.close()
+print("\n" + timer.format())
+if LATENCY_DUMP is not None:
+    timer.dump(LATENCY_DUMP)
 
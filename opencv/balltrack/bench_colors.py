@@ -0,0 +1,53 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from ball_detector import BallDetector
+from bench_pyramid import BLUR_KSIZE, NUM_FRAMES, color_ranges, load_frames, run, synthetic_frames
+
+# 色ごとの並列処理（BallDetector の workers）の比較
+# 使い方: python bench_colors.py [画像フォルダ or 動画ファイル or "-"] [使用コア数]
+# "-" または引数なしのときは合成画像で計測する
+# 使用コア数を指定すると、その数の CPU だけで実行する（2 / 4 / 8 コア機の比較用、Linux のみ）
+# 色は3色なので、workers を 3 より大きくしても同時に動くのは3スレッドまで
+
+WORKERS = [1, 2, 3, 4, 8]
+METHODS = ["contours", "blobs"]
+
+
+def same_result(a, b):
+    return (len(a) == len(b) and np.array_equal(a["color_id"], b["color_id"]) and
+            np.allclose(a["cx"], b["cx"]) and np.allclose(a["cy"], b["cy"]) and np.allclose(a["r"], b["r"]))
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None
+    if len(sys.argv) > 2 and hasattr(os, "sched_setaffinity"):
+        cores = int(sys.argv[2])
+        os.sched_setaffinity(0, set(sorted(os.sched_getaffinity(0))[:cores]))
+    num_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+
+    frames = load_frames(path, NUM_FRAMES) if path else synthetic_frames(NUM_FRAMES)
+    print(f"フレーム数: {len(frames)}  解像度: {frames[0].shape[1]}x{frames[0].shape[0]}  "
+          f"CPU: {num_cpus}  OpenCV スレッド: {cv2.getNumThreads()}")
+
+    for method in METHODS:
+        # workers なし（ラベル画像のまま処理する従来の処理）
+        base = BallDetector(color_ranges, blur_ksize=BLUR_KSIZE, method=method)
+        _, t_base = run(lambda f: base.detect_array(f).copy(), frames)
+        print(f"[{method}] 従来（workers なし）: {np.median(t_base):7.2f} ms/フレーム")
+
+        ref, t_ref = None, None
+        for workers in WORKERS:
+            det = BallDetector(color_ranges, blur_ksize=BLUR_KSIZE, method=method, workers=workers)
+            res, t = run(lambda f: det.detect_array(f).copy(), frames)
+            det.close()
+            if ref is None:
+                ref, t_ref = res, t
+            mismatch = sum(not same_result(a, b) for a, b in zip(ref, res))
+            print(f"[{method}] workers={workers}: {np.median(t):7.2f} ms/フレーム  "
+                  f"p95 {np.percentile(t, 95):7.2f} ms  "
+                  f"速度比（workers=1）{np.median(t_ref) / np.median(t):5.2f} 倍  "
+                  f"不一致 {mismatch}")
@@ -0,0 +1,101 @@
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from bench_pyramid import NUM_FRAMES, load_frames, synthetic_frames
+from color_lut import ColorClassifier
+from hough_roi import detect_circles_in_blobs
+
+# tracking_deploy.py のハフ円検出モード（full / roi / radial）の比較
+# 使い方: python bench_hough.py [画像フォルダ or 動画ファイル]
+# 引数なしのときは tracking_deploy.py の色範囲に入る色の円を描いた合成画像で計測する
+#
+# 色分類・ノイズ除去までは全モード共通なので1回だけ行い、その後のハフ（円の検証）部分だけを
+# モードごとに計測する。full で見つかった円を基準に、各モードで同じ色・近い位置の円が
+# 見つかった割合と、中心・半径の差を表示する
+
+# HSV範囲（tracking_deploy.py と同じ）
+color_ranges = {
+    "red": [([150, 120, 0], [175, 255, 255])],
+    "blue": [([95, 195, 0], [125, 255, 255])],
+    "yellow": [([20, 34, 205], [30, 88, 255])]
+}
+
+# 各色の範囲内に入るBGR値（H, S, V = (162, 190, 200), (110, 225, 200), (25, 60, 230)）
+ball_bgr = [(140, 51, 200), (200, 82, 23), (176, 221, 230)]
+
+MODES = ["full", "roi", "radial"]
+BLUR_KSIZE = 11   # tracking_deploy.py と同じ
+MATCH_RATIO = 0.3  # 中心の差が基準の円の半径 × この値以内なら同じ円とみなす
+
+
+# 色分類とノイズ除去（全モード共通、tracking_deploy.py と同じ処理）
+def prepare(frame, classifier, kernel):
+    blurred = cv2.medianBlur(frame, BLUR_KSIZE)
+    labels = classifier.classify(cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV))
+    gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY)
+    masks = {color: cv2.morphologyEx(classifier.mask(labels, color), cv2.MORPH_OPEN, kernel, iterations=2)
+             for color in classifier.names}
+    return gray, masks
+
+
+# 1色分のハフ（tracking_deploy.py の detect_color のマスク作成より後）
+def hough(mode, gray, mask):
+    if mode == "full":
+        masked_gray = cv2.bitwise_and(gray, gray, mask=mask)
+        circles = cv2.HoughCircles(masked_gray, cv2.HOUGH_GRADIENT, dp=1.2, minDist=20,
+                                   param1=100, param2=20, minRadius=5, maxRadius=120)
+        return [] if circles is None else [tuple(map(float, c)) for c in circles[0]]
+    return detect_circles_in_blobs(gray, mask, verify="radial" if mode == "radial" else "hough",
+                                   min_radius=5, max_radius=120)
+
+
+# 基準の円ごとに、同じ色で最も近い円との (中心の差, 半径の差)（見つからなければ None）
+def match(ref, res):
+    pairs = []
+    for color, circles in ref.items():
+        for x, y, r in circles:
+            best = min(((np.hypot(x - bx, y - by), abs(r - br)) for bx, by, br in res.get(color, [])),
+                       default=None)
+            pairs.append(best if best is not None and best[0] <= max(r * MATCH_RATIO, 2.0) else None)
+    return pairs
+
+
+if __name__ == "__main__":
+    frames = (load_frames(sys.argv[1], NUM_FRAMES) if len(sys.argv) > 1
+              else synthetic_frames(NUM_FRAMES, colors=ball_bgr))
+    print(f"フレーム数: {len(frames)}  解像度: {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    classifier = ColorClassifier(color_ranges, space="hsv")
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    t_prep, prepared = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        prepared.append(prepare(frame, classifier, kernel))
+        t_prep.append((time.perf_counter() - start) * 1000)
+    print(f"色分類・ノイズ除去（共通）: {np.median(t_prep):7.2f} ms/フレーム")
+
+    results, times = {}, {}
+    for mode in MODES:
+        results[mode], t = [], []
+        for gray, masks in prepared:
+            start = time.perf_counter()
+            results[mode].append({color: hough(mode, gray, mask) for color, mask in masks.items()})
+            t.append((time.perf_counter() - start) * 1000)
+        times[mode] = np.array(t)
+
+    t_full = np.median(times["full"])
+    for mode in MODES:
+        pairs = [p for ref, res in zip(results["full"], results[mode]) for p in match(ref, res)]
+        found = [p for p in pairs if p is not None]
+        extra = sum(sum(len(c) for c in res.values()) for res in results[mode]) - len(found)
+        t = np.median(times[mode])
+        print(f"{mode:<6}: ハフ {t:7.2f} ms/フレーム（p95 {np.percentile(times[mode], 95):7.2f} ms）  "
+              f"full 比 {t / t_full if t_full > 0 else 0:5.2f}  "
+              f"フレーム全体 {np.median(t_prep) + t:7.2f} ms  "
+              f"一致 {len(found)}/{len(pairs)}  余分 {extra}  "
+              f"中心差 平均 {np.mean([p[0] for p in found]) if found else 0:.2f} px  "
+              f"半径差 平均 {np.mean([p[1] for p in found]) if found else 0:.2f} px")
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from bench_pyramid import NUM_FRAMES, load_frames, synthetic_frames
+from frame_source import open_capture
+from mjpeg import MjpegDecoder, load_mjpeg
+
+# MJPEG の展開だけの処理速度（MjpegDecoder の workers / reduce）の比較
+# 使い方:
+#   python bench_mjpeg.py [MJPEG ファイル or 画像フォルダ or 動画ファイル or "-"]
+#   python bench_mjpeg.py record 保存先.mjpeg [フレーム数]   カメラの MJPEG をそのまま録画
+# .mjpeg 以外は JPEG（品質 JPEG_QUALITY）に圧縮してから計測する。"-" または引数なしは合成画像
+
+DEVICE = 0
+WIDTH, HEIGHT, FPS = 1920, 1080, 30
+JPEG_QUALITY = 90
+WORKERS = [1, 2, 4, 8]
+REDUCE = [1, 2, 4]
+REPEAT = 3  # 各条件の繰り返し回数（中央値を表示）
+
+
+# カメラの圧縮データを展開せずに連結して保存する
+def record(path, num_frames):
+    cap = open_capture(DEVICE, WIDTH, HEIGHT, FPS, fourcc="MJPG", convert_rgb=False)
+    if not cap.isOpened():
+        print(f"カメラ {DEVICE} を開けませんでした")
+        return
+    count = 0
+    with open(path, "wb") as f:
+        while count < num_frames:
+            ret, buf = cap.read()
+            if not ret:
+                print("フレーム取得に失敗")
+                break
+            if buf.ndim == 3:
+                print("圧縮データを取得できません（CAP_PROP_CONVERT_RGB 未対応のバックエンド）")
+                break
+            f.write(buf.tobytes())
+            count += 1
+            print(f"{count}/{num_frames}", end="\r")
+    cap.release()
+    print(f"\n{path}: {count} フレーム")
+
+
+def encode_frames(frames):
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+    return [cv2.imencode(".jpg", f, params)[1] for f in frames]
+
+
+def run_decoder(bufs, workers, reduce):
+    decoder = MjpegDecoder(workers, reduce)
+    times, images = [], None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        images = list(decoder.map(bufs))
+        times.append(time.perf_counter() - start)
+    decoder.close()
+    return images, float(np.median(times))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "record":
+        record(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else NUM_FRAMES)
+        sys.exit(0)
+
+    path = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None
+    if path is not None and path.endswith(".mjpeg"):
+        bufs = load_mjpeg(path)
+    else:
+        bufs = encode_frames(load_frames(path, NUM_FRAMES) if path else synthetic_frames(NUM_FRAMES))
+    first = cv2.imdecode(bufs[0], cv2.IMREAD_COLOR)
+    print(f"フレーム数: {len(bufs)}  解像度: {first.shape[1]}x{first.shape[0]}  "
+          f"平均 {np.mean([b.size for b in bufs]) / 1024:.0f} KiB/フレーム  CPU: {os.cpu_count()}")
+
+    for reduce in REDUCE:
+        ref, t_ref = None, None
+        for workers in WORKERS:
+            images, t = run_decoder(bufs, workers, reduce)
+            if ref is None:
+                ref, t_ref = images, t
+            # 並列に展開しても順番・内容が変わらないことを確認
+            mismatch = sum(not np.array_equal(a, b) for a, b in zip(ref, images))
+            print(f"1/{reduce} workers={workers}: {len(bufs) / t:7.1f} fps  "
+                  f"{t / len(bufs) * 1000:6.2f} ms/フレーム  速度比 {t_ref / t:5.2f} 倍  不一致 {mismatch}")
@@ -0,0 +1,101 @@
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from ball_detector import BallDetector, max_circle
+from pyramid_detector import PyramidDetector
+
+# ピラミッド検出と元解像度検出の比較
+# 使い方: python bench_pyramid.py [画像フォルダ or 動画ファイル]
+# 引数なしのときは赤・青・黄の円を描いた合成画像で計測する
+
+# HSV色範囲（tracking_one.py と同じ）
+color_ranges = {
+    "red": (np.array([165, 105, 115]), np.array([175, 250, 255])),
+    "blue": (np.array([90, 90, 100]), np.array([120, 225, 255])),
+    "yellow": (np.array([10, 70, 140]), np.array([40, 135, 255]))
+}
+
+# 各色の範囲内に入るBGR値
+ball_bgr = [(90, 30, 200), (220, 120, 40), (110, 200, 220)]
+
+SIZE = (1280, 720)
+NUM_FRAMES = 50
+LEVELS = [1, 2, 3]
+BLUR_KSIZE = 11  # tracking_deploy.py / tracking_findc.py と同じ
+
+
+def synthetic_frames(n, seed=0, colors=None):
+    colors = ball_bgr if colors is None else colors
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(n):
+        img = rng.normal(60, 15, (SIZE[1], SIZE[0], 3)).clip(0, 255).astype(np.uint8)
+        for _ in range(rng.integers(1, 4)):
+            r = int(rng.integers(15, 80))
+            x = int(rng.integers(r, SIZE[0] - r))
+            y = int(rng.integers(r, SIZE[1] - r))
+            cv2.circle(img, (x, y), r, colors[rng.integers(len(colors))], -1, cv2.LINE_AA)
+        noise = rng.normal(0, 6, img.shape)
+        frames.append((img + noise).clip(0, 255).astype(np.uint8))
+    return frames
+
+
+def load_frames(path, n):
+    frames = []
+    if os.path.isdir(path):
+        for f in sorted(glob.glob(os.path.join(path, "*")))[:n]:
+            img = cv2.imread(f)
+            if img is not None:
+                frames.append(img)
+    else:
+        cap = cv2.VideoCapture(path)
+        while len(frames) < n:
+            ret, img = cap.read()
+            if not ret:
+                break
+            frames.append(img)
+        cap.release()
+    return frames
+
+
+def run(detect, frames):
+    results, times = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        results.append(detect(frame))
+        times.append((time.perf_counter() - start) * 1000)
+    return results, np.array(times)
+
+
+if __name__ == "__main__":
+    frames = load_frames(sys.argv[1], NUM_FRAMES) if len(sys.argv) > 1 else synthetic_frames(NUM_FRAMES)
+    print(f"フレーム数: {len(frames)}  解像度: {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    full = BallDetector(color_ranges, blur_ksize=BLUR_KSIZE)
+    ref, t_ref = run(lambda f: max_circle(full.detect(f)), frames)
+    print(f"元解像度      : {np.median(t_ref):7.2f} ms/フレーム")
+
+    for level in LEVELS:
+        pyr = PyramidDetector(color_ranges, level=level, blur_ksize=BLUR_KSIZE)
+        res, t = run(pyr.detect_max, frames)
+
+        center_err, radius_err, missed = [], [], 0
+        for a, b in zip(ref, res):
+            if a["center"] is None:
+                continue
+            if b["center"] is None or b["color"] != a["color"]:
+                missed += 1
+                continue
+            center_err.append(np.hypot(a["center"][0] - b["center"][0], a["center"][1] - b["center"][1]))
+            radius_err.append(abs(a["radius"] - b["radius"]))
+
+        print(f"1/{1 << level:<2} (level {level}): {np.median(t):7.2f} ms/フレーム  "
+              f"速度比 {np.median(t_ref) / np.median(t):5.1f} 倍  "
+              f"中心誤差 平均 {np.mean(center_err) if center_err else 0:.2f} px / 最大 {max(center_err, default=0):.2f} px  "
+              f"半径誤差 平均 {np.mean(radius_err) if radius_err else 0:.2f} px  "
+              f"不一致 {missed}")
@@ -0,0 +1,97 @@
+import sys
+
+import cv2
+import numpy as np
+
+from ball_detector import BallDetector
+from bench_pyramid import BLUR_KSIZE, NUM_FRAMES, SIZE, ball_bgr, color_ranges, load_frames, run
+from camshift_tracker import CamShiftTracker
+from hough_roi import detect_circles_in_blobs
+from roi_tracker import RoiTracker
+
+# 追跡方法ごとの1フレームの処理時間の比較
+#   contours : 毎フレーム全画面で 色分類 → ノイズ除去 → 輪郭 → 最小外接円
+#   hough    : 毎フレーム全画面で 色分類 → ノイズ除去 → ブロブ周辺のハフ円検出
+#   roi      : RoiTracker（追跡中は予測窓だけ contours）
+#   camshift : CamShiftTracker（追跡中は予測窓だけ 逆投影 → CamShift）
+# 使い方: python bench_tracking.py [画像フォルダ or 動画ファイル]
+# 引数なしのときは動くボールの合成動画で計測し、正解位置との誤差も表示する
+
+MATCH_DISTANCE = 20  # 正解との中心距離がこれ以下なら検出できたとみなす [px]
+
+
+# 画面内を等速で動き、端で跳ね返るボールの合成動画
+# 戻り値: (フレームのリスト, フレームごとの正解 [(x, y, r, 色名), ...])
+def moving_frames(n, num_balls=3, seed=0):
+    rng = np.random.default_rng(seed)
+    names = list(color_ranges)
+    r = rng.integers(20, 60, num_balls).astype(np.float64)
+    pos = np.stack([rng.uniform(r, SIZE[0] - r), rng.uniform(r, SIZE[1] - r)], axis=1)
+    vel = rng.uniform(-12, 12, (num_balls, 2))
+    colors = rng.integers(len(ball_bgr), size=num_balls)
+
+    frames, truth = [], []
+    for _ in range(n):
+        img = rng.normal(60, 15, (SIZE[1], SIZE[0], 3)).clip(0, 255).astype(np.uint8)
+        for (x, y), radius, c in zip(pos, r, colors):
+            cv2.circle(img, (int(x), int(y)), int(radius), ball_bgr[c], -1, cv2.LINE_AA)
+        frames.append(img)
+        truth.append([(x, y, radius, names[c]) for (x, y), radius, c in zip(pos, r, colors)])
+        pos += vel
+        for axis, limit in enumerate(SIZE):
+            out = (pos[:, axis] < r) | (pos[:, axis] > limit - r)
+            vel[out, axis] *= -1
+            pos[:, axis] = np.clip(pos[:, axis], r, limit - r)
+    return frames, truth
+
+
+# 全画面のハフ円検出を detect() と同じ形で返す関数にする
+def hough_detect(detector):
+    def detect(frame):
+        labels = detector.segment(frame)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        circles = []
+        for color_id, color in enumerate(detector.colors, 1):
+            mask = detector.classifier.mask(labels, color)
+            circles.extend((x, y, r, color) for x, y, r in detect_circles_in_blobs(gray, mask))
+        return circles
+    return detect
+
+
+# 正解の各ボールについて、同色で最も近い検出との誤差
+def score(results, truth):
+    found, errors = 0, []
+    for circles, balls in zip(results, truth):
+        for x, y, r, color in balls:
+            d = [np.hypot(c[0] - x, c[1] - y) for c in circles if c[3] == color]
+            if d and min(d) <= MATCH_DISTANCE:
+                found += 1
+                errors.append(min(d))
+    total = sum(len(b) for b in truth)
+    return found / max(total, 1), (np.mean(errors) if errors else float("nan"))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        frames, truth = load_frames(sys.argv[1], NUM_FRAMES), None
+    else:
+        frames, truth = moving_frames(NUM_FRAMES * 4)
+    print(f"フレーム数: {len(frames)}  解像度: {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    def new_detector():
+        return BallDetector(color_ranges, blur_ksize=BLUR_KSIZE)
+
+    methods = {
+        "contours": new_detector().detect,
+        "hough": hough_detect(new_detector()),
+        "roi": RoiTracker(new_detector(), max_misses=5, refresh_interval=30).update,
+        "camshift": CamShiftTracker(new_detector(), max_misses=3, refresh_interval=60).update,
+    }
+    for name, detect in methods.items():
+        results, t = run(detect, frames)
+        line = (f"{name:<9}: {np.median(t):7.2f} ms/フレーム  p95 {np.percentile(t, 95):7.2f} ms  "
+                f"最大 {np.max(t):7.2f} ms")
+        if truth is not None:
+            rate, err = score(results, truth)
+            line += f"  検出率 {rate * 100:5.1f} %  平均誤差 {err:5.2f} px"
+        print(line)
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+# -----------------------------
+# ブロブ解析（輪郭ごとの Python ループの代わり）
+# connectedComponentsWithStats で全ブロブの特徴量を NumPy 配列でまとめて求める
+# 結果は列ごとの配列を持つ dict
+#   color_id : 色ラベル（ColorClassifier の番号）
+#   area     : 画素数
+#   x, y, w, h : 外接矩形
+#   cx, cy   : 重心
+#   radius   : 等価半径 sqrt(area / π)
+#   fill     : 外接矩形に対する充填率（円なら約 π/4）
+#   aspect   : 外接矩形の長辺 / 短辺
+#   circularity : 外接矩形の長辺を直径とする円に対する面積比（円なら約1）
+# -----------------------------
+
+FIELDS = ("color_id", "area", "x", "y", "w", "h", "cx", "cy", "radius", "fill", "aspect", "circularity")
+
+
+def empty_blobs():
+    return {name: np.zeros(0, dtype=np.int32 if name in ("color_id", "area", "x", "y", "w", "h")
+                           else np.float32) for name in FIELDS}
+
+
+# 2値マスク1枚分のブロブ特徴量
+# cc_labels: 連結成分ラベルの出力先（mask と同じ大きさの int32、None なら毎回確保）
+def analyze_mask(mask, color_id=1, offset=(0, 0), cc_labels=None):
+    n, _, stats, centroids = cv2.connectedComponentsWithStats(mask, labels=cc_labels, connectivity=8,
+                                                              ltype=cv2.CV_32S)
+    if n <= 1:
+        return empty_blobs()
+    stats = stats[1:]
+    centroids = centroids[1:]
+
+    area = stats[:, cv2.CC_STAT_AREA]
+    w = stats[:, cv2.CC_STAT_WIDTH]
+    h = stats[:, cv2.CC_STAT_HEIGHT]
+    long_side = np.maximum(w, h).astype(np.float32)
+    short_side = np.minimum(w, h).astype(np.float32)
+    return {
+        "color_id": np.full(n - 1, color_id, dtype=np.int32),
+        "area": area.astype(np.int32),
+        "x": (stats[:, cv2.CC_STAT_LEFT] + offset[0]).astype(np.int32),
+        "y": (stats[:, cv2.CC_STAT_TOP] + offset[1]).astype(np.int32),
+        "w": w.astype(np.int32),
+        "h": h.astype(np.int32),
+        "cx": (centroids[:, 0] + offset[0]).astype(np.float32),
+        "cy": (centroids[:, 1] + offset[1]).astype(np.float32),
+        "radius": np.sqrt(area / np.pi).astype(np.float32),
+        "fill": (area / (w * h)).astype(np.float32),
+        "aspect": long_side / short_side,
+        "circularity": (area / (np.pi * (long_side / 2) ** 2)).astype(np.float32),
+    }
+
+
+def concat_blobs(parts):
+    if not parts:
+        return empty_blobs()
+    return {name: np.concatenate([p[name] for p in parts]) for name in FIELDS}
+
+
+# ラベル画像（0 = 背景）の全色分をまとめて解析する
+# 色ごとに連結成分を求めるので、隣接した別色のボールはつながらない
+# mask / cc_labels を渡すと作業用の画像をそこに書く（BufferPool のバッファ）
+def analyze_labels(labels, num_colors, offset=(0, 0), mask=None, cc_labels=None):
+    parts = []
+    for color_id in range(1, num_colors + 1):
+        mask = cv2.compare(labels, color_id, cv2.CMP_EQ, dst=mask)
+        parts.append(analyze_mask(mask, color_id, offset, cc_labels))
+    return concat_blobs(parts)
+
+
+# 条件を満たすブロブの添字を半径の大きい順に返す
+def select_blobs(blobs, min_area=300, min_circularity=0.0, max_aspect=None):
+    keep = blobs["area"] >= min_area
+    if min_circularity > 0:
+        keep &= blobs["circularity"] >= min_circularity
+    if max_aspect is not None:
+        keep &= blobs["aspect"] <= max_aspect
+    idx = np.flatnonzero(keep)
+    return idx[np.argsort(-blobs["radius"][idx], kind="stable")]
+
+
+def take_blobs(blobs, idx):
+    return {name: blobs[name][idx] for name in FIELDS}
@@ -0,0 +1,66 @@
+import numpy as np
+
+# 検出処理で使う中間画像（BallDetector の各段）
+STAGES = {
+    "blurred": 3,     # メディアンブラー後（3チャンネル）
+    "hsv": 3,         # HSV変換後
+    "labels": 1,      # 色ラベル画像
+    "combined": 1,    # 全色マスク
+    "cleaned": 1,     # ノイズ除去後のマスク
+    "color_mask": 1,  # 1色分のマスク
+}
+
+
+# -----------------------------
+# 中間画像のバッファプール
+# 段ごとに1本の平坦な配列を確保しておき、必要な形に reshape して dst= に渡す
+# （切り出し画像のように毎回サイズが変わっても、容量内なら再確保しない）
+# debug=True のときは OpenCV が渡したバッファを使わず新しい配列を返した段を数える
+# -----------------------------
+class BufferPool:
+    def __init__(self, frame_shape=None, debug=False):
+        self._flat = {}
+        self.debug = debug
+        self.frames = 0
+        self.allocs = {}  # 段ごとのプール内の確保回数
+        self.stray = {}   # 段ごとの「dst を使わずに確保された」回数
+        if frame_shape is not None:
+            self.reserve(frame_shape)
+
+    # キャプチャ解像度から各段のバッファを先に確保する
+    def reserve(self, frame_shape):
+        h, w = frame_shape[:2]
+        for name, ch in STAGES.items():
+            self.get(name, (h, w, ch) if ch > 1 else (h, w))
+
+    # 指定した形のバッファ（連続領域）を返す
+    def get(self, name, shape, dtype=np.uint8):
+        n = int(np.prod(shape))
+        key = (name, np.dtype(dtype))
+        flat = self._flat.get(key)
+        if flat is None or flat.size < n:
+            flat = np.empty(n, dtype=dtype)
+            self._flat[key] = flat
+            self.allocs[name] = self.allocs.get(name, 0) + 1
+        return flat[:n].reshape(shape)
+
+    # OpenCV の戻り値がプールのバッファかを確認して、そのまま返す
+    def check(self, name, buf, result):
+        if self.debug and result is not buf and not np.shares_memory(result, buf):
+            self.stray[name] = self.stray.get(name, 0) + 1
+        return result
+
+    def next_frame(self):
+        self.frames += 1
+
+    # フレームごとに確保が起きている段の一覧
+    def report(self):
+        lines = [f"フレーム数: {self.frames}"]
+        for name in sorted(set(self.allocs) | set(self.stray)):
+            allocs, stray = self.allocs.get(name, 0), self.stray.get(name, 0)
+            if stray > 0 or allocs > 1:
+                lines.append(f"  {name:<12} 確保 {allocs} 回 / dst 未使用 {stray} 回"
+                             f"（{stray / max(1, self.frames):.2f} 回/フレーム）")
+        if len(lines) == 1:
+            lines.append("  毎フレームの確保はありません")
+        return "\n".join(lines)
@@ -2,6 +2,8 @@ import cv2
 import numpy as np
 from matplotlib import pyplot as plt
 
+from buffer_pool import BufferPool
+
 CHECKERBOARD =( 7,7 )
 SQUARE_SIZE = 25
 
@@ -14,6 +16,10 @@ objp *= SQUARE_SIZE
 objpoints = []
 imgpoints = []
 
+# 表示用・グレースケールの画像は毎フレーム確保せずに使い回す
+pool = BufferPool()
+frame = None
+
 # === カメラ起動チェック付き設定 ===
 cap = cv2.VideoCapture(0)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
@@ -27,13 +33,14 @@ if not cap.isOpened():
 print("✅ カメラ接続成功。スペースキーでキャプチャ、ESCキーで終了")
 
 while True:
-    ret, frame = cap.read()
+    ret, frame = cap.read(frame)
     if not ret:
         print("❌ フレームを取得できませんでした。")
         break
 
-    display = frame.copy()
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    display = pool.get("display", frame.shape)
+    np.copyto(display, frame)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pool.get("gray", frame.shape[:2]))
 
     found, corners = cv2.findChessboardCorners(
         gray, CHECKERBOARD,
@@ -1,20 +1,40 @@
 import cv2
+from time import perf_counter
+
+from mjpeg import MjpegSource
 
 DEVICE_INDEX = 1 # /dev/video4 に対応
 
-cap = cv2.VideoCapture(DEVICE_INDEX)
-cap.set(cv2.CAP_PROP_FPS, 15)
+# 取得方法
+# "opencv": cap.read() の中で展開（1スレッド）
+# "mjpeg" : MJPEG の圧縮データを取得し、DECODE_WORKERS スレッドで並列に展開
+CAPTURE_MODE = "opencv"
+DECODE_WORKERS = 4
+DECODE_REDUCE = 1  # 1 / 2 / 4: 縮小して展開（表示だけなら 2 や 4 で十分）
+
+if CAPTURE_MODE == "mjpeg":
+    cap = MjpegSource(DEVICE_INDEX, fps=15, workers=DECODE_WORKERS, reduce=DECODE_REDUCE)
+else:
+    cap = cv2.VideoCapture(DEVICE_INDEX)
+    cap.set(cv2.CAP_PROP_FPS, 15)
 
 if not cap.isOpened():
     print("カメラを開けませんでした")
     exit()
+if CAPTURE_MODE == "mjpeg":
+    cap.start()
 
+prev = perf_counter()
 while True:
     ret, frame = cap.read()
     if not ret:
         print("フレームの取得に失敗しました")
         break
 
+    now = perf_counter()
+    print(f"FPS: {1 / (now - prev):.2f}  ", end='\r')
+    prev = now
+
     cv2.imshow('4K USB Camera', frame)
 
     if cv2.waitKey(1) & 0xFF == 27:  # ESCキーで終了
@@ -22,4 +42,3 @@ while True:
 
 cap.release()
 cv2.destroyAllWindows()
-
@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+from roi_tracker import BallTrack, RoiTracker
+
+# CamShift の反復条件
+CAMSHIFT_CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 1)
+
+# ヒストグラムに入れる画素の下限（彩度・明度が低い画素は色相が安定しないので除く）
+MIN_SATURATION = 40
+MIN_VALUE = 40
+
+
+# -----------------------------
+# 色ヒストグラム付きの追跡（BallTrack + ボールの H-S ヒストグラム）
+# -----------------------------
+class HistTrack(BallTrack):
+    def __init__(self, x, y, radius, color, hist):
+        super().__init__(x, y, radius, color)
+        self.hist = hist
+        self.confidence = 1.0  # 直近フレームの逆投影の平均（0〜1）
+
+
+# -----------------------------
+# ヒストグラム逆投影 + CamShift による追跡（RoiTracker と同じ使い方）
+# 全画面検出でボールが見つかったら、ボールの内側（color_check.py の中心 ROI と同じく
+# 縁を除いた範囲、半径 × inner の円）から H-S ヒストグラムを作る
+# 以降のフレームはカルマン予測の周辺の窓だけ HSV に変換し、calcBackProject → CamShift で追う
+# 窓内の逆投影の平均を信頼度とし、min_confidence を下回るフレームが max_misses 回続いたとき、
+# または refresh_interval フレームごとに検出器で全画面を検出し直す（ヒストグラムも作り直す）
+# 追跡中は色分類・ノイズ除去・輪郭を行わないので、処理量は窓の大きさだけで決まる
+# frame は BGR 画像（space="yuyv" の検出器を渡すと ValueError）
+# -----------------------------
+class CamShiftTracker(RoiTracker):
+    def __init__(self, detector, max_misses=3, refresh_interval=60, min_confidence=0.25, bins=(30, 32),
+                 inner=0.7, **kwargs):
+        if detector.classifier.space == "yuyv":
+            raise ValueError("CamShiftTracker は BGR 画像で追跡するので、space=\"yuyv\" の検出器とは使えません")
+        super().__init__(detector, max_misses=max_misses, refresh_interval=refresh_interval, **kwargs)
+        self.min_confidence = min_confidence
+        self.bins = list(bins)  # H, S のビン数
+        self.inner = inner
+
+    # ボールの内側の H-S ヒストグラム（0〜255 に正規化）
+    def _histogram(self, frame, x, y, radius):
+        h, w = frame.shape[:2]
+        ri = max(2, int(radius * self.inner))
+        x0, y0 = max(0, int(x) - ri), max(0, int(y) - ri)
+        x1, y1 = min(w, int(x) + ri + 1), min(h, int(y) + ri + 1)
+        hsv = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, (0, MIN_SATURATION, MIN_VALUE), (180, 255, 255))
+        circle = np.zeros_like(mask)
+        cv2.circle(circle, (int(x) - x0, int(y) - y0), ri, 255, -1)
+        cv2.bitwise_and(mask, circle, dst=mask)
+        hist = cv2.calcHist([hsv], [0, 1], mask, self.bins, [0, 180, 0, 256])
+        cv2.normalize(hist, hist, 0, 255, cv2.NORM_MINMAX)
+        return hist
+
+    def _new_track(self, frame, x, y, radius, color):
+        return HistTrack(x, y, radius, color, self._histogram(frame, x, y, radius))
+
+    # 全画面検出の後、検出できた追跡のヒストグラムを作り直す（照明の変化に追従）
+    def _full_scan(self, frame):
+        circles = super()._full_scan(frame)
+        for track in self.tracks:
+            if track.misses == 0:
+                x, y = track.center
+                track.hist = self._histogram(frame, x, y, track.radius)
+                track.confidence = 1.0
+        return circles
+
+    def _find_in_window(self, frame, track, window, predicted):
+        x0, y0, x1, y1 = window
+        x, y, r = predicted
+        hsv = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+        prob = cv2.calcBackProject([hsv], [0, 1], track.hist, [0, 180, 0, 256], 1)
+
+        # 初期窓は予測した円の外接矩形（窓内の座標）
+        h, w = prob.shape
+        bx, by = min(w - 1, max(0, int(x - r) - x0)), min(h - 1, max(0, int(y - r) - y0))
+        size = max(2, int(2 * r))
+        box = (bx, by, min(size, w - bx), min(size, h - by))
+        (cx, cy), (bw, bh), _ = cv2.CamShift(prob, box, CAMSHIFT_CRITERIA)[0]
+        if bw <= 0 or bh <= 0:
+            track.confidence = 0.0
+            return None
+
+        # 信頼度: 推定した円の外接矩形内の逆投影の平均
+        radius = (bw + bh) / 4
+        rx0, ry0 = max(0, int(cx - radius)), max(0, int(cy - radius))
+        rx1, ry1 = min(w, int(cx + radius) + 1), min(h, int(cy + radius) + 1)
+        track.confidence = float(prob[ry0:ry1, rx0:rx1].mean()) / 255 if rx1 > rx0 and ry1 > ry0 else 0.0
+        if track.confidence < self.min_confidence:
+            return None
+        return (float(cx) + x0, float(cy) + y0, float(radius), track.color)
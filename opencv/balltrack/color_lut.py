@@ -0,0 +1,180 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+# -----------------------------
+# 多色ラベル分類器（3次元ルックアップテーブル）
+# color_ranges の全色をひとつの量子化テーブルにまとめ、1回の参照で
+# ラベル画像（0 = 背景, 1 = 1色目, 2 = 2色目, ...）を作る
+#
+# color_ranges はどちらの形式でもよい
+#   {"red": (lower, upper), ...}                 ball_distance.py など
+#   {"red": [(lower, upper), (lower, upper)]}    tracking_deploy.py / 赤の折り返し
+# 範囲が重なる場合は先に書いた色が優先（重なりはテーブル作成時に表示し、overlaps に色の組ごとのセル数を残す）
+# -----------------------------
+
+# 各チャンネルの量子化ビット数（H は 0〜179 なので 8bit のまま）
+HSV_BITS = (8, 6, 6)
+BGR_BITS = (6, 6, 6)
+YUV_BITS = (6, 6, 6)
+
+# 共通の色範囲ファイル（hsv_tuner.py が書き、各トラッカーが読む）
+RANGES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "color_ranges.json")
+
+
+# color_ranges を [(色名, [(lower, upper), ...]), ...] に揃える
+def normalize_ranges(color_ranges):
+    result = []
+    for name, ranges in color_ranges.items():
+        if len(ranges) == 2 and np.asarray(ranges[0]).shape == (3,):
+            ranges = [ranges]
+        result.append((name, [(np.asarray(lo, dtype=np.int32), np.asarray(hi, dtype=np.int32))
+                              for lo, hi in ranges]))
+    return result
+
+
+# 色範囲ファイルを読む（{"red": [(lower, upper), ...], ...} の形式で返す）
+def load_color_ranges(path=RANGES_PATH):
+    with open(path) as f:
+        data = json.load(f)
+    return {name: [(np.array(lo), np.array(hi)) for lo, hi in ranges] for name, ranges in data.items()}
+
+
+# 共通の色範囲ファイルがあれば、そこに書いてある色を default（各スクリプトの color_ranges）より優先する
+# ファイルがない・path が None なら default をそのまま返す
+def shared_color_ranges(default, path=RANGES_PATH):
+    if path is None or not os.path.exists(path):
+        return default
+    color_ranges = dict(default)
+    color_ranges.update(load_color_ranges(path))
+    return color_ranges
+
+
+def save_color_ranges(color_ranges, path=RANGES_PATH):
+    data = {name: [(lo.tolist(), hi.tolist()) for lo, hi in ranges] for name, ranges in normalize_ranges(color_ranges)}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+class ColorClassifier:
+    # space="hsv": HSV画像をテーブルで分類
+    # space="bgr": BGR画像を直接分類（HSV変換を省略、テーブル作成時にHSVで判定）
+    # space="yuyv": カメラの YUYV 画像（h, w, 2）を直接分類（BGR への変換も省略）
+    #   テーブルの (Y, U, V) をカメラと同じ YUYV → BGR → HSV で変換して判定するので、
+    #   color_ranges は HSV のままでよい（U, V は横2画素で共有）
+    def __init__(self, color_ranges, space="hsv", bits=None):
+        if space not in ("hsv", "bgr", "yuyv"):
+            raise ValueError(f"未対応の色空間です: {space}")
+        self.space = space
+        if bits is None:
+            bits = {"hsv": HSV_BITS, "bgr": BGR_BITS, "yuyv": YUV_BITS}[space]
+        self.bits = tuple(bits)
+        self.shifts = tuple(8 - b for b in self.bits)
+        self.ranges = normalize_ranges(color_ranges)
+        if len(self.ranges) > 255:
+            raise ValueError("色の数は255までです")
+        self.names = [name for name, _ in self.ranges]
+        self.ids = {name: i + 1 for i, name in enumerate(self.names)}
+        self.table = self._build_table()
+        self._idx = None
+        self._tmp = None
+
+    # 各セルの代表値（セル中央）を色範囲で判定してテーブルを作る
+    def _build_table(self):
+        axes = [((np.arange(1 << b) << s) + ((1 << s) >> 1)).astype(np.int32)
+                for b, s in zip(self.bits, self.shifts)]
+        c0, c1, c2 = np.meshgrid(*axes, indexing="ij")
+
+        if self.space == "hsv":
+            h, s, v = c0, c1, c2
+        else:
+            if self.space == "bgr":
+                bgr = np.stack([c0, c1, c2], axis=-1).astype(np.uint8).reshape(1, -1, 3)
+            else:
+                # 各セルを Y0 U Y1 V の2画素として並べ、1画素目の変換結果を使う
+                yuyv = np.stack([c0, c1, c0, c2], axis=-1).astype(np.uint8).reshape(1, -1, 2)
+                bgr = cv2.cvtColor(yuyv, cv2.COLOR_YUV2BGR_YUYV)[:, 0::2]
+            hsv = cv2.cvtColor(np.ascontiguousarray(bgr), cv2.COLOR_BGR2HSV)
+            hsv = hsv.reshape(c0.shape + (3,)).astype(np.int32)
+            h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+
+        table = np.zeros(c0.shape, dtype=np.uint8)
+        hits = []
+        for name, ranges in self.ranges:
+            hit = np.zeros(c0.shape, dtype=bool)
+            for lo, hi in ranges:
+                hit |= ((h >= lo[0]) & (h <= hi[0]) &
+                        (s >= lo[1]) & (s <= hi[1]) &
+                        (v >= lo[2]) & (v <= hi[2]))
+            table[hit & (table == 0)] = self.ids[name]
+            hits.append(hit)
+
+        # 重なったセルは先に書いた色になる（inRange の色別マスクと違い、後の色はその画素を失う）
+        self.overlaps = {}
+        for i in range(len(hits)):
+            for j in range(i + 1, len(hits)):
+                n = int(np.count_nonzero(hits[i] & hits[j]))
+                if n:
+                    self.overlaps[(self.names[i], self.names[j])] = n
+                    print(f"色範囲が重なっています: {self.names[i]} と {self.names[j]} "
+                          f"（テーブルの {n} セル、先に書いた {self.names[i]} を優先）")
+        return table.ravel()
+
+    # 3チャンネル画像（yuyv のときは YUYV 画像）→ ラベル画像（uint8）
+    def classify(self, img, out=None):
+        if self.space == "yuyv":
+            return self._classify_yuyv(img, out)
+        shape = img.shape[:2]
+        n = shape[0] * shape[1]
+        # 作業用の配列は容量が足りないときだけ確保し直す（切り出し画像でサイズが変わっても再利用）
+        if self._idx is None or self._idx.size < n:
+            self._idx = np.empty(n, dtype=np.int32)
+            self._tmp = np.empty(n, dtype=np.int32)
+        idx, tmp = self._idx[:n].reshape(shape), self._tmp[:n].reshape(shape)
+
+        b0, b1, b2 = self.bits
+        s0, s1, s2 = self.shifts
+        np.right_shift(img[..., 0], s0, out=idx)
+        np.left_shift(idx, b1 + b2, out=idx)
+        np.right_shift(img[..., 1], s1, out=tmp)
+        np.left_shift(tmp, b2, out=tmp)
+        np.bitwise_or(idx, tmp, out=idx)
+        np.right_shift(img[..., 2], s2, out=tmp)
+        np.bitwise_or(idx, tmp, out=idx)
+
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        return np.take(self.table, idx, out=out, mode="clip")
+
+    # YUYV 画像（h, w, 2）の分類
+    # 横2画素（Y0 U Y1 V）ごとに U, V の部分を1回だけ計算し、Y0 / Y1 と組み合わせる
+    def _classify_yuyv(self, img, out=None):
+        h, w = img.shape[:2]
+        n = h * w
+        if self._idx is None or self._idx.size < n:
+            self._idx = np.empty(n, dtype=np.int32)
+            self._tmp = np.empty(n, dtype=np.int32)
+        quad = img.reshape(h, w // 2, 4)
+        idx = self._idx[:n].reshape(h, w // 2, 2)
+        uv = self._tmp[:n // 2].reshape(h, w // 2)
+
+        b0, b1, b2 = self.bits
+        s0, s1, s2 = self.shifts
+        np.right_shift(quad[..., 1], s1, out=uv)
+        np.left_shift(uv, b2, out=uv)
+        np.right_shift(quad[..., 3], s2, out=idx[..., 0])
+        np.bitwise_or(uv, idx[..., 0], out=uv)
+        for i, y in ((0, quad[..., 0]), (1, quad[..., 2])):
+            np.right_shift(y, s0, out=idx[..., i])
+            np.left_shift(idx[..., i], b1 + b2, out=idx[..., i])
+            np.bitwise_or(idx[..., i], uv, out=idx[..., i])
+
+        if out is None:
+            out = np.empty((h, w), dtype=np.uint8)
+        return np.take(self.table, idx.reshape(h, w), out=out, mode="clip")
+
+    # ラベル画像から1色分の2値マスク（0/255）を取り出す
+    def mask(self, labels, name, out=None):
+        return cv2.compare(labels, self.ids[name], cv2.CMP_EQ, dst=out)
@@ -0,0 +1,155 @@
+import json
+import os
+
+import numpy as np
+
+# 距離モデルの保存先（glaf_focal.py が書き、各トラッカーが読む）
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "distance_model.json")
+
+# 距離モデルの種類（px: 画像上のボール直径 [px]、D: 距離）
+#   "inverse"        : D = a / px（ピンホールモデル、a = ボール直径 × 焦点距離）
+#   "inverse_offset" : D = a / px + b（glaf_focal.py の近似式）
+#   "piecewise"      : 直径の範囲を区切り、区間ごとに 1/px の多項式
+MODELS = ("inverse", "inverse_offset", "piecewise")
+
+# 長さの単位と m に対する倍率
+UNITS = {"m": 1.0, "cm": 100.0, "mm": 1000.0}
+
+
+# -----------------------------
+# ボール直径 [px] → 距離のモデル
+# fit() で測定データから求め、save() / load() で JSON に保存する
+# 実行時は compile() で作った DistanceLUT を使い、全ボールの距離を1回の参照で求める
+# piecewise は knots（区間の境界 [px]）の外側では端の区間の多項式をそのまま使う
+# 測定データから求めたモデルは px_range（測定した直径の範囲）の外では外挿せず nan を返す
+# -----------------------------
+class DistanceModel:
+    def __init__(self, kind, coeffs, knots=None, unit="m", px_range=None):
+        if kind not in MODELS:
+            raise ValueError(f"未対応の距離モデルです: {kind}")
+        if unit not in UNITS:
+            raise ValueError(f"未対応の単位です: {unit}")
+        self.kind = kind
+        self.coeffs = [np.asarray(c, dtype=np.float64) for c in coeffs]  # 区間ごとの 1/px の多項式係数
+        self.knots = np.asarray(knots if knots is not None else [], dtype=np.float64)
+        self.unit = unit
+        self.px_range = tuple(px_range) if px_range is not None else None  # 測定データの直径の範囲
+
+    # ピンホールモデル（ball_diameter と同じ単位の距離を返す）
+    @classmethod
+    def pinhole(cls, focal_length, ball_diameter, unit="m"):
+        return cls("inverse", [[ball_diameter * focal_length, 0.0]], unit=unit)
+
+    # 測定データ（直径 [px], 距離）から係数を求める
+    # piecewise: segments 区間（各区間の測定点の数がほぼ同じになるよう区切る）、degree 次の多項式
+    @classmethod
+    def fit(cls, pixel_diams, distances, kind="inverse_offset", unit="m", segments=3, degree=2):
+        px = np.asarray(pixel_diams, dtype=np.float64)
+        d = np.asarray(distances, dtype=np.float64)
+        inv = 1.0 / px
+        px_range = (float(px.min()), float(px.max()))
+
+        if kind == "inverse":
+            a = float(np.dot(inv, d) / np.dot(inv, inv))
+            return cls(kind, [[a, 0.0]], unit=unit, px_range=px_range)
+        if kind == "inverse_offset":
+            return cls(kind, [np.polyfit(inv, d, 1)], unit=unit, px_range=px_range)
+        if kind != "piecewise":
+            raise ValueError(f"未対応の距離モデルです: {kind}")
+
+        order = np.argsort(px)
+        groups = np.array_split(order, segments)
+        if min(len(g) for g in groups) <= degree:
+            raise ValueError(f"区間ごとに {degree + 1} 点以上の測定データが必要です")
+        knots = [(px[a[-1]] + px[b[0]]) / 2 for a, b in zip(groups[:-1], groups[1:])]
+        coeffs = [np.polyfit(inv[g], d[g], degree) for g in groups]
+        return cls(kind, coeffs, knots, unit=unit, px_range=px_range)
+
+    # 直径 [px] → 距離（配列のまま計算、px <= 0 と px_range の外は nan）
+    def predict(self, pixel_diams):
+        px = np.asarray(pixel_diams, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv = np.where(px > 0, 1.0 / px, np.nan)
+        if self.px_range is not None:
+            inv[(px < self.px_range[0]) | (px > self.px_range[1])] = np.nan
+        if self.kind != "piecewise":
+            return np.polyval(self.coeffs[0], inv)
+        seg = np.searchsorted(self.knots, px)
+        result = np.empty(np.shape(px), dtype=np.float64)
+        for i, c in enumerate(self.coeffs):
+            sel = seg == i
+            result[sel] = np.polyval(c, inv[sel])
+        return result
+
+    # 測定データに対する誤差
+    def report(self, pixel_diams, distances):
+        d = np.asarray(distances, dtype=np.float64)
+        errors = self.predict(pixel_diams) - d
+        abs_errors = np.abs(errors)
+        return {
+            "kind": self.kind,
+            "mae": float(abs_errors.mean()),
+            "rmse": float(np.sqrt(np.mean(errors ** 2))),
+            "max": float(abs_errors.max()),
+            "max_rel": float(np.max(abs_errors / np.abs(d))),
+            "errors": errors,
+        }
+
+    def format_report(self, pixel_diams, distances):
+        r = self.report(pixel_diams, distances)
+        return (f"{r['kind']:<15} 平均誤差 {r['mae']:.4f} {self.unit}  RMSE {r['rmse']:.4f} {self.unit}  "
+                f"最大 {r['max']:.4f} {self.unit}（{r['max_rel'] * 100:.1f} %）")
+
+    # 密なルックアップテーブルにする（unit を指定するとその単位の距離を返す）
+    def compile(self, px_min=1.0, px_max=2048.0, step=0.05, unit=None):
+        px = px_min + step * np.arange(int(np.ceil((px_max - px_min) / step)) + 1)
+        factor = UNITS[unit] / UNITS[self.unit] if unit is not None else 1.0
+        table = (self.predict(px) * factor).astype(np.float32)
+        return DistanceLUT(table, px_min, step, unit if unit is not None else self.unit)
+
+    def to_dict(self):
+        return {"kind": self.kind, "coeffs": [c.tolist() for c in self.coeffs], "knots": self.knots.tolist(),
+                "unit": self.unit, "px_range": self.px_range}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["kind"], data["coeffs"], data.get("knots"), data.get("unit", "m"), data.get("px_range"))
+
+    def save(self, path=DEFAULT_PATH):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+# -----------------------------
+# 直径 [px] → 距離のルックアップテーブル（DistanceModel.compile() で作る）
+# px_min から step [px] 刻みの表で、最も近い刻みの値を返す（範囲外は端の値）
+# モデルの px_range の外の刻みは nan になる
+# -----------------------------
+class DistanceLUT:
+    def __init__(self, table, px_min, step, unit="m"):
+        self.table = np.asarray(table, dtype=np.float32)
+        self.px_min = float(px_min)
+        self.step = float(step)
+        self.unit = unit
+        self._idx = None
+
+    # 直径の配列 → 距離の配列（float32）
+    def lookup(self, pixel_diams, out=None):
+        px = np.asarray(pixel_diams, dtype=np.float32)
+        if self._idx is None or self._idx.size < px.size:
+            self._idx = np.empty(max(px.size, 64), dtype=np.intp)
+        idx = self._idx[:px.size].reshape(px.shape)
+        np.rint((px - self.px_min) / self.step, out=idx, casting="unsafe")
+        np.clip(idx, 0, len(self.table) - 1, out=idx)
+        if out is None:
+            out = np.empty(px.shape, dtype=np.float32)
+        return np.take(self.table, idx, out=out)
+
+    # 半径の配列 → 距離の配列（BallDetector の r をそのまま渡す）
+    def from_radius(self, radii, out=None):
+        return self.lookup(np.asarray(radii, dtype=np.float32) * 2, out)
@@ -0,0 +1,246 @@
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from ball_detector import BallDetector
+from bench_pyramid import BLUR_KSIZE, color_ranges
+from hough_roi import detect_circles_in_blobs
+from pyramid_detector import PyramidDetector
+
+# ラベル付きデータでの検出方法の一括評価（複数プロセスで並列実行）
+# 使い方: python evaluate.py [画像フォルダ or 動画ファイル or "-"] [プロセス数]
+#   scene_generator.py の出力フォルダ: frames.npy + labels.npy（そのままメモリマップで読む）
+#   画像フォルダ: labels.json（hsv_tuner.py と同じ形式、円 {"circle": [x, y, r]} か多角形）
+#   動画ファイル: 同じ名前の .json（キーはフレーム番号 "0", "1", ...）
+#   "-" または引数なし: bench_tracking.moving_frames の合成動画（正解位置つき）
+# 方法ごとに 検出率・誤検出数・中心/半径の誤差・1フレームの処理時間（p50/p95/p99）を表示し、
+# 検出率が MIN_RATE 以上の方法のうち最も速いものを示す
+# 処理時間は各プロセスで OpenCV を1スレッドにして計測する（プロセス間で CPU を取り合わないように）
+
+MIN_RATE = 0.9      # 「十分正確」とみなす検出率
+MATCH_RATIO = 0.5   # 正解との中心距離が 半径 × MATCH_RATIO 以下なら検出とみなす
+CHUNK = 16          # 1タスクあたりのフレーム数
+NUM_SYNTHETIC = 200
+MIN_VISIBLE = 0.5   # scene_generator のデータで、見えている割合がこれ未満のボールは正解に含めない
+
+
+# ---------- 検出方法（各プロセス内で作る） ----------
+# どれも frame → [(x, y, r, 色名), ...] の関数を返す
+
+def _lut_detector(space, method="contours"):
+    return BallDetector(color_ranges, space=space, blur_ksize=BLUR_KSIZE, method=method).detect
+
+
+# 色分類 + ノイズ除去 → 色ごとのマスクに detect_color(gray, mask) を適用する
+def _per_color(detect_color, need_gray=True):
+    detector = BallDetector(color_ranges, blur_ksize=BLUR_KSIZE)
+
+    def detect(frame):
+        labels = detector.segment(frame)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if need_gray else None
+        circles = []
+        for color in detector.colors:
+            mask = detector.classifier.mask(labels, color)
+            circles.extend((x, y, r, color) for x, y, r in detect_color(gray, mask))
+        return circles
+    return detect
+
+
+# 画像全体のハフ変換（tracking_deploy.py の "full" / hugh_min.py）
+def _hough_full(gray, mask):
+    masked = cv2.bitwise_and(gray, gray, mask=mask)
+    found = cv2.HoughCircles(masked, cv2.HOUGH_GRADIENT, dp=1.2, minDist=20,
+                             param1=100, param2=20, minRadius=5, maxRadius=120)
+    return [] if found is None else [tuple(map(float, c)) for c in found[0]]
+
+
+# Canny + 輪郭 + 最小外接円（tracking_findc.py の "canny"）
+def _canny(gray, mask):
+    contours, _ = cv2.findContours(cv2.Canny(mask, 50, 150), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    circles = []
+    for cnt in contours:
+        if cv2.contourArea(cnt) < 300:
+            continue
+        (x, y), radius = cv2.minEnclosingCircle(cnt)
+        circles.append((x, y, radius))
+    return circles
+
+
+METHODS = {
+    "hsv_contours": lambda: _lut_detector("hsv"),                # HSV マスク + 最小外接円
+    "bgr_contours": lambda: _lut_detector("bgr"),                # BGR マスク（HSV 変換なし）+ 最小外接円
+    "hsv_blobs": lambda: _lut_detector("hsv", "blobs"),          # 連結成分の統計量
+    "hough_full": lambda: _per_color(_hough_full),
+    "hough_roi": lambda: _per_color(lambda g, m: detect_circles_in_blobs(g, m, verify="hough")),
+    "hough_radial": lambda: _per_color(lambda g, m: detect_circles_in_blobs(g, m, verify="radial"),
+                                       need_gray=False),
+    "canny": lambda: _per_color(_canny, need_gray=False),
+    "pyramid": lambda: PyramidDetector(color_ranges, level=2, blur_ksize=BLUR_KSIZE).detect,
+}
+
+_detectors = {}
+
+
+# ---------- データセット ----------
+# ("images", [パス, ...]) または ("array", .npy のパス)（メモリマップで各プロセスが開く）
+
+def _circle(shape):
+    if isinstance(shape, dict):
+        return tuple(float(v) for v in shape["circle"])
+    (x, y), r = cv2.minEnclosingCircle(np.asarray(shape, dtype=np.float32))
+    return float(x), float(y), float(r)
+
+
+def _truth(entry):
+    return [_circle(s) + (color,) for color, shapes in entry.items() for s in shapes]
+
+
+def load_dataset(path):
+    if os.path.isfile(os.path.join(path, "frames.npy")):
+        from scene_generator import label_circles, load_scenes
+        _, labels, _ = load_scenes(path)
+        return ("array", os.path.join(path, "frames.npy")), [label_circles(row, MIN_VISIBLE) for row in labels]
+
+    if os.path.isdir(path):
+        with open(os.path.join(path, "labels.json")) as f:
+            labels = json.load(f)
+        paths = sorted(p for p in glob.glob(os.path.join(path, "*")) if os.path.basename(p) in labels)
+        return ("images", paths), [_truth(labels[os.path.basename(p)]) for p in paths]
+
+    # 動画はフレームを一度だけ展開して .npy に書く
+    with open(os.path.splitext(path)[0] + ".json") as f:
+        labels = json.load(f)
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, img = cap.read()
+        if not ret:
+            break
+        frames.append(img)
+    cap.release()
+    keep = [i for i in range(len(frames)) if str(i) in labels]
+    return _write_array([frames[i] for i in keep]), [_truth(labels[str(i)]) for i in keep]
+
+
+def synthetic_dataset(n):
+    from bench_tracking import moving_frames
+    frames, truth = moving_frames(n)
+    return _write_array(frames), [[(float(x), float(y), float(r), c) for x, y, r, c in balls] for balls in truth]
+
+
+def _write_array(frames):
+    fd, path = tempfile.mkstemp(suffix=".npy")
+    os.close(fd)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(len(frames),) + frames[0].shape)
+    for i, f in enumerate(frames):
+        out[i] = f
+    out.flush()
+    return ("array", path)
+
+
+def _frames(dataset, indices):
+    kind, source = dataset
+    if kind == "images":
+        return [cv2.imread(source[i]) for i in indices]
+    array = np.load(source, mmap_mode="r")
+    return [np.ascontiguousarray(array[i]) for i in indices]
+
+
+# ---------- 評価 ----------
+
+def _init_worker():
+    cv2.setNumThreads(1)
+
+
+# 1タスク分（1方法 × CHUNK フレーム）: [(フレーム番号, 検出結果, 処理時間 [ms]), ...]
+def _run_chunk(method, dataset, indices):
+    if method not in _detectors:
+        _detectors[method] = METHODS[method]()
+    detect = _detectors[method]
+    results = []
+    for i, frame in zip(indices, _frames(dataset, indices)):
+        start = time.perf_counter()
+        circles = detect(frame)
+        results.append((i, [(float(x), float(y), float(r), c) for x, y, r, c in circles],
+                        (time.perf_counter() - start) * 1000))
+    return method, results
+
+
+# 正解と検出を同色・近い順に1対1で対応付ける
+def match(circles, truth):
+    used, pairs = set(), []
+    for tx, ty, tr, tc in truth:
+        best, best_d = None, tr * MATCH_RATIO
+        for j, (x, y, r, c) in enumerate(circles):
+            d = np.hypot(x - tx, y - ty)
+            if c == tc and j not in used and d <= best_d:
+                best, best_d = j, d
+        if best is not None:
+            used.add(best)
+            pairs.append((best_d, abs(circles[best][2] - tr)))
+    return pairs, len(circles) - len(used)
+
+
+def summarize(results, truth):
+    center, radius, times, false_pos = [], [], [], 0
+    for i, circles, ms in results:
+        pairs, fp = match(circles, truth[i])
+        center += [p[0] for p in pairs]
+        radius += [p[1] for p in pairs]
+        false_pos += fp
+        times.append(ms)
+    total = sum(len(truth[i]) for i, _, _ in results)
+    t = np.array(times)
+    return {
+        "rate": len(center) / max(total, 1),
+        "false_pos": false_pos,
+        "center_err": float(np.mean(center)) if center else float("nan"),
+        "radius_err": float(np.mean(radius)) if radius else float("nan"),
+        "p50": float(np.percentile(t, 50)), "p95": float(np.percentile(t, 95)), "p99": float(np.percentile(t, 99)),
+    }
+
+
+def evaluate(dataset, truth, methods=None, workers=None):
+    methods = list(methods or METHODS)
+    chunks = [list(range(s, min(s + CHUNK, len(truth)))) for s in range(0, len(truth), CHUNK)]
+    collected = {m: [] for m in methods}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(_run_chunk, m, dataset, c) for m in methods for c in chunks]
+        for future in futures:
+            method, results = future.result()
+            collected[method].extend(results)
+    return {m: summarize(collected[m], truth) for m in methods}
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    dataset, truth = load_dataset(path) if path else synthetic_dataset(NUM_SYNTHETIC)
+    print(f"フレーム数: {len(truth)}  ボール数: {sum(len(t) for t in truth)}  "
+          f"プロセス数: {workers or os.cpu_count()}")
+
+    start = time.perf_counter()
+    try:
+        stats = evaluate(dataset, truth, workers=workers)
+    finally:
+        if dataset[0] == "array" and not (path and os.path.isdir(path)):  # 一時ファイルだけ消す
+            os.remove(dataset[1])
+    print(f"評価時間: {time.perf_counter() - start:.1f} s\n")
+
+    for name, s in sorted(stats.items(), key=lambda kv: kv[1]["p50"]):
+        print(f"{name:<13} 検出率 {s['rate'] * 100:5.1f} %  誤検出 {s['false_pos']:5d}  "
+              f"中心誤差 {s['center_err']:5.2f} px  半径誤差 {s['radius_err']:5.2f} px  "
+              f"p50 {s['p50']:7.2f} ms  p95 {s['p95']:7.2f} ms  p99 {s['p99']:7.2f} ms")
+    ok = [name for name, s in stats.items() if s["rate"] >= MIN_RATE]
+    if ok:
+        best = min(ok, key=lambda name: stats[name]["p50"])
+        print(f"\n検出率 {MIN_RATE * 100:.0f} % 以上で最速: {best}")
+    else:
+        print(f"\n検出率 {MIN_RATE * 100:.0f} % 以上の方法はありません")
@@ -0,0 +1,102 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+# フィールド定義（locaition/filed_ex_line.py が出力する形式）
+FIELD_MAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "..", "..", "locaition", "field_map.json")
+
+
+# field_map.json からフィールド領域の多角形 [mm] のリストを作る
+# 外枠（field_boundary の x_lines / y_lines の範囲）と、ゴール箱・スタート地点の矩形
+def load_field_polygons(path=FIELD_MAP_PATH):
+    with open(path, encoding="utf-8") as f:
+        elements = json.load(f)
+
+    polygons = []
+    boundary = elements.get("field_boundary")
+    if boundary is not None:
+        x0, x1 = min(boundary["x_lines"]), max(boundary["x_lines"])
+        y0, y1 = min(boundary["y_lines"]), max(boundary["y_lines"])
+        polygons.append(np.array([(x0, y0), (x1, y0), (x1, y1), (x0, y1)], dtype=np.float64))
+    for g in elements.get("goal_boxes", []):
+        x, y, w, h = g["x"], g["y"], g["w"], g["h"]
+        polygons.append(np.array([(x, y), (x + w, y), (x + w, y + h), (x, y + h)], dtype=np.float64))
+    return polygons
+
+
+# カメラの設置位置と向きから外部パラメータ（フィールド → カメラ）を作る
+# cam_pos: フィールド座標 [mm]（z は床からの高さ）
+# yaw_deg: 床面上の向き（x軸から反時計回り）, pitch_deg: 水平からの傾き（下向きが負）
+def camera_extrinsics(cam_pos, yaw_deg, pitch_deg):
+    yaw, pitch = np.deg2rad(yaw_deg), np.deg2rad(pitch_deg)
+    forward = np.array([np.cos(pitch) * np.cos(yaw), np.cos(pitch) * np.sin(yaw), np.sin(pitch)])
+    right = np.cross(forward, [0.0, 0.0, 1.0])
+    right /= np.linalg.norm(right)
+    down = np.cross(forward, right)
+    R_wc = np.stack([right, down, forward])
+    tvec = -R_wc @ np.asarray(cam_pos, dtype=np.float64)
+    rvec, _ = cv2.Rodrigues(R_wc)
+    return rvec, tvec.reshape(3, 1)
+
+
+# -----------------------------
+# フィールド領域マスク
+# フィールドの多角形を画像に投影して塗りつぶしたマスクと外接矩形を持つ
+# パラメータが変わったときだけ作り直す
+# 歪み補正済みの画像に使うときは dist_coeffs=None（camera_matrix は補正後のもの）
+# -----------------------------
+class FieldMask:
+    def __init__(self, polygons, camera_matrix, dist_coeffs, rvec, tvec, size, margin=20):
+        self.key = None
+        self.update(polygons, camera_matrix, dist_coeffs, rvec, tvec, size, margin)
+
+    def update(self, polygons, camera_matrix, dist_coeffs, rvec, tvec, size, margin=20):
+        key = (tuple(np.concatenate([np.ravel(p) for p in polygons])),
+               tuple(np.ravel(camera_matrix)),
+               None if dist_coeffs is None else tuple(np.ravel(dist_coeffs)),
+               tuple(np.ravel(rvec)), tuple(np.ravel(tvec)), tuple(size), margin)
+        if key == self.key:
+            return False
+        self.key = key
+
+        w, h = size
+        R_wc, _ = cv2.Rodrigues(np.asarray(rvec, dtype=np.float64))
+        t = np.asarray(tvec, dtype=np.float64).reshape(3, 1)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        for poly in polygons:
+            pts = self._densify(np.asarray(poly, dtype=np.float64))
+            world = np.hstack([pts, np.zeros((len(pts), 1))])
+            # カメラより後ろの点は投影できないので除く
+            in_front = (R_wc @ world.T + t)[2] > 1.0
+            if in_front.sum() < 3:
+                continue
+            img_pts, _ = cv2.projectPoints(world[in_front], rvec, tvec, camera_matrix, dist_coeffs)
+            img_pts = np.clip(img_pts.reshape(-1, 2), -4 * max(w, h), 4 * max(w, h))
+            hull = cv2.convexHull(img_pts.astype(np.float32)).astype(np.int32)
+            cv2.fillPoly(mask, [hull], 255)
+
+        if margin > 0:
+            k = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * margin + 1, 2 * margin + 1))
+            mask = cv2.dilate(mask, k)
+        self.mask = mask
+
+        x, y, bw, bh = cv2.boundingRect(mask)
+        self.rect = (x, y, x + bw, y + bh)  # (x0, y0, x1, y1)、フィールドが写らなければ空
+        return True
+
+    # 多角形の辺を細かく分割する（カメラ後方での切り取りと歪みのため）
+    @staticmethod
+    def _densify(poly, step=50.0):
+        pts = []
+        for a, b in zip(poly, np.roll(poly, -1, axis=0)):
+            n = max(1, int(np.ceil(np.linalg.norm(b - a) / step)))
+            pts.append(a + (b - a) * np.arange(n)[:, None] / n)
+        return np.concatenate(pts)
+
+    # 切り出し範囲 (x0, y0, w, h) とフィールドの外接矩形の共通部分
+    def clip(self, x0, y0, w, h):
+        fx0, fy0, fx1, fy1 = self.rect
+        return max(x0, fx0), max(y0, fy0), min(x0 + w, fx1), min(y0 + h, fy1)
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from virtual_camera import VirtualCamera, is_virtual
+
+# 取得フレーム（画像, 取得時刻[monotonic 秒], 通し番号）
+Frame = namedtuple("Frame", ["image", "timestamp", "seq"])
+
+
+# カメラを開いて設定する（各スクリプトの cap.set をまとめたもの）
+# convert_rgb=False なら BGR に変換せずカメラの生データを返す（fourcc="YUYV" と組み合わせる、yuyv.py）
+# device が動画ファイル・画像フォルダ・録画ファイル・"synthetic" なら VirtualCamera で開き、
+# pacing（"realtime" / "fast" / "step"）で再生の速さを決める（virtual_camera.py）
+def open_capture(device=0, width=None, height=None, fps=None, fourcc=None, buffer_size=1, convert_rgb=True,
+                 pacing="realtime"):
+    if is_virtual(device):
+        return VirtualCamera(device, width, height, fps, pacing=pacing, convert_rgb=convert_rgb)
+    cap = cv2.VideoCapture(device)
+    if fourcc is not None:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    if not convert_rgb:
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    if width is not None:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height is not None:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps is not None:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    if buffer_size is not None:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+    return cap
+
+
+# -----------------------------
+# 最新フレーム取得クラス
+# 専用スレッドでカメラを読み続け、事前に確保したリングバッファに書き込む
+# 利用側は常に最新のフレームだけを受け取る（読まれずに上書きされた分は dropped に数える）
+# 受け取った画像は次の get()/read() を呼ぶまで上書きされない
+# -----------------------------
+class FrameSource:
+    def __init__(self, device=0, width=None, height=None, fps=None, fourcc=None,
+                 buffer_size=1, ring_size=3, convert_rgb=True, pacing="realtime"):
+        if ring_size < 3:
+            raise ValueError("ring_size は3以上にしてください")
+        self.device = device
+        self.cap = open_capture(device, width, height, fps, fourcc, buffer_size, convert_rgb, pacing)
+        self.ring_size = ring_size
+
+        self._ring = [None] * ring_size
+        self._stamps = [0.0] * ring_size
+        self._seqs = [0] * ring_size
+        self._latest = -1    # 最新フレームのスロット
+        self._held = -1      # 利用側が使用中のスロット
+        self._last_seq = 0   # 利用側に最後に渡した通し番号
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.captured = 0    # 取得したフレーム数
+        self.dropped = 0     # 読まれずに捨てられたフレーム数
+        self.failed = False  # カメラからの取得に失敗した
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    # 最新スロットと使用中スロット以外から書き込み先を選ぶ
+    def _next_slot(self):
+        for i in range(1, self.ring_size + 1):
+            slot = (self._latest + i) % self.ring_size
+            if slot != self._latest and slot != self._held:
+                return slot
+
+    def _capture_loop(self):
+        seq = 0
+        while self._running:
+            with self._cond:
+                slot = self._next_slot()
+                buf = self._ring[slot]
+
+            if buf is None:
+                ret, img = self.cap.read()
+            else:
+                ret, img = self.cap.read(buf)
+            timestamp = time.monotonic()
+
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._running = False
+                    self._cond.notify_all()
+                    break
+                seq += 1
+                if self._latest >= 0 and self._seqs[self._latest] > self._last_seq:
+                    self.dropped += 1
+                self._ring[slot] = img
+                self._stamps[slot] = timestamp
+                self._seqs[slot] = seq
+                self._latest = slot
+                self.captured = seq
+                self._cond.notify_all()
+
+    def _has_new(self):
+        return self._latest >= 0 and self._seqs[self._latest] > self._last_seq
+
+    # 未読の最新フレームを返す（timeout 秒待っても来なければ None）
+    def get(self, timeout=3.0):
+        with self._cond:
+            self._cond.wait_for(lambda: self._has_new() or not self._running, timeout)
+            if not self._has_new():
+                return None
+            slot = self._latest
+            self._held = slot
+            self._last_seq = self._seqs[slot]
+            return Frame(self._ring[slot], self._stamps[slot], self._seqs[slot])
+
+    # cv2.VideoCapture.read と同じ形で返す
+    def read(self, timeout=3.0):
+        frame = self.get(timeout)
+        if frame is None:
+            return False, None
+        return True, frame.image
+
+    def release(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.cap.release()
@@ -1,6 +1,10 @@
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 
+from distance_model import MODELS, DistanceModel
+
 # --- データ ---
 distances = np.array([
     0.05, 0.10, 0.15, 0.20, 0.25, 0.30, 0.35, 0.40, 0.45, 0.50,
@@ -13,20 +17,37 @@ pixel_diams = np.array([
     55.59, 52.74, 49.91, 47.12
 ])
 
-# --- 近似計算 ---
-inv_pixel = 1 / pixel_diams
-a, b = np.polyfit(inv_pixel, distances, 1)
-estimated = a / pixel_diams + b
-errors = estimated - distances
-abs_errors = np.abs(errors)
+# 保存するモデル（distance_model.MODELS のどれか）
+# 保存は保存先を指定したときだけ（例: python glaf_focal.py distance_model.json）
+# トラッカーの DISTANCE_MODEL の例は distance_model.DEFAULT_PATH
+SAVE_KIND = "inverse_offset"
+SAVE_PATH = sys.argv[1] if len(sys.argv) > 1 else None
+
+# --- 近似計算（全モデルの誤差を表示） ---
+models = {kind: DistanceModel.fit(pixel_diams, distances, kind, unit="m") for kind in MODELS}
+for model in models.values():
+    print(model.format_report(pixel_diams, distances))
+
+model = models[SAVE_KIND]
+if SAVE_PATH is not None:
+    model.save(SAVE_PATH)
+    print(f"{SAVE_KIND} を {SAVE_PATH} に保存しました")
+
+estimated = model.predict(pixel_diams)
+abs_errors = np.abs(estimated - distances)
 mae = np.mean(abs_errors)
+if SAVE_KIND == "inverse_offset":
+    a, b = model.coeffs[0]
+    label = f"近似式: D = {a:.2f} / px + {b:.2f}"
+else:
+    label = f"近似: {SAVE_KIND}"
 
 # --- プロット ---
 fig, axs = plt.subplots(2, 1, figsize=(10, 8))
 
 # (1) 上段：距離 vs ピクセル直径
 axs[0].scatter(pixel_diams, distances, label="測定データ", color="blue", s=50)
-axs[0].plot(pixel_diams, estimated, label=f"近似式: D = {a:.2f} / px + {b:.2f}", color="red")
+axs[0].plot(pixel_diams, estimated, label=label, color="red")
 axs[0].invert_xaxis()
 axs[0].set_xlabel("Pixel Diameter [px]")
 axs[0].set_ylabel("Distance [m]")
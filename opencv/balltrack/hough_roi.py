@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+
+from blob_analysis import analyze_mask
+
+# -----------------------------
+# ブロブ周辺だけのハフ円検出
+# 色マスクのブロブを先に求め、その周辺の切り出しだけで HoughCircles を実行する
+# 半径の探索範囲はブロブの大きさから決める
+# verify="radial" のときはハフの代わりに円周上の点でマスクの内外を調べる簡易判定を使う
+# -----------------------------
+
+# 円周上の判定点（単位円）
+_ANGLES = np.linspace(0, 2 * np.pi, 32, endpoint=False)
+_UNIT = np.stack([np.cos(_ANGLES), np.sin(_ANGLES)], axis=1).astype(np.float32)
+
+
+# ブロブ1個分の切り出し範囲と半径範囲
+def blob_window(x, y, w, h, img_w, img_h, pad=0.3, min_radius=5, max_radius=120):
+    side = max(w, h)
+    margin = int(side * pad) + 4
+    x0, y0 = max(0, x - margin), max(0, y - margin)
+    x1, y1 = min(img_w, x + w + margin), min(img_h, y + h + margin)
+    r_min = max(min_radius, int(min(w, h) * 0.5 * 0.6))
+    r_max = min(max_radius, int(side * 0.5 * 1.3) + 2)
+    return (x0, y0, x1, y1), r_min, max(r_min + 1, r_max)
+
+
+# マスクの境界が円周に沿っているかを調べる（内側が前景・外側が背景の割合）
+def radial_test(mask, cx, cy, r, inner=0.8, outer=1.25, min_ratio=0.7):
+    h, w = mask.shape[:2]
+    pin = (_UNIT * (r * inner) + (cx, cy)).astype(np.int32)
+    pout = (_UNIT * (r * outer) + (cx, cy)).astype(np.int32)
+    ok_in = (pin[:, 0] >= 0) & (pin[:, 0] < w) & (pin[:, 1] >= 0) & (pin[:, 1] < h)
+    ok_out = (pout[:, 0] >= 0) & (pout[:, 0] < w) & (pout[:, 1] >= 0) & (pout[:, 1] < h)
+    inside = np.zeros(len(_UNIT), dtype=bool)
+    outside = np.ones(len(_UNIT), dtype=bool)
+    inside[ok_in] = mask[pin[ok_in, 1], pin[ok_in, 0]] > 0
+    outside[ok_out] = mask[pout[ok_out, 1], pout[ok_out, 0]] == 0
+    ratio = np.mean(inside & outside)
+    return ratio >= min_ratio, ratio
+
+
+# 1色分の円検出。[(x, y, r), ...] を返す
+# gray: グレースケール画像, mask: ノイズ除去済みの色マスク
+# radius_prior（RadiusPrior）を渡すと、行ごとの期待半径から外れたブロブを先に捨て、
+# ハフの半径範囲も切り出した行範囲の期待値で絞る
+def detect_circles_in_blobs(gray, mask, verify="hough", min_radius=5, max_radius=120,
+                            dp=1.2, min_dist=20, param1=100, param2=20, radius_prior=None):
+    img_h, img_w = mask.shape[:2]
+    blobs = analyze_mask(mask)
+    keep = blobs["area"] >= np.pi * min_radius ** 2 * 0.5
+    if radius_prior is not None:
+        keep &= radius_prior.accept(blobs["cy"], np.maximum(blobs["w"], blobs["h"]) / 2)
+    circles = []
+    for x, y, w, h, cx, cy in zip(blobs["x"][keep], blobs["y"][keep], blobs["w"][keep],
+                                  blobs["h"][keep], blobs["cx"][keep], blobs["cy"][keep]):
+        (x0, y0, x1, y1), r_min, r_max = blob_window(int(x), int(y), int(w), int(h), img_w, img_h,
+                                                     min_radius=min_radius, max_radius=max_radius)
+        if radius_prior is not None:
+            lo, hi = radius_prior.radius_range(y0, y1)
+            r_min, r_max = max(r_min, int(lo)), min(r_max, int(np.ceil(hi)))
+            if r_max <= r_min:
+                continue
+        if verify == "radial":
+            r = (w + h) / 4.0
+            ok, _ = radial_test(mask, cx, cy, r)
+            if ok:
+                circles.append((float(cx), float(cy), float(r)))
+            continue
+
+        # 切り出し範囲だけマスクをかけてハフ変換
+        masked_gray = cv2.bitwise_and(gray[y0:y1, x0:x1], gray[y0:y1, x0:x1], mask=mask[y0:y1, x0:x1])
+        found = cv2.HoughCircles(masked_gray, cv2.HOUGH_GRADIENT, dp=dp, minDist=min_dist,
+                                 param1=param1, param2=param2, minRadius=r_min, maxRadius=r_max)
+        if found is not None:
+            for fx, fy, fr in found[0]:
+                circles.append((float(fx) + x0, float(fy) + y0, float(fr)))
+    return circles
@@ -0,0 +1,281 @@
+import ast
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from color_lut import RANGES_PATH, load_color_ranges, save_color_ranges
+
+# ラベル付きの画像から HSV の色範囲を求める（color_check.py のトラックバー調整の代わり）
+# 使い方: python hsv_tuner.py 画像フォルダ [出力ファイル（既定: color_lut.RANGES_PATH）]
+#
+# ラベルは画像フォルダの labels.json に書く（画像ごと・色ごとに多角形 [[x, y], ...] か円）
+#   {"frame001.png": {"red": [[[100, 80], [140, 80], [140, 120], [100, 120]]],
+#                     "blue": [{"circle": [320, 240, 35]}]}, ...}
+# labels.json にない画像は masks/画像名_色.png（0 以外がボール）を使う
+# ラベルのない画素はすべて背景として扱う
+#
+# 画像を閾値処理し直すのではなく、色ごとの HSV の3次元ヒストグラムとその累積和（3次元の積分画像）
+# を1回だけ作り、箱 [H, S, V の上下限] の中の画素数を8点の参照で求める
+# 1軸ずつ「全ての (下限, 上限) の組」をまとめて評価し、F 値が最大の箱を探す（座標降下）
+# 赤のように H が 0 / 179 をまたぐ色は、ヒストグラムを回転させて探し、範囲を2つに分けて書き出す
+#
+# 比べる「現在の範囲」は、出力ファイルがあればその内容、なければ各トラッカーの color_ranges
+# 保存するときは出力ファイルの既存の色を残し、調整した色だけを書き換える
+
+# ヒストグラムのビン数（H はそのまま、S / V は 4 刻み）
+H_BINS, S_BINS, V_BINS = 180, 64, 64
+S_STEP, V_STEP = 256 // S_BINS, 256 // V_BINS
+
+BETA = 1.0          # F 値の重み（1 未満で適合率、1 より大きいと再現率を重視）
+IGNORE_BAND = 3     # ラベルの境界から何 px を集計から除くか（輪郭のにじみ対策）
+MAX_ITERATIONS = 10
+
+# 共通の色範囲ファイルがないときに比べるトラッカー（このフォルダのスクリプト）
+TRACKERS = ("tracking_one.py", "tracking_hyb1.py", "ball_distance.py", "ball_distance_pulas.py")
+
+
+# ---------- ラベル ----------
+
+def label_masks(image_path, shape, labels, colors):
+    name = os.path.basename(image_path)
+    masks = {}
+    if name in labels:
+        for color, shapes in labels[name].items():
+            mask = np.zeros(shape, dtype=np.uint8)
+            for s in shapes:
+                if isinstance(s, dict):
+                    x, y, r = s["circle"]
+                    cv2.circle(mask, (int(x), int(y)), int(r), 255, -1)
+                else:
+                    cv2.fillPoly(mask, [np.asarray(s, dtype=np.int32)], 255)
+            masks[color] = mask
+        return masks
+    stem = os.path.splitext(name)[0]
+    for color in colors:
+        path = os.path.join(os.path.dirname(image_path), "masks", f"{stem}_{color}.png")
+        mask = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if mask is not None:
+            masks[color] = np.where(mask > 0, 255, 0).astype(np.uint8)
+    return masks
+
+
+# ---------- 現在の範囲 ----------
+
+# スクリプトに書いてある color_ranges = {...} を読む
+# （import するとカメラを開いてしまうので、実行せずに構文木から値を取り出す）
+def script_color_ranges(path):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict)
+                and any(isinstance(t, ast.Name) and t.id == "color_ranges" for t in node.targets)):
+            # 値は (np.array([...]), np.array([...]))
+            return {ast.literal_eval(key): tuple(np.array(ast.literal_eval(call.args[0])) for call in value.elts)
+                    for key, value in zip(node.value.keys, node.value.values)}
+    return {}
+
+
+# 比べる範囲 {名前: color_ranges}
+def baseline_ranges(path):
+    if os.path.exists(path):
+        return {os.path.basename(path): load_color_ranges(path)}
+    folder = os.path.dirname(os.path.abspath(__file__))
+    baselines = {}
+    for name in TRACKERS:
+        script = os.path.join(folder, name)
+        if os.path.exists(script):
+            baselines[name] = script_color_ranges(script)
+    return baselines
+
+
+def as_range_list(ranges):
+    return [ranges] if len(ranges) == 2 and np.asarray(ranges[0]).shape == (3,) else list(ranges)
+
+
+# ---------- ヒストグラム ----------
+
+def hsv_bins(hsv):
+    h, s, v = hsv[..., 0].astype(np.int32), hsv[..., 1] // S_STEP, hsv[..., 2] // V_STEP
+    return ((h * S_BINS + s) * V_BINS + v).ravel()
+
+
+# 全画素のヒストグラムと色ごとのヒストグラム
+def build_histograms(image_paths, labels, colors):
+    n = H_BINS * S_BINS * V_BINS
+    total = np.zeros(n, dtype=np.int64)
+    positive = {c: np.zeros(n, dtype=np.int64) for c in colors}
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * IGNORE_BAND + 1,) * 2) if IGNORE_BAND else None
+    used = 0
+    for path in image_paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        masks = label_masks(path, img.shape[:2], labels, colors)
+        if not masks:
+            continue
+        used += 1
+        idx = hsv_bins(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+        valid = np.ones(idx.shape, dtype=bool)
+        if kernel is not None:
+            for mask in masks.values():
+                band = cv2.dilate(mask, kernel) > cv2.erode(mask, kernel)
+                valid &= ~band.ravel()
+        total += np.bincount(idx[valid], minlength=n)
+        for color, mask in masks.items():
+            if color in positive:
+                positive[color] += np.bincount(idx[valid & (mask.ravel() > 0)], minlength=n)
+    shape = (H_BINS, S_BINS, V_BINS)
+    return used, total.reshape(shape), {c: p.reshape(shape) for c, p in positive.items()}
+
+
+# 3次元の累積和（先頭に 0 を足す）
+def integral(hist):
+    sat = np.zeros(tuple(d + 1 for d in hist.shape), dtype=np.int64)
+    sat[1:, 1:, 1:] = hist.cumsum(0).cumsum(1).cumsum(2)
+    return sat
+
+
+# 箱 [lo, hi]（両端を含むビン番号、配列でもよい）の中の合計
+def box_sum(sat, lo, hi):
+    (h0, s0, v0), (h1, s1, v1) = lo, [np.asarray(x) + 1 for x in hi]
+    return (sat[h1, s1, v1] - sat[h0, s1, v1] - sat[h1, s0, v1] - sat[h1, s1, v0]
+            + sat[h0, s0, v1] + sat[h0, s1, v0] + sat[h1, s0, v0] - sat[h0, s0, v0])
+
+
+def f_score(tp, fp, positives, beta=BETA):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = tp / max(positives, 1)
+        b2 = beta * beta
+        return np.where(precision + recall > 0, (1 + b2) * precision * recall / (b2 * precision + recall), 0.0)
+
+
+# 累積分布の q 〜 1-q の範囲（初期値）
+def percentile_bounds(marginal, q=0.01):
+    c = np.cumsum(marginal) / max(marginal.sum(), 1)
+    return int(np.searchsorted(c, q)), int(min(np.searchsorted(c, 1 - q), len(marginal) - 1))
+
+
+# ---------- 探索 ----------
+
+# 1色分の箱を探す（戻り値は回転後の H のビン番号での lo, hi と回転量）
+def search_box(pos, total):
+    # H の最頻値が中央に来るよう回転（0 / 179 をまたぐ色のため）
+    shift = (H_BINS // 2 - int(np.argmax(pos.sum(axis=(1, 2))))) % H_BINS
+    pos = np.roll(pos, shift, axis=0)
+    total = np.roll(total, shift, axis=0)
+    sat_pos, sat_all = integral(pos), integral(total)
+    positives = int(pos.sum())
+
+    lo, hi = [0, 0, 0], [0, 0, 0]
+    for axis, other in enumerate([(1, 2), (0, 2), (0, 1)]):
+        lo[axis], hi[axis] = percentile_bounds(pos.sum(axis=other))
+
+    best = -1.0
+    for _ in range(MAX_ITERATIONS):
+        prev = (tuple(lo), tuple(hi))
+        for axis, n in enumerate(pos.shape):
+            # この軸の (下限, 上限) の全組をまとめて評価
+            a, b = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+            box_lo = [a if i == axis else lo[i] for i in range(3)]
+            box_hi = [b if i == axis else hi[i] for i in range(3)]
+            tp = box_sum(sat_pos, box_lo, box_hi)
+            fp = box_sum(sat_all, box_lo, box_hi) - tp
+            score = np.where(a <= b, f_score(tp, fp, positives), -1.0)
+            i, j = np.unravel_index(np.argmax(score), score.shape)
+            lo[axis], hi[axis] = int(i), int(j)
+            best = float(score[i, j])
+        if (tuple(lo), tuple(hi)) == prev:
+            break
+    return lo, hi, shift, best
+
+
+# 回転後のビン番号の箱 → HSV の範囲 [(lower, upper), ...]
+def box_to_ranges(lo, hi, shift):
+    s = (lo[1] * S_STEP, hi[1] * S_STEP + S_STEP - 1)
+    v = (lo[2] * V_STEP, hi[2] * V_STEP + V_STEP - 1)
+    h0, h1 = (lo[0] - shift) % H_BINS, (hi[0] - shift) % H_BINS
+    hue = [(h0, h1)] if h0 <= h1 else [(h0, H_BINS - 1), (0, h1)]
+    return [(np.array([a, s[0], v[0]]), np.array([b, s[1], v[1]])) for a, b in hue]
+
+
+# 範囲の中に入るビン（ビンの中央で判定）
+def ranges_volume(ranges):
+    h = np.arange(H_BINS)[:, None, None]
+    s = (np.arange(S_BINS) * S_STEP + S_STEP // 2)[None, :, None]
+    v = (np.arange(V_BINS) * V_STEP + V_STEP // 2)[None, None, :]
+    volume = np.zeros((H_BINS, S_BINS, V_BINS), dtype=bool)
+    for lo, hi in ranges:
+        volume |= ((h >= lo[0]) & (h <= hi[0]) & (s >= lo[1]) & (s <= hi[1]) & (v >= lo[2]) & (v <= hi[2]))
+    return volume
+
+
+# 範囲の適合率・再現率（ヒストグラムから計算）
+def evaluate(ranges, pos, total):
+    volume = ranges_volume(ranges)
+    tp = int(pos[volume].sum())
+    fp = int(total[volume].sum()) - tp
+    positives = int(pos.sum())
+    precision = tp / (tp + fp) if tp + fp > 0 else 0.0
+    recall = tp / positives if positives > 0 else 0.0
+    return precision, recall
+
+
+def format_ranges(ranges):
+    return " + ".join(f"{lo.tolist()}〜{hi.tolist()}" for lo, hi in ranges)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("使い方: python hsv_tuner.py 画像フォルダ [出力ファイル]")
+        sys.exit(1)
+    folder = sys.argv[1]
+    out_path = sys.argv[2] if len(sys.argv) > 2 else RANGES_PATH
+
+    labels_path = os.path.join(folder, "labels.json")
+    labels = {}
+    if os.path.exists(labels_path):
+        with open(labels_path) as f:
+            labels = json.load(f)
+    baselines = baseline_ranges(out_path)
+    colors = sorted({c for entry in labels.values() for c in entry}
+                    | {c for ranges in baselines.values() for c in ranges})
+    paths = sorted(p for p in glob.glob(os.path.join(folder, "*"))
+                   if os.path.splitext(p)[1].lower() in (".png", ".jpg", ".jpeg", ".bmp"))
+
+    start = time.perf_counter()
+    used, total, positive = build_histograms(paths, labels, colors)
+    t_hist = time.perf_counter() - start
+    print(f"ラベル付き画像: {used} 枚  ヒストグラム作成 {t_hist:.2f} s")
+
+    tuned = {}
+    for color in colors:
+        pos = positive[color]
+        if pos.sum() == 0:
+            continue
+        lo, hi, shift, score = search_box(pos, total)
+        tuned[color] = box_to_ranges(lo, hi, shift)
+        precision, recall = evaluate(tuned[color], pos, total)
+        print(f"[{color}] {format_ranges(tuned[color])}")
+        print(f"    調整後: 適合率 {precision * 100:6.2f} %  再現率 {recall * 100:6.2f} %  F {score:.3f}")
+        for name, ranges in baselines.items():
+            if color not in ranges:
+                continue
+            old = as_range_list(ranges[color])
+            precision, recall = evaluate(old, pos, total)
+            print(f"    現在  : 適合率 {precision * 100:6.2f} %  再現率 {recall * 100:6.2f} %  "
+                  f"{name}（{format_ranges(old)}）")
+    print(f"探索を含む合計 {time.perf_counter() - start:.2f} s")
+
+    if tuned:
+        # 出力ファイルにある、今回調整しなかった色はそのまま残す
+        merged = load_color_ranges(out_path) if os.path.exists(out_path) else {}
+        kept = [c for c in merged if c not in tuned]
+        merged.update(tuned)
+        save_color_ranges(merged, out_path)
+        print(f"{out_path} に保存しました" + (f"（そのまま: {', '.join(kept)}）" if kept else ""))
@@ -2,6 +2,8 @@ import cv2
 import numpy as np
 import time
 
+from buffer_pool import BufferPool
+
 # カメラ設定
 cap = cv2.VideoCapture('/dev/video4')
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
@@ -12,6 +14,13 @@ true_center = (640, 360)
 true_radius = 100  # px
 tolerance = 50     # 中心の許容誤差(px)
 
+# 赤の範囲（H=0付近で折り返すので2範囲）
+# 認識率を閾値どおりに測るため、量子化テーブル（color_lut）ではなく inRange で判定する
+lower_red1 = np.array([0, 100, 100])
+upper_red1 = np.array([10, 255, 255])
+lower_red2 = np.array([160, 100, 100])
+upper_red2 = np.array([179, 255, 255])
+
 def detect_circle_min_enclosing(mask):
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     if contours:
@@ -43,6 +52,11 @@ def is_circle_valid(center, radius, true_center, true_radius, tol=50, ratio_rang
 
 print("スペースキーで10秒間計測開始。ESCで終了。")
 
+# 中間画像は毎フレーム確保せずに使い回す（DEBUG_ALLOC=True で確保の残っている段を表示）
+DEBUG_ALLOC = False
+pool = BufferPool(debug=DEBUG_ALLOC)
+frame = None
+
 measuring = False
 start_time = None
 total_frames = 0
@@ -50,11 +64,13 @@ enclosing_correct = 0
 hough_correct = 0
 
 while True:
-    ret, frame = cap.read()
+    ret, frame = cap.read(frame)
     if not ret:
         break
+    pool.next_frame()
 
-    disp = frame.copy()
+    disp = pool.get("disp", frame.shape)
+    np.copyto(disp, frame)
     cv2.circle(disp, true_center, true_radius, (200, 200, 200), 2)
 
     key = cv2.waitKey(1) & 0xFF
@@ -76,15 +92,14 @@ while True:
                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
 
         # HSVマスク処理（赤色範囲）
-        blurred = cv2.GaussianBlur(frame, (5, 5), 0)
-        hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
-        lower_red1 = np.array([0, 100, 100])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([160, 100, 100])
-        upper_red2 = np.array([179, 255, 255])
-        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        mask = cv2.bitwise_or(mask1, mask2)
+        buf = pool.get("blurred", frame.shape)
+        blurred = pool.check("blurred", buf, cv2.GaussianBlur(frame, (5, 5), 0, dst=buf))
+        buf = pool.get("hsv", frame.shape)
+        hsv = pool.check("hsv", buf, cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV, dst=buf))
+        mask1 = cv2.inRange(hsv, lower_red1, upper_red1, dst=pool.get("mask1", frame.shape[:2]))
+        mask2 = cv2.inRange(hsv, lower_red2, upper_red2, dst=pool.get("mask2", frame.shape[:2]))
+        buf = pool.get("color_mask", frame.shape[:2])
+        mask = pool.check("color_mask", buf, cv2.bitwise_or(mask1, mask2, dst=buf))
 
         # ２手法で検出
         center_enclosing, radius_enclosing = detect_circle_min_enclosing(mask)
@@ -116,4 +131,6 @@ while True:
 
 cap.release()
 cv2.destroyAllWindows()
+if DEBUG_ALLOC:
+    print(pool.report())
 
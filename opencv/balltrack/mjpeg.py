@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from frame_source import Frame, open_capture
+from yuyv import yuyv_to_bgr
+
+# 縮小率ごとの imdecode のフラグ（JPEG は 1/2, 1/4, 1/8 で展開すると展開自体が軽くなる）
+# gray=True のときは色変換もしない（AprilTag 用）
+DECODE_FLAGS = {
+    (1, False): cv2.IMREAD_COLOR,
+    (2, False): cv2.IMREAD_REDUCED_COLOR_2,
+    (4, False): cv2.IMREAD_REDUCED_COLOR_4,
+    (8, False): cv2.IMREAD_REDUCED_COLOR_8,
+    (1, True): cv2.IMREAD_GRAYSCALE,
+    (2, True): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (4, True): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (8, True): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+def decode_flags(reduce=1, gray=False):
+    if (reduce, gray) not in DECODE_FLAGS:
+        raise ValueError(f"未対応の縮小率です: {reduce}（1, 2, 4, 8）")
+    return DECODE_FLAGS[(reduce, gray)]
+
+
+# -----------------------------
+# MJPEG の並列展開
+# imdecode の間は GIL が解放されるので、スレッドプールで複数フレームを同時に展開できる
+# submit() は Future を返し、呼び出した順に result() を取れば順番は保たれる
+# reduce=2 / 4 / 8 なら縮小して展開する（カメラ行列も 1/reduce にして使うこと）
+# 展開できなかったフレーム（壊れたデータ）は None になる
+# -----------------------------
+class MjpegDecoder:
+    def __init__(self, workers=4, reduce=1, gray=False):
+        self.flags = decode_flags(reduce, gray)
+        self.reduce = reduce
+        self.gray = gray
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    # 1フレーム展開する
+    # 既に展開済みの画像（CAP_PROP_CONVERT_RGB が効かず BGR で届いたもの、仮想カメラの YUYV）は
+    # 展開したときと同じ形式（BGR またはグレー、1/reduce）に揃えて返す
+    def decode(self, buf):
+        buf = np.asarray(buf)
+        if buf.ndim != 3:
+            return cv2.imdecode(buf.reshape(-1), self.flags)
+        if buf.shape[2] == 2:
+            img = yuyv_to_bgr(buf)
+        elif buf.shape[2] == 3:
+            img = buf
+        else:
+            raise ValueError(f"未対応のフレーム形式です: {buf.shape}")
+        if self.gray:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if self.reduce > 1:
+            h, w = img.shape[:2]
+            # 縮小展開と同じく端数は切り上げ
+            size = (-(-w // self.reduce), -(-h // self.reduce))
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        return img
+
+    def submit(self, buf):
+        if self._executor is not None:
+            return self._executor.submit(self.decode, buf)
+        future = Future()
+        future.set_result(self.decode(buf))
+        return future
+
+    # 順番どおりに展開結果を返す（ベンチマーク用）
+    def map(self, bufs):
+        if self._executor is None:
+            return map(self.decode, bufs)
+        return self._executor.map(self.decode, bufs)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# -----------------------------
+# MJPEG を展開せずに取得し、スレッドプールで展開するカメラ
+# 取得スレッドは圧縮データ（CAP_PROP_CONVERT_RGB=0）だけを読み、展開を待たずに次を読む
+# get() / read() は取得した順にフレームを返す（FrameSource と違い古いフレームも捨てない）
+# 展開待ちが max_pending 枚たまったら取得を待つ（カメラ側で古いフレームが捨てられる）
+# -----------------------------
+class MjpegSource:
+    def __init__(self, device=0, width=None, height=None, fps=None, workers=4, reduce=1, gray=False,
+                 max_pending=None, buffer_size=1):
+        self.device = device
+        self.cap = open_capture(device, width, height, fps, fourcc="MJPG", buffer_size=buffer_size,
+                                convert_rgb=False)
+        self.decoder = MjpegDecoder(workers, reduce, gray)
+        self.max_pending = max_pending if max_pending is not None else 2 * workers
+
+        self._pending = deque()  # (Future, 取得時刻, 通し番号)
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.captured = 0      # 取得したフレーム数
+        self.corrupt = 0       # 展開できなかったフレーム数
+        self.failed = False    # カメラからの取得に失敗した
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def _capture_loop(self):
+        seq = 0
+        while self._running:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) < self.max_pending or not self._running)
+                if not self._running:
+                    break
+
+            ret, buf = self.cap.read()
+            timestamp = time.monotonic()
+
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._running = False
+                    self._cond.notify_all()
+                    break
+                seq += 1
+                self._pending.append((self.decoder.submit(buf), timestamp, seq))
+                self.captured = seq
+                self._cond.notify_all()
+
+    # 次のフレームを取得順に返す（timeout 秒待っても来なければ None）
+    def get(self, timeout=3.0):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running, timeout)
+                if not self._pending:
+                    return None
+                future, timestamp, seq = self._pending.popleft()
+                self._cond.notify_all()
+            image = future.result(timeout)
+            if image is not None:
+                return Frame(image, timestamp, seq)
+            self.corrupt += 1
+
+    # cv2.VideoCapture.read と同じ形で返す
+    def read(self, timeout=3.0):
+        frame = self.get(timeout)
+        if frame is None:
+            return False, None
+        return True, frame.image
+
+    def release(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.decoder.close()
+        self.cap.release()
+
+
+# 圧縮データを連結した MJPEG ファイル（.mjpeg）をフレームごとの配列に分ける
+# SOI（FFD8）から次の EOI（FFD9）までを1フレームとする（サムネイル入りの JPEG には使えない）
+def split_mjpeg(raw):
+    data = np.frombuffer(raw, dtype=np.uint8)
+    frames = []
+    start = raw.find(b"\xff\xd8")
+    while start >= 0:
+        end = raw.find(b"\xff\xd9", start + 2)
+        if end < 0:
+            break
+        frames.append(data[start:end + 2])
+        start = raw.find(b"\xff\xd8", end + 2)
+    return frames
+
+
+def load_mjpeg(path):
+    with open(path, "rb") as f:
+        return split_mjpeg(f.read())
@@ -0,0 +1,288 @@
+import multiprocessing as mp
+import queue
+import signal
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# キューが満杯のときの扱い
+# "block"       : 空くまで待つ（前段が止まる）
+# "drop_oldest" : キュー内の一番古いフレームを捨てて新しいフレームを入れる（最新優先）
+# "drop_newest" : 新しいフレームを捨てる
+POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+# -----------------------------
+# 共有メモリ上のフレームリング
+# 固定サイズのスロットを slots 個並べた1つの共有メモリ
+# プロセス間ではスロット番号だけを渡し、画像そのものは複製しない
+# -----------------------------
+class FrameRing:
+    def __init__(self, slots, shape, dtype=np.uint8, name=None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    # 他のプロセスで開き直すための情報
+    def spec(self):
+        return self.shm.name, self.slots, self.shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, spec):
+        name, slots, shape, dtype = spec
+        return cls(slots, shape, dtype, name=name)
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# 処理段の定義
+# factory() は子プロセス内で呼ばれ、process(image) -> 結果 を返す（トップレベルの関数など pickle できるもの）
+# process に渡す画像は共有メモリのビューなので、戻り値に画像を含めないこと
+class Stage:
+    def __init__(self, name, factory, queue_size=2, policy="drop_oldest"):
+        if policy not in POLICIES:
+            raise ValueError(f"未対応のポリシーです: {policy}")
+        self.name = name
+        self.factory = factory
+        self.queue_size = queue_size
+        self.policy = policy
+
+
+# スロットの参照を1つ返し、誰も使わなくなったら空きスロットに戻す
+def _release(refs, free, slot):
+    with refs.get_lock():
+        refs[slot] -= 1
+        done = refs[slot] == 0
+    if done:
+        free.put(slot)
+
+
+# ポリシーに従ってキューに入れる（入れられなかったら False）
+def _offer(q, item, policy, refs, free, stop):
+    if policy == "block":
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        _release(refs, free, item[0])
+        return False
+    try:
+        q.put_nowait(item)
+        return True
+    except queue.Full:
+        pass
+    if policy == "drop_oldest":
+        try:
+            old = q.get_nowait()
+            if old is not None:
+                _release(refs, free, old[0])
+            q.put_nowait(item)
+            return True
+        except (queue.Empty, queue.Full):
+            pass
+    _release(refs, free, item[0])
+    return False
+
+
+# 取得プロセス: カメラ → （前処理）→ 空きスロット → 各段のキュー
+def _capture_main(source_factory, preprocess_factory, ring_spec, refs, free, stage_queues, policy,
+                  stop, counters):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 終了は親プロセスの stop() で行う
+    ring = FrameRing.attach(ring_spec)
+    source = source_factory()
+    preprocess = preprocess_factory() if preprocess_factory is not None else None
+    seq = 0
+    try:
+        while not stop.is_set():
+            ret, img = source.read()
+            if not ret:
+                break
+            timestamp = time.monotonic()
+            counters["captured"].value += 1
+
+            # 空きスロットがなければ（後段が追いつかない）待つか捨てる
+            slot = None
+            while slot is None and not stop.is_set():
+                try:
+                    slot = free.get(timeout=0.1) if policy == "block" else free.get_nowait()
+                except queue.Empty:
+                    if policy != "block":
+                        break
+            if slot is None:
+                counters["capture_dropped"].value += 1
+                continue
+
+            out = ring.frames[slot]
+            if preprocess is not None:
+                preprocess(img, out)
+            else:
+                np.copyto(out, img)
+
+            with refs.get_lock():
+                refs[slot] = len(stage_queues)
+            for q, stage_policy, dropped in stage_queues:
+                if not _offer(q, (slot, seq, timestamp), stage_policy, refs, free, stop):
+                    dropped.value += 1
+            seq += 1
+    finally:
+        stop.set()
+        for q, _, _ in stage_queues:
+            try:
+                q.put(None, timeout=0.5)
+            except queue.Full:
+                pass
+        if hasattr(source, "release"):
+            source.release()
+        ring.close()
+
+
+# 処理段プロセス: キュー → process(image) → 結果キュー
+def _stage_main(name, factory, ring_spec, q, results, refs, free, stop, processed, result_dropped):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ring = FrameRing.attach(ring_spec)
+    process = factory()
+    try:
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    break
+                continue
+            if item is None:
+                break
+            slot, seq, timestamp = item
+            try:
+                result = process(ring.frames[slot])
+            finally:
+                _release(refs, free, slot)
+            processed.value += 1
+            try:
+                results.put_nowait((name, seq, timestamp, time.monotonic() - timestamp, result))
+            except queue.Full:
+                result_dropped.value += 1
+    finally:
+        ring.close()
+
+
+# -----------------------------
+# 複数プロセスの処理パイプライン
+#   取得プロセス（カメラ取得・前処理）→ 共有メモリのリング → 各処理段のプロセス（並列）
+# 各段には同じフレームのスロット番号が配られ、全段が処理し終わるとスロットが再利用される
+# 結果は (段の名前, 通し番号, 取得時刻, 取得からの遅延 [s], 結果) として get() で受け取る
+# source_factory / preprocess_factory / Stage.factory は子プロセス内で呼ばれる
+# preprocess(img, out) は取得画像を処理して共有メモリのスロット out に書く（歪み補正など）
+# capture_policy: 空きスロットがないときの扱い（"block" または "drop_newest"）
+# 子プロセスが異常終了した（例外・強制終了、処理段が止める前に終了した）ときは running を見た時点で
+# 全体を止め、error に理由を残す
+# -----------------------------
+class Pipeline:
+    def __init__(self, source_factory, shape, stages, preprocess_factory=None, slots=None,
+                 capture_policy="drop_newest", result_queue_size=64, context="spawn"):
+        if capture_policy not in ("block", "drop_newest"):
+            raise ValueError(f"未対応のポリシーです: {capture_policy}")
+        ctx = mp.get_context(context)
+        self.stages = list(stages)
+        if slots is None:
+            # 全キューが埋まり、全段が1枚ずつ処理中でも取得側に空きが残る数
+            slots = sum(s.queue_size for s in self.stages) + len(self.stages) + 2
+        self.ring = FrameRing(slots, shape)
+        self._stop = ctx.Event()
+        self._refs = ctx.Array("i", slots)
+        self._free = ctx.Queue()
+        for i in range(slots):
+            self._free.put(i)
+        self._results = ctx.Queue(maxsize=result_queue_size)
+        self._queues = [ctx.Queue(maxsize=s.queue_size) for s in self.stages]
+        self.counters = {"captured": ctx.Value("l", 0, lock=False),
+                         "capture_dropped": ctx.Value("l", 0, lock=False)}
+        self._stage_counters = [(ctx.Value("l", 0, lock=False), ctx.Value("l", 0, lock=False),
+                                 ctx.Value("l", 0, lock=False)) for _ in self.stages]
+
+        stage_queues = [(q, s.policy, c[0]) for q, s, c in zip(self._queues, self.stages, self._stage_counters)]
+        self._capture = ctx.Process(target=_capture_main, name="capture", daemon=True,
+                                    args=(source_factory, preprocess_factory, self.ring.spec(),
+                                          self._refs, self._free, stage_queues, capture_policy,
+                                          self._stop, self.counters))
+        self._workers = [ctx.Process(target=_stage_main, name=s.name, daemon=True,
+                                     args=(s.name, s.factory, self.ring.spec(), q, self._results,
+                                           self._refs, self._free, self._stop, c[1], c[2]))
+                         for s, q, c in zip(self.stages, self._queues, self._stage_counters)]
+        self.error = None  # 異常終了したプロセスの説明（正常なら None）
+
+    def start(self):
+        for p in self._workers:
+            p.start()
+        self._capture.start()
+        return self
+
+    # 子プロセスの終了を調べ、異常終了していたら全体を止める
+    # 処理段は取得プロセスが止まるまで終わらないので、止める前に終わっていれば異常とみなす
+    def _supervise(self):
+        if self.error is not None:
+            return
+        for p in [self._capture] + self._workers:
+            code = p.exitcode
+            if code is None:
+                continue
+            if code != 0 or (p is not self._capture and not self._stop.is_set()):
+                self.error = f"{p.name} プロセスが終了しました（終了コード {code}）"
+                self._stop.set()
+                return
+
+    # 取得プロセスか処理段のプロセスが動いている間は True（どれかが異常終了したら False）
+    @property
+    def running(self):
+        self._supervise()
+        if self.error is not None:
+            return False
+        return self._capture.is_alive() or any(p.is_alive() for p in self._workers)
+
+    # 結果を1件受け取る（timeout 秒以内に来なければ None）
+    def get(self, timeout=0.1):
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self):
+        result = {name: c.value for name, c in self.counters.items()}
+        for s, (dropped, processed, result_dropped) in zip(self.stages, self._stage_counters):
+            result[s.name] = {"processed": processed.value, "dropped": dropped.value,
+                              "result_dropped": result_dropped.value}
+        return result
+
+    # 全プロセスを止めて共有メモリを解放する
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for p in [self._capture] + self._workers:
+            # 結果キューが詰まって子が終われないことがないよう読み捨てながら待つ
+            while p.is_alive() and time.monotonic() < deadline:
+                self.get(timeout=0.05)
+                p.join(timeout=0.05)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        for q in self._queues + [self._results, self._free]:
+            q.cancel_join_thread()
+            q.close()
+        self.ring.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,112 @@
+import copy
+import signal
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# 表示モード
+# "window"  : 従来どおり毎フレーム描画して imshow / waitKey（検出と同じスレッド）
+# "preview" : 別スレッドが最新のフレームと検出結果を rate [Hz] 以下で描画・表示
+# "none"    : 画面表示なし（ロボット上での実行用、Ctrl+C で終了）
+MODES = ("window", "preview", "none")
+
+
+# -----------------------------
+# 表示の切り替えと間引き表示
+# draw(image, result) は image に描画して {ウィンドウ名: 画像} を返す関数
+# window_flags（例: cv2.WINDOW_NORMAL）を指定すると、表示するスレッドで初回にウィンドウを作る
+# on_key を指定すると waitKey で押されたキー（ESC 以外）を渡す（例: virtual_camera.step_key）
+# show() は毎フレーム呼び、終了（ESC / Ctrl+C）が要求されたら False を返す
+# preview モードでは show() は表示の予定時刻のときだけフレームと結果を複製して渡し、
+# 描画と imshow / waitKey はすべて表示スレッドで行うので検出を待たせない
+# -----------------------------
+class PreviewRenderer:
+    def __init__(self, draw, mode="window", rate=5.0, window_flags=None, on_key=None):
+        if mode not in MODES:
+            raise ValueError(f"未対応の表示モードです: {mode}")
+        self.draw = draw
+        self.mode = mode
+        self.interval = 1.0 / rate if rate else 0.0
+        self.window_flags = window_flags
+        self.on_key = on_key
+        self._windows = set()
+        self.stop_requested = False
+        self.shown = 0  # 表示したフレーム数
+
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._pending = None
+        self._pending_buf = None  # show() が書き込むバッファ
+        self._spare = None        # 表示スレッドが描画中のバッファ
+        self._next_due = 0.0
+        self._thread = None
+
+        if mode == "preview":
+            self._thread = threading.Thread(target=self._render_loop, daemon=True)
+            self._thread.start()
+        elif mode == "none" and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._on_sigint)
+
+    def _on_sigint(self, signum, frame):
+        self.stop_requested = True
+
+    def _imshow(self, windows):
+        for name, img in windows.items():
+            if self.window_flags is not None and name not in self._windows:
+                cv2.namedWindow(name, self.window_flags)
+                self._windows.add(name)
+            cv2.imshow(name, img)
+        self.shown += 1
+
+    def show(self, image, result=None):
+        if self.mode == "window":
+            self._imshow(self.draw(image, result))
+            self._handle_key(cv2.waitKey(1))
+        elif self.mode == "preview":
+            now = time.monotonic()
+            if now >= self._next_due:
+                self._next_due = now + self.interval
+                self._submit(image, result)
+        return not self.stop_requested
+
+    def _submit(self, image, result):
+        with self._lock:
+            buf = self._pending_buf
+            if buf is None or buf.shape != image.shape or buf.dtype != image.dtype:
+                buf = self._pending_buf = np.empty_like(image)
+            np.copyto(buf, image)
+            self._pending = (buf, copy.deepcopy(result))
+        self._event.set()
+
+    def _render_loop(self):
+        while not self.stop_requested:
+            self._event.wait(0.05)
+            self._event.clear()
+            with self._lock:
+                item, self._pending = self._pending, None
+                if item is not None:
+                    # 描画中のバッファに次のフレームが書き込まれないよう入れ替える
+                    self._pending_buf, self._spare = self._spare, item[0]
+            if item is not None:
+                self._imshow(self.draw(*item))
+            # ウィンドウのイベント処理（表示していない間も応答させる）
+            self._handle_key(cv2.waitKey(1))
+        cv2.destroyAllWindows()
+
+    def _handle_key(self, key):
+        if key < 0:
+            return
+        if key & 0xFF == 27:
+            self.stop_requested = True
+        elif self.on_key is not None:
+            self.on_key(key)
+
+    def close(self):
+        self.stop_requested = True
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        elif self.mode == "window":
+            cv2.destroyAllWindows()
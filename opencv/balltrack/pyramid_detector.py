@@ -0,0 +1,80 @@
+import cv2
+
+from ball_detector import BallDetector, max_circle
+from yuyv import resize_yuyv
+
+
+# 奇数のカーネルサイズに丸める（最小3）
+def odd_ksize(k):
+    k = max(3, int(round(k)))
+    return k if k % 2 == 1 else k + 1
+
+
+# -----------------------------
+# 粗密（ピラミッド）ボール検出
+# 1/2^level に縮小した画像で候補を探し、元解像度では候補周辺の切り出しだけを精密検出する
+# level=2 で 1/4、level=3 で 1/8
+# 縮小画像の座標は画素の中心どうしで対応させて元解像度に戻す（x = (x' + 0.5) × 倍率 − 0.5）
+# space="yuyv" のときは frame に YUYV 画像を渡す（縮小も横2画素の組のまま行う）
+# -----------------------------
+class PyramidDetector:
+    def __init__(self, color_ranges, level=2, space="hsv", blur_ksize=5, morph_iterations=2,
+                 min_area=300, pad=1.5, classifier=None):
+        if level < 1:
+            raise ValueError("level は1以上にしてください")
+        self.level = level
+        self.scale = 1.0 / (1 << level)
+        self.pad = pad  # 切り出し窓の半幅 = 候補半径 × (1 + pad)
+
+        # 元解像度の検出器（切り出し用）
+        self.fine = BallDetector(color_ranges, space=space, blur_ksize=blur_ksize,
+                                 morph_iterations=morph_iterations, min_area=min_area,
+                                 classifier=classifier)
+        # 縮小画像用の検出器（ブラー・面積しきい値を縮小率に合わせる）
+        self.coarse = BallDetector(color_ranges, space=space, blur_ksize=odd_ksize(blur_ksize * self.scale),
+                                   morph_iterations=1, min_area=min_area * self.scale ** 2 * 0.5,
+                                   classifier=self.fine.classifier)
+        self.windows = []  # 直近フレームで精密検出した窓 (x0, y0, x1, y1)
+        self._small = None
+
+    @property
+    def colors(self):
+        return self.fine.colors
+
+    # 円を検出して [(x, y, radius, color), ...] を返す（BallDetector.detect と同じ形式）
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+        sw, sh = max(1, int(w * self.scale)), max(1, int(h * self.scale))
+        if self.fine.classifier.space == "yuyv":
+            sw = max(2, sw - sw % 2)
+            if self._small is None or self._small.shape[:2] != (sh, sw):
+                self._small = None
+            self._small = resize_yuyv(frame, (sw, sh), out=self._small)
+        else:
+            self._small = cv2.resize(frame, (sw, sh), dst=self._small, interpolation=cv2.INTER_AREA)
+        candidates = self.coarse.detect(self._small)
+
+        circles = []
+        self.windows = []
+        inv = 1.0 / self.scale
+        fx, fy = w / sw, h / sh  # 実際の縮小率（割り切れないときは inv と少し違う）
+        for cx, cy, cr, color in sorted(candidates, key=lambda c: -c[2]):
+            x, y, r = (cx + 0.5) * fx - 0.5, (cy + 0.5) * fy - 0.5, cr * inv
+            # すでに精密検出した円に含まれる候補は飛ばす
+            if any((x - px) ** 2 + (y - py) ** 2 < pr ** 2 and color == pcolor
+                   for px, py, pr, pcolor in circles):
+                continue
+
+            half = r * (1 + self.pad) + inv
+            x0, y0 = max(0, int(x - half)), max(0, int(y - half))
+            x1, y1 = min(w, int(x + half) + 1), min(h, int(y + half) + 1)
+            self.windows.append((x0, y0, x1, y1))
+            found = [c for c in self.fine.detect(frame[y0:y1, x0:x1], offset=(x0, y0))
+                     if c[3] == color]
+            if found:
+                circles.append(min(found, key=lambda c: (c[0] - x) ** 2 + (c[1] - y) ** 2))
+        return circles
+
+    # 従来の max_circle 形式（半径最大の円）で返す
+    def detect_max(self, frame):
+        return max_circle(self.detect(frame))
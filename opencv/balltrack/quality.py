@@ -0,0 +1,90 @@
+from collections import deque
+
+import numpy as np
+
+# ボール検出の品質レベル（先頭が最高品質、後ろほど軽い）
+# 先頭はトラッカーの通常の設定（ブラー 5、ノイズ除去 2回、全画面）と同じにする
+#   scale : 処理解像度（元画像に対する倍率）
+#   blur  : メディアンブラーのカーネルサイズ（軽いレベルでは 3 にして時間を減らす）
+#   morph : ノイズ除去（オープニング）の回数
+#   scan  : "full" = 毎フレーム全画面, "roi" = 追跡中は予測位置の周辺だけ
+LEVELS = (
+    {"scale": 1.0, "blur": 5, "morph": 2, "scan": "full"},
+    {"scale": 1.0, "blur": 5, "morph": 2, "scan": "roi"},
+    {"scale": 1.0, "blur": 3, "morph": 1, "scan": "roi"},
+    {"scale": 0.5, "blur": 3, "morph": 1, "scan": "roi"},
+)
+
+# AprilTag だけを処理するスクリプト用の品質レベル（quad_decimate だけを変える）
+#   decimate : AprilTag の quad_decimate（大きいほど速く、遠くのタグを見落としやすい）
+TAG_LEVELS = tuple({"decimate": d} for d in (1.0, 1.5, 2.0, 3.0))
+
+
+# pyapriltags の Detector の quad_decimate を変更する
+def set_tag_decimation(tag_detector, decimate):
+    tag_detector.tag_detector_ptr.contents.quad_decimate = float(decimate)
+
+
+# -----------------------------
+# 目標周期を守るための品質制御
+# 1フレームの処理時間 [ms] を update() に渡すと、直近 window フレームの中央値で判定し、
+#   目標を超えた状態が down_frames フレーム続いたら 1段軽くする
+#   目標 × up_ratio を下回る状態が up_frames フレーム続いたら 1段重くする
+# 上げ下げの判定を非対称にし、変更直後 cooldown フレームは判定しないので振動しない
+# settings は現在の設定（level を含む dict）で、検出結果と一緒に下流へ渡す
+# -----------------------------
+class QualityController:
+    def __init__(self, target_ms=33.0, levels=LEVELS, level=0, window=15, down_frames=3, up_frames=45,
+                 up_ratio=0.7, cooldown=15):
+        self.target_ms = target_ms
+        self.levels = levels
+        self.level = level
+        self.window = deque(maxlen=window)
+        self.down_frames = down_frames
+        self.up_frames = up_frames
+        self.up_ratio = up_ratio
+        self.cooldown = cooldown
+        self._over = 0
+        self._under = 0
+        self._wait = 0
+        self.changes = 0  # レベルを変更した回数
+
+    @property
+    def settings(self):
+        return dict(self.levels[self.level], level=self.level)
+
+    # 処理時間を記録し、レベルを変更したら True を返す
+    def update(self, elapsed_ms):
+        self.window.append(elapsed_ms)
+        if self._wait > 0:
+            self._wait -= 1
+            return False
+
+        recent = float(np.median(self.window))
+        self._over = self._over + 1 if recent > self.target_ms else 0
+        self._under = self._under + 1 if recent < self.target_ms * self.up_ratio else 0
+
+        if self._over >= self.down_frames and self.level < len(self.levels) - 1:
+            return self._set_level(self.level + 1)
+        if self._under >= self.up_frames and self.level > 0:
+            return self._set_level(self.level - 1)
+        return False
+
+    def _set_level(self, level):
+        self.level = level
+        self._over = self._under = 0
+        self._wait = self.cooldown
+        self.window.clear()
+        self.changes += 1
+        return True
+
+    # 設定を検出器に反映する
+    # detector は BallDetector（LEVELS のとき）、tag_detector は pyapriltags の Detector（TAG_LEVELS のとき）
+    def apply(self, detector=None, tag_detector=None):
+        s = self.levels[self.level]
+        if detector is not None:
+            detector.scale = s["scale"]
+            detector.blur_ksize = s["blur"]
+            detector.morph_iterations = s["morph"]
+        if tag_detector is not None:
+            set_tag_decimation(tag_detector, s["decimate"])
@@ -0,0 +1,61 @@
+import numpy as np
+
+# -----------------------------
+# 画像の行ごとのボール半径の期待値
+# 床に置かれたボールを固定カメラで見るとき、画像の行（縦位置）から床までの距離が決まり、
+# ボールの見かけの半径もほぼ決まる。行ごとの許容範囲を表にしておき、
+# 範囲外のブロブは重い処理の前に捨てる
+#
+# カメラ姿勢は locaition/sim_*.py と同じ（高さ 約0.8 m、ピッチ -70°＝光軸が鉛直から20°）
+# 長さの単位は camera_height と ball_diameter で揃える（例: どちらも m）
+# -----------------------------
+class RadiusPrior:
+    def __init__(self, camera_matrix, image_height, camera_height=0.80, pitch_deg=-70.0,
+                 ball_diameter=0.055, tolerance=0.4):
+        self.key = None
+        self.update(camera_matrix, image_height, camera_height, pitch_deg, ball_diameter, tolerance)
+
+    # パラメータが変わったときだけ表を作り直す（作り直したら True）
+    def update(self, camera_matrix, image_height, camera_height=0.80, pitch_deg=-70.0,
+               ball_diameter=0.055, tolerance=0.4):
+        camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        key = (tuple(camera_matrix.ravel()), int(image_height), float(camera_height),
+               float(pitch_deg), float(ball_diameter), float(tolerance))
+        if key == self.key:
+            return False
+        self.key = key
+
+        fy, cy = camera_matrix[1, 1], camera_matrix[1, 2]
+        ball_r = ball_diameter / 2
+        rows = np.arange(int(image_height), dtype=np.float64)
+
+        # 光軸からの角度（上向きが正）と鉛直からの角度
+        beta = np.arctan((cy - rows) / fy)
+        alpha = np.deg2rad(90.0 + pitch_deg) + beta
+
+        # 床上のボール中心までの視線距離（地平線より上の行にはボールは写らない）
+        valid = alpha < np.deg2rad(89.0)
+        dist = (camera_height - ball_r) / np.cos(np.where(valid, alpha, 0.0))
+        expected = np.where(valid, fy * ball_r / (dist * np.cos(beta)), 0.0)
+
+        self.expected = expected.astype(np.float32)
+        self.r_min = (expected * (1 - tolerance)).astype(np.float32)
+        self.r_max = (expected * (1 + tolerance)).astype(np.float32)
+        return True
+
+    # 中心の行と半径から、期待範囲内のものを True にした配列を返す
+    def accept(self, cy, r):
+        rows = np.clip(np.asarray(cy, dtype=np.int32), 0, len(self.expected) - 1)
+        r = np.asarray(r)
+        return (r >= self.r_min[rows]) & (r <= self.r_max[rows])
+
+    # 行範囲 [y0, y1) で取りうる半径の範囲（ハフの minRadius / maxRadius 用）
+    def radius_range(self, y0, y1):
+        y0 = max(0, int(y0))
+        y1 = min(len(self.expected), max(y0 + 1, int(y1)))
+        return float(self.r_min[y0:y1].min()), float(self.r_max[y0:y1].max())
+
+    # 画像を n 個の行帯に分けた (y0, y1, 最小半径, 最大半径) のリスト
+    def bands(self, n=8):
+        edges = np.linspace(0, len(self.expected), n + 1).astype(int)
+        return [(int(y0), int(y1)) + self.radius_range(y0, y1) for y0, y1 in zip(edges[:-1], edges[1:])]
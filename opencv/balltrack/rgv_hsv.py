@@ -2,6 +2,8 @@ import cv2
 import numpy as np
 import time
 
+from buffer_pool import BufferPool
+
 # カメラ設定
 cap = cv2.VideoCapture('/dev/video4')
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
@@ -13,21 +15,27 @@ true_center = (640, 360)
 true_radius = 100  # 画面上での想定ボール半径 [px]
 tolerance = 50
 
+# 赤の範囲（H=0付近で折り返すので2範囲）
+# 認識率を閾値どおりに測るため、量子化テーブル（color_lut）ではなく inRange で判定する
+lower_red1 = np.array([0, 100, 100])
+upper_red1 = np.array([10, 255, 255])
+lower_red2 = np.array([160, 100, 100])
+upper_red2 = np.array([179, 255, 255])
+
+# 中間画像は毎フレーム確保せずに使い回す
+pool = BufferPool()
+lower_red = np.array([0, 0, 150])
+upper_red = np.array([100, 100, 255])
+
 def detect_ball_hsv(frame):
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    lower_red1 = np.array([0, 100, 100])
-    upper_red1 = np.array([10, 255, 255])
-    lower_red2 = np.array([160, 100, 100])
-    upper_red2 = np.array([179, 255, 255])
-    mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-    mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-    mask = cv2.bitwise_or(mask1, mask2)
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=pool.get("hsv", frame.shape))
+    mask1 = cv2.inRange(hsv, lower_red1, upper_red1, dst=pool.get("mask1", frame.shape[:2]))
+    mask2 = cv2.inRange(hsv, lower_red2, upper_red2, dst=pool.get("mask2", frame.shape[:2]))
+    mask = cv2.bitwise_or(mask1, mask2, dst=pool.get("color_mask", frame.shape[:2]))
     return detect_circle(mask)
 
 def detect_ball_rgb(frame):
-    lower_red = np.array([0, 0, 150])
-    upper_red = np.array([100, 100, 255])
-    mask = cv2.inRange(frame, lower_red, upper_red)
+    mask = cv2.inRange(frame, lower_red, upper_red, dst=pool.get("rgb_mask", frame.shape[:2]))
     return detect_circle(mask)
 
 def detect_circle(mask):
@@ -57,12 +65,15 @@ rgb_total = 0
 
 print("スペースキーで10秒間計測を開始します")
 
+frame = None
+
 while True:
-    ret, frame = cap.read()
+    ret, frame = cap.read(frame)
     if not ret:
         break
 
-    disp = frame.copy()
+    disp = pool.get("disp", frame.shape)
+    np.copyto(disp, frame)
     cv2.circle(disp, true_center, true_radius, (200, 200, 200), 2)
     cv2.putText(disp, "Press SPACE to start 10s test", (30, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
     cv2.imshow("Detection", disp)
@@ -71,7 +82,7 @@ while True:
     if key == 32:  # SPACE
         start = time.time()
         while time.time() - start < 10:
-            ret, frame = cap.read()
+            ret, frame = cap.read(frame)
             if not ret:
                 break
 
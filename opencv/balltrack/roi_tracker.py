@@ -0,0 +1,151 @@
+import cv2
+import numpy as np
+
+
+# -----------------------------
+# ボール1個分の等速カルマンフィルタ
+# 状態: [cx, cy, r, vx, vy, vr]（1フレームあたりの変化量）
+# -----------------------------
+class BallTrack:
+    def __init__(self, x, y, radius, color):
+        kf = cv2.KalmanFilter(6, 3)
+        kf.transitionMatrix = np.array([
+            [1, 0, 0, 1, 0, 0],
+            [0, 1, 0, 0, 1, 0],
+            [0, 0, 1, 0, 0, 1],
+            [0, 0, 0, 1, 0, 0],
+            [0, 0, 0, 0, 1, 0],
+            [0, 0, 0, 0, 0, 1],
+        ], dtype=np.float32)
+        kf.measurementMatrix = np.eye(3, 6, dtype=np.float32)
+        kf.processNoiseCov = np.diag([1, 1, 0.5, 4, 4, 0.5]).astype(np.float32)
+        kf.measurementNoiseCov = np.diag([2, 2, 2]).astype(np.float32)
+        kf.errorCovPost = np.eye(6, dtype=np.float32) * 10
+        kf.statePost = np.array([[x], [y], [radius], [0], [0], [0]], dtype=np.float32)
+        self.kf = kf
+        self.color = color
+        self.misses = 0
+
+    # 次フレームの (cx, cy, r, vx, vy) を予測
+    def predict(self):
+        s = self.kf.predict()
+        return float(s[0, 0]), float(s[1, 0]), float(s[2, 0]), float(s[3, 0]), float(s[4, 0])
+
+    def correct(self, x, y, radius):
+        self.kf.correct(np.array([[x], [y], [radius]], dtype=np.float32))
+        self.misses = 0
+
+    @property
+    def center(self):
+        return float(self.kf.statePost[0, 0]), float(self.kf.statePost[1, 0])
+
+    @property
+    def radius(self):
+        return float(self.kf.statePost[2, 0])
+
+
+# -----------------------------
+# 予測窓（ROI）追跡
+# 追跡中はカルマン予測の周辺だけを検出し、
+# max_misses 回続けて見失ったときと refresh_interval フレームごとに全画面を検出する
+# -----------------------------
+class RoiTracker:
+    def __init__(self, detector, max_misses=5, refresh_interval=30, margin=2.5,
+                 min_half_size=40, max_tracks=6, match_distance=80):
+        self.detector = detector
+        self.max_misses = max_misses
+        self.refresh_interval = refresh_interval
+        self.margin = margin                # 窓の半幅 = 半径 × margin + 移動量
+        self.min_half_size = min_half_size  # 窓の最小半幅 [px]
+        self.max_tracks = max_tracks
+        self.match_distance = match_distance
+
+        self.tracks = []
+        self.frame_count = 0
+        self.force_full = True
+        self.full_scan = False  # 直近フレームが全画面検出だったか
+        self.windows = []       # 直近フレームで処理した窓 (x0, y0, x1, y1)
+        self.pixels = 0         # 直近フレームで処理した画素数
+
+    # 検出結果 [(x, y, radius, color), ...] を返す
+    def update(self, frame):
+        h, w = frame.shape[:2]
+        self.frame_count += 1
+        if self.force_full or not self.tracks or self.frame_count % self.refresh_interval == 0:
+            return self._full_scan(frame)
+
+        circles = []
+        self.windows = []
+        self.pixels = 0
+        for track in self.tracks:
+            x, y, r, vx, vy = track.predict()
+            half = max(self.min_half_size, r * self.margin + max(abs(vx), abs(vy)))
+            x0, y0 = max(0, int(x - half)), max(0, int(y - half))
+            x1, y1 = min(w, int(x + half) + 1), min(h, int(y + half) + 1)
+            if x1 - x0 < 8 or y1 - y0 < 8:
+                track.misses += 1
+                continue
+
+            self.windows.append((x0, y0, x1, y1))
+            self.pixels += (x1 - x0) * (y1 - y0)
+            found = self._find_in_window(frame, track, (x0, y0, x1, y1), (x, y, r))
+            if found is not None:
+                track.correct(found[0], found[1], found[2])
+                circles.append(found)
+            else:
+                track.misses += 1
+
+        # 見失い続けた追跡は破棄し、次フレームで全画面を検出
+        if any(t.misses >= self.max_misses for t in self.tracks):
+            self.tracks = [t for t in self.tracks if t.misses < self.max_misses]
+            self.force_full = True
+        self.full_scan = False
+        return circles
+
+    def _full_scan(self, frame):
+        h, w = frame.shape[:2]
+        circles = self.detector.detect(frame)
+        self.windows = [(0, 0, w, h)]
+        self.pixels = w * h
+        self.full_scan = True
+        self.force_full = False
+
+        # 既存の追跡と対応付け（同色で最も近いもの）、残りは新規追跡
+        for track in self.tracks:
+            track.predict()
+        unmatched = sorted(circles, key=lambda c: -c[2])
+        for track in self.tracks:
+            tx, ty = track.center
+            cands = [c for c in unmatched if c[3] == track.color and
+                     (c[0] - tx) ** 2 + (c[1] - ty) ** 2 < self.match_distance ** 2]
+            if cands:
+                best = min(cands, key=lambda c: (c[0] - tx) ** 2 + (c[1] - ty) ** 2)
+                track.correct(best[0], best[1], best[2])
+                unmatched.remove(best)
+            else:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses < self.max_misses]
+        for x, y, radius, color in unmatched:
+            if len(self.tracks) >= self.max_tracks:
+                break
+            self.tracks.append(self._new_track(frame, x, y, radius, color))
+        return circles
+
+    # 追跡をすべて破棄し、次フレームで全画面を検出する（全画面/ROI の切り替え時など）
+    def reset(self):
+        self.tracks = []
+        self.force_full = True
+
+    # 窓の中で追跡中のボールを探す（見つからなければ None、CamShiftTracker が上書き）
+    def _find_in_window(self, frame, track, window, predicted):
+        x0, y0, x1, y1 = window
+        x, y, _ = predicted
+        found = [c for c in self.detector.detect(frame[y0:y1, x0:x1], offset=(x0, y0))
+                 if c[3] == track.color]
+        if not found:
+            return None
+        return min(found, key=lambda c: (c[0] - x) ** 2 + (c[1] - y) ** 2)
+
+    # 全画面検出で見つかった新しいボールの追跡を作る（CamShiftTracker が上書き）
+    def _new_track(self, frame, x, y, radius, color):
+        return BallTrack(x, y, radius, color)
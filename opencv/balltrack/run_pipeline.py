@@ -0,0 +1,120 @@
+import time
+
+import cv2
+import numpy as np
+
+from ball_detector import BallDetector
+from frame_source import open_capture
+from pipeline import Pipeline, Stage
+from undistort_map import get_undistort_map
+
+# 複数プロセスで動かすボール検出・AprilTag 検出
+#   取得プロセス : カメラ取得 → 歪み補正（共有メモリのスロットへ直接書き込み）
+#   ball プロセス: ボール検出（最新フレーム優先、遅れたら古いフレームを捨てる）
+#   tag プロセス : AprilTag 検出と姿勢推定（同上、ボール検出を待たせない）
+# 使い方: python run_pipeline.py（Ctrl+C で終了）
+
+DEVICE = 0
+WIDTH, HEIGHT, FPS = 1280, 720, 15
+
+# カメラパラメータ（locaition/sim_*.py と同じ）
+camera_matrix = np.array([
+    [1194.08741, 0.0, 602.932566],
+    [0.0, 1206.03102, 325.538922],
+    [0.0, 0.0, 1.0]
+])
+dist_coeffs = np.array([0.04022942, 0.32673529, -0.00922231, -0.01283776, -0.89408179])
+tag_size = 0.095  # [m]
+
+# カメラ → フィールド（y軸まわりに -70°、位置 [m]）
+_pitch = np.deg2rad(-70.0)
+cam_to_field_R = np.array([[np.cos(_pitch), 0, np.sin(_pitch)],
+                           [0, 1, 0],
+                           [-np.sin(_pitch), 0, np.cos(_pitch)]])
+cam_to_field_t = np.array([0.25, 0, 0.79])
+
+BALL_DIAMETER = 5.5  # cm
+
+# HSV色範囲（tracking_one.py と同じ）
+color_ranges = {
+    "red": (np.array([165, 105, 115]), np.array([175, 250, 255])),
+    "blue": (np.array([90, 90, 100]), np.array([120, 225, 255])),
+    "yellow": (np.array([10, 70, 140]), np.array([40, 135, 255]))
+}
+
+# 各段のキューの長さと、満杯のときの扱い（pipeline.POLICIES）
+BALL_QUEUE, BALL_POLICY = 2, "drop_oldest"
+TAG_QUEUE, TAG_POLICY = 1, "drop_oldest"
+
+
+# ---- 以下の関数は子プロセス内で呼ばれる ----
+
+def open_camera():
+    return open_capture(DEVICE, WIDTH, HEIGHT, FPS)
+
+
+def undistort_stage():
+    undistorter = get_undistort_map(camera_matrix, dist_coeffs, (WIDTH, HEIGHT))
+
+    def process(img, out):
+        undistorter.undistort(img, out=out)
+    return process
+
+
+def ball_stage():
+    detector = BallDetector(color_ranges, space="hsv",
+                            focal_length=camera_matrix[0, 0], ball_diameter=BALL_DIAMETER)
+
+    # [(色, cx, cy, r, 距離), ...]（半径の大きい順）
+    def process(image):
+        return [(detector.colors[b["color_id"] - 1], float(b["cx"]), float(b["cy"]), float(b["r"]),
+                 float(b["distance"])) for b in detector.detect_array(image)]
+    return process
+
+
+def tag_stage():
+    from pyapriltags import Detector
+    detector = Detector(families='tag36h11')
+    camera_params = (camera_matrix[0, 0], camera_matrix[1, 1], camera_matrix[0, 2], camera_matrix[1, 2])
+
+    # [(タグID, 中心, フィールド座標 [mm]), ...]
+    def process(image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        tags = detector.detect(gray, estimate_tag_pose=True, camera_params=camera_params, tag_size=tag_size)
+        result = []
+        for tag in tags:
+            field = None
+            if tag.pose_t is not None:
+                field = tuple((cam_to_field_R @ tag.pose_t.reshape(3) + cam_to_field_t) * 1000)
+            result.append((tag.tag_id, tuple(tag.center), field))
+        return result
+    return process
+
+
+if __name__ == "__main__":
+    pipeline = Pipeline(open_camera, (HEIGHT, WIDTH, 3),
+                        [Stage("ball", ball_stage, BALL_QUEUE, BALL_POLICY),
+                         Stage("tag", tag_stage, TAG_QUEUE, TAG_POLICY)],
+                        preprocess_factory=undistort_stage)
+    latest = {}
+    last_print = time.monotonic()
+    try:
+        pipeline.start()
+        while pipeline.running:
+            record = pipeline.get(timeout=0.1)
+            if record is not None:
+                name, seq, timestamp, latency, result = record
+                latest[name] = (seq, latency, result)
+
+            now = time.monotonic()
+            if now - last_print >= 1.0:
+                last_print = now
+                for name, (seq, latency, result) in sorted(latest.items()):
+                    print(f"[{name}] #{seq} 遅延 {latency * 1000:6.1f} ms  {result[:3]}")
+                print(pipeline.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        if pipeline.error is not None:
+            print(f"パイプラインを停止しました: {pipeline.error}")
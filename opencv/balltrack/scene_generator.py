@@ -0,0 +1,302 @@
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from field_mask import camera_extrinsics
+
+# 合成シーン（床に置いた赤・青・黄のボール）の生成と、正解ラベルつきデータセットの保存
+# 使い方: python scene_generator.py 出力フォルダ [枚数] [高さ]（幅は 1280、高さは 720 か 675）
+# 出力フォルダには次を書く（どれもメモリマップで開ける）
+#   frames.npy : (枚数, 高さ, 幅, 3) uint8 の BGR 画像
+#   labels.npy : (枚数, max_balls) の LABEL_DTYPE（valid=False の行は空き）
+#   meta.json  : 色名・カメラパラメータ・姿勢・生成条件
+
+# カメラ（run_pipeline.py / locaition/sim_*.py と同じキャリブレーション結果）
+CAMERA_MATRIX = np.array([
+    [1194.08741, 0.0, 602.932566],
+    [0.0, 1206.03102, 325.538922],
+    [0.0, 0.0, 1.0]
+])
+DIST_COEFFS = np.array([0.04022942, 0.32673529, -0.00922231, -0.01283776, -0.89408179])
+
+# カメラの設置姿勢（ball_distance.py と同じ、フィールド座標 [mm]、高さは locaition/sim_*.py の 0.80 m）
+CAMERA_POS = (250.0, -200.0, 800.0)
+CAMERA_YAW = 90.0     # [deg]
+CAMERA_PITCH = -70.0  # [deg]
+
+BALL_DIAMETER = 55.0  # [mm]（ball_distance.py の 5.5 cm）
+
+# 色名と描画色（bench_pyramid.py と同じ、color_ranges の範囲内の BGR）
+COLORS = ("red", "blue", "yellow")
+BALL_BGR = np.array([(90, 30, 200), (220, 120, 40), (110, 200, 220)], dtype=np.float32)
+FLOOR_BGR = np.array([60, 62, 58], dtype=np.float32)
+OCCLUDER_BGR = np.array([45, 45, 45], dtype=np.float32)  # ロボットの部品など
+
+# ボール1個分の正解ラベル
+LABEL_DTYPE = np.dtype([
+    ("valid", np.bool_),
+    ("color_id", np.uint8),    # COLORS[color_id - 1]（BallDetector と同じ）
+    ("cx", np.float32),        # 中心 [px]（歪みを含む画像上）
+    ("cy", np.float32),
+    ("r", np.float32),         # 半径 [px]
+    ("distance", np.float32),  # カメラからボール中心までの距離 [m]
+    ("visible", np.float32),   # 見えている割合（隠れ・画面外を除いた面積 / 円の面積）
+    ("x", np.float32),         # フィールド上の位置 [mm]
+    ("y", np.float32),
+])
+
+
+# -----------------------------
+# 合成シーンの生成器
+# ボールを床上（中心の高さ = 半径）に置き、カメラ行列・歪み係数・姿勢で投影して描画する
+# 中心は球の中心の投影、半径は視線に垂直な方向に球の半径だけずらした点までの距離
+# 画面全体の処理（照明の傾き・ノイズ・動きぶれ）は配列演算と OpenCV で1回ずつ行い、
+# ボールは外接矩形の中だけ距離場で塗る（縁はアンチエイリアス）
+#   balls       : 1枚あたりのボール数の範囲 (最小, 最大)
+#   lighting    : 照明の傾きの強さ（0 なら一様、0.3 なら画面の端で ±30 %）
+#   noise       : ガウスノイズの標準偏差
+#   motion_blur : 動きぶれの最大の長さ [px]（0 ならなし）
+#   distractors : 1枚あたりの紛らわしい物体（ボールの色の細長い帯・白線）の最大数
+#   occlusion   : ボールごとに一部が隠れる確率
+#   motion      : "random" = 毎フレーム配置し直す / "track" = 等速で動かす（追跡の評価用）
+# -----------------------------
+class SceneGenerator:
+    def __init__(self, size=(1280, 720), camera_matrix=CAMERA_MATRIX, dist_coeffs=DIST_COEFFS,
+                 cam_pos=CAMERA_POS, yaw=CAMERA_YAW, pitch=CAMERA_PITCH, ball_diameter=BALL_DIAMETER,
+                 balls=(1, 4), lighting=0.3, noise=6.0, motion_blur=0, distractors=2, occlusion=0.2,
+                 motion="random", max_balls=8, seed=0):
+        if motion not in ("random", "track"):
+            raise ValueError(f"未対応の動きです: {motion}")
+        self.size = tuple(size)
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64)
+        self.cam_pos = np.asarray(cam_pos, dtype=np.float64)
+        self.yaw, self.pitch = yaw, pitch
+        self.ball_radius = ball_diameter / 2
+        self.balls = balls
+        self.lighting = lighting
+        self.noise = noise
+        self.motion_blur = motion_blur
+        self.distractors = distractors
+        self.occlusion = occlusion
+        self.motion = motion
+        self.max_balls = max_balls
+        self.rng = np.random.default_rng(seed)
+
+        self.rvec, self.tvec = camera_extrinsics(self.cam_pos, yaw, pitch)
+        self.R_wc, _ = cv2.Rodrigues(self.rvec)
+        self.area = self._ground_area()
+
+        w, h = self.size
+        self._gx = np.linspace(-1, 1, w, dtype=np.float32)[None, :, None]
+        self._gy = np.linspace(-1, 1, h, dtype=np.float32)[:, None, None]
+        # ノイズは数枚分を先に作って使い回す（毎フレーム乱数を作るより速い）
+        self._noise = [self.rng.normal(0, noise, (h, w, 3)).astype(np.float32) for _ in range(4)] if noise else []
+        self._img = np.empty((h, w, 3), dtype=np.float32)
+        self._state = None
+
+    def meta(self):
+        return {"colors": list(COLORS), "size": list(self.size), "camera_matrix": self.camera_matrix.tolist(),
+                "dist_coeffs": self.dist_coeffs.tolist(), "cam_pos": self.cam_pos.tolist(), "yaw": self.yaw,
+                "pitch": self.pitch, "ball_diameter": self.ball_radius * 2, "lighting": self.lighting,
+                "noise": self.noise, "motion_blur": self.motion_blur, "distractors": self.distractors,
+                "occlusion": self.occlusion, "motion": self.motion}
+
+    # 画像の四隅の視線が高さ = 半径の平面と交わる範囲（ボールを置く範囲）[mm]
+    def _ground_area(self, max_range=3000.0):
+        w, h = self.size
+        corners = np.array([[0, 0], [w, 0], [0, h], [w, h], [w / 2, h / 2]], dtype=np.float64)
+        rays = cv2.undistortPoints(corners.reshape(-1, 1, 2), self.camera_matrix, self.dist_coeffs).reshape(-1, 2)
+        dirs = (self.R_wc.T @ np.hstack([rays, np.ones((len(rays), 1))]).T).T
+        dz = np.minimum(dirs[:, 2], -1e-6)
+        s = np.minimum((self.ball_radius - self.cam_pos[2]) / dz, max_range)
+        pts = self.cam_pos[:2] + dirs[:, :2] * s[:, None]
+        return pts.min(axis=0), pts.max(axis=0)
+
+    # フィールド上の位置 (k, 2) [mm] → 中心 (k, 2), 半径 (k,) [px], 距離 (k,) [m]
+    def project(self, xy):
+        world = np.hstack([xy, np.full((len(xy), 1), self.ball_radius)])
+        centers, _ = cv2.projectPoints(world, self.rvec, self.tvec, self.camera_matrix, self.dist_coeffs)
+        edge, _ = cv2.projectPoints(world + self.R_wc[0] * self.ball_radius, self.rvec, self.tvec,
+                                    self.camera_matrix, self.dist_coeffs)
+        centers, edge = centers.reshape(-1, 2), edge.reshape(-1, 2)
+        cam = self.R_wc @ world.T + self.tvec
+        return centers, np.linalg.norm(edge - centers, axis=1), np.linalg.norm(cam, axis=0) / 1000
+
+    # 重ならない位置を k 個選ぶ（画面内に中心が入るものだけ）
+    def _place(self, k):
+        lo, hi = self.area
+        w, h = self.size
+        chosen = np.zeros((0, 2))
+        for _ in range(20):
+            cand = self.rng.uniform(lo, hi, (4 * k, 2))
+            centers, _, _ = self.project(cand)
+            cand = cand[(centers[:, 0] >= 0) & (centers[:, 0] < w) & (centers[:, 1] >= 0) & (centers[:, 1] < h)]
+            for p in cand:
+                if len(chosen) >= k:
+                    break
+                if len(chosen) == 0 or np.min(np.linalg.norm(chosen - p, axis=1)) > self.ball_radius * 2.4:
+                    chosen = np.vstack([chosen, p])
+            if len(chosen) >= k:
+                break
+        return chosen
+
+    def _next_positions(self):
+        if self.motion == "random" or self._state is None:
+            k = int(self.rng.integers(self.balls[0], self.balls[1] + 1))
+            xy = self._place(min(k, self.max_balls))
+            colors = self.rng.integers(len(COLORS), size=len(xy))
+            vel = self.rng.uniform(-8, 8, (len(xy), 2))  # [mm/フレーム]
+            self._state = [xy, colors, vel]
+            return xy, colors
+        xy, colors, vel = self._state
+        xy = xy + vel
+        lo, hi = self.area
+        out = (xy < lo) | (xy > hi)
+        vel[out] *= -1
+        self._state[0] = np.clip(xy, lo, hi)
+        return self._state[0], colors
+
+    # 1枚描画して out（uint8 の (h, w, 3)）に書き、ラベル（max_balls 行）を返す
+    def render(self, out=None):
+        w, h = self.size
+        rng = self.rng
+        img = self._img
+        labels = np.zeros(self.max_balls, dtype=LABEL_DTYPE)
+
+        # 床 × 照明の傾き
+        angle = rng.uniform(0, 2 * np.pi)
+        light = 1 + self.lighting * (np.cos(angle) * self._gx + np.sin(angle) * self._gy)
+        np.multiply(light, FLOOR_BGR, out=img)
+
+        self._draw_distractors(img)
+
+        xy, colors = self._next_positions()
+        centers, radii, dist = self.project(xy)
+        order = np.argsort(-dist)  # 遠いボールから描く
+        for n, i in enumerate(order):
+            (cx, cy), r = centers[i], radii[i]
+            shade = float(1 + self.lighting * (np.cos(angle) * (2 * cx / w - 1) + np.sin(angle) * (2 * cy / h - 1)))
+            visible = self._draw_ball(img, cx, cy, r, BALL_BGR[colors[i]] * shade)
+            if rng.random() < self.occlusion:
+                visible = self._occlude(img, cx, cy, r)
+            labels[n] = (True, colors[i] + 1, cx, cy, r, dist[i], visible, xy[i, 0], xy[i, 1])
+
+        if self.motion_blur > 1:
+            length = int(rng.integers(1, self.motion_blur + 1))
+            if length > 1:
+                kernel = np.zeros((length, length), dtype=np.float32)
+                kernel[length // 2, :] = 1.0 / length
+                rot = cv2.getRotationMatrix2D(((length - 1) / 2, (length - 1) / 2), rng.uniform(0, 180), 1.0)
+                kernel = cv2.warpAffine(kernel, rot, (length, length))
+                cv2.filter2D(img, -1, kernel / max(kernel.sum(), 1e-6), dst=img)
+        if self._noise:
+            np.add(img, self._noise[int(rng.integers(len(self._noise)))], out=img)
+
+        if out is None:
+            out = np.empty((h, w, 3), dtype=np.uint8)
+        np.clip(img, 0, 255, out=img)
+        np.copyto(out, img, casting="unsafe")
+        return out, labels
+
+    # 外接矩形の中だけ距離場で円を塗る（中心ほど明るい簡単な陰影）。見えている割合を返す
+    def _draw_ball(self, img, cx, cy, r, color):
+        h, w = img.shape[:2]
+        x0, y0 = max(0, int(cx - r - 1)), max(0, int(cy - r - 1))
+        x1, y1 = min(w, int(cx + r + 2)), min(h, int(cy + r + 2))
+        if x1 <= x0 or y1 <= y0:
+            return 0.0
+        yy, xx = np.ogrid[y0:y1, x0:x1]
+        d = np.sqrt((xx - cx) ** 2 + (yy - cy) ** 2, dtype=np.float32)
+        alpha = np.clip(r - d + 0.5, 0, 1)[..., None]
+        shade = (1.05 - 0.25 * np.clip(d / r, 0, 1) ** 2)[..., None]
+        roi = img[y0:y1, x0:x1]
+        roi += alpha * (color * shade - roi)
+        return float(min(1.0, alpha.sum() / (np.pi * r * r)))
+
+    # ボールの一部を横または縦から長方形で隠す。見えている割合を返す
+    def _occlude(self, img, cx, cy, r):
+        h, w = img.shape[:2]
+        cover = self.rng.uniform(0.2, 0.6)  # 直径に対して隠す割合
+        side = int(self.rng.integers(4))
+        edge = -r + 2 * r * cover
+        if side == 0:    # 左から
+            x0, x1, y0, y1 = cx - 3 * r, cx + edge, cy - 3 * r, cy + 3 * r
+        elif side == 1:  # 右から
+            x0, x1, y0, y1 = cx - edge, cx + 3 * r, cy - 3 * r, cy + 3 * r
+        elif side == 2:  # 上から
+            x0, x1, y0, y1 = cx - 3 * r, cx + 3 * r, cy - 3 * r, cy + edge
+        else:            # 下から
+            x0, x1, y0, y1 = cx - 3 * r, cx + 3 * r, cy - edge, cy + 3 * r
+        cv2.rectangle(img, (int(x0), int(y0)), (int(x1), int(y1)), OCCLUDER_BGR.tolist(), -1)
+
+        # 見えている割合（円のうち長方形の外かつ画面内の画素）
+        bx0, by0 = max(0, int(cx - r)), max(0, int(cy - r))
+        bx1, by1 = min(w, int(cx + r) + 1), min(h, int(cy + r) + 1)
+        yy, xx = np.ogrid[by0:by1, bx0:bx1]
+        disc = (xx - cx) ** 2 + (yy - cy) ** 2 <= r * r
+        hidden = (xx >= int(x0)) & (xx <= int(x1)) & (yy >= int(y0)) & (yy <= int(y1))
+        return float(np.count_nonzero(disc & ~hidden) / (np.pi * r * r))
+
+    # ボールの色の細長い帯（円でない同色の物体）と白線
+    def _draw_distractors(self, img):
+        w, h = self.size
+        for _ in range(int(self.rng.integers(self.distractors + 1))):
+            x, y = self.rng.uniform(0, w), self.rng.uniform(0, h)
+            length, width = self.rng.uniform(80, 300), self.rng.uniform(6, 18)
+            angle = self.rng.uniform(0, 180)
+            box = cv2.boxPoints(((x, y), (length, width), angle)).astype(np.int32)
+            if self.rng.random() < 0.5:
+                color = BALL_BGR[int(self.rng.integers(len(COLORS)))]
+            else:
+                color = np.array([230, 230, 230], dtype=np.float32)
+            cv2.fillPoly(img, [box], color.tolist(), cv2.LINE_AA)
+
+    # n 枚生成して folder に保存する
+    def generate(self, folder, n):
+        os.makedirs(folder, exist_ok=True)
+        w, h = self.size
+        frames = np.lib.format.open_memmap(os.path.join(folder, "frames.npy"), mode="w+", dtype=np.uint8,
+                                           shape=(n, h, w, 3))
+        labels = np.lib.format.open_memmap(os.path.join(folder, "labels.npy"), mode="w+", dtype=LABEL_DTYPE,
+                                           shape=(n, self.max_balls))
+        for i in range(n):
+            _, labels[i] = self.render(out=frames[i])
+        frames.flush()
+        labels.flush()
+        with open(os.path.join(folder, "meta.json"), "w") as f:
+            json.dump(self.meta(), f, indent=2)
+
+
+# 保存したデータセットを開く（frames, labels はメモリマップ）
+def load_scenes(folder):
+    frames = np.load(os.path.join(folder, "frames.npy"), mmap_mode="r")
+    labels = np.load(os.path.join(folder, "labels.npy"), mmap_mode="r")
+    with open(os.path.join(folder, "meta.json")) as f:
+        meta = json.load(f)
+    return frames, labels, meta
+
+
+# ラベル → [(x, y, r, 色名), ...]（BallDetector.detect と同じ形式）
+# 見えている割合が min_visible 未満のボールは除く
+def label_circles(labels, min_visible=0.0, colors=COLORS):
+    return [(float(b["cx"]), float(b["cy"]), float(b["r"]), colors[b["color_id"] - 1])
+            for b in labels if b["valid"] and b["visible"] >= min_visible]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("使い方: python scene_generator.py 出力フォルダ [枚数] [高さ]")
+        sys.exit(1)
+    num = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    height = int(sys.argv[3]) if len(sys.argv) > 3 else 720
+    generator = SceneGenerator(size=(1280, height))
+    start = time.perf_counter()
+    generator.generate(sys.argv[1], num)
+    elapsed = time.perf_counter() - start
+    print(f"{num} 枚（{generator.size[0]}x{generator.size[1]}）を {elapsed:.1f} s で生成"
+          f"（{num / elapsed:.1f} 枚/s）: {sys.argv[1]}")
@@ -0,0 +1,116 @@
+import json
+import time
+from time import perf_counter_ns
+
+import numpy as np
+
+# 処理段の名前（表示順）
+STAGES = ("capture", "undistort", "blur", "color", "morph", "contours", "pose", "render", "frame")
+
+
+class _Span:
+    __slots__ = ("timer", "name", "t0")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, perf_counter_ns() - self.t0)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+# -----------------------------
+# 処理段ごとの所要時間の計測
+#   with timer.span("blur"):
+#       ...
+# 段ごとに直近 window 回分の時間 [ns] をリングバッファに持ち、p50 / p95 / p99 / 最大を求める
+# report_interval [s] を指定すると tick() のたびに確認して、間隔ごとに要約を表示する
+# enabled=False のときは span() が何もしないので、計測コードを残したままにできる
+# -----------------------------
+class StageTimer:
+    def __init__(self, window=512, report_interval=None, enabled=True):
+        self.window = window
+        self.report_interval = report_interval
+        self.enabled = enabled
+        self._samples = {}  # 段の名前 → int64 のリングバッファ
+        self._count = {}    # 段の名前 → 記録した回数
+        self._spans = {}
+        self._last_report = time.monotonic()
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        span = self._spans.get(name)
+        if span is None:
+            span = self._spans[name] = _Span(self, name)
+        return span
+
+    def record(self, name, ns):
+        buf = self._samples.get(name)
+        if buf is None:
+            buf = self._samples[name] = np.zeros(self.window, dtype=np.int64)
+            self._count[name] = 0
+        n = self._count[name]
+        buf[n % self.window] = ns
+        self._count[name] = n + 1
+
+    def reset(self):
+        self._samples.clear()
+        self._count.clear()
+
+    # 段ごとの統計 {名前: {"count", "p50", "p95", "p99", "max"}}（時間は ms）
+    def summary(self):
+        result = {}
+        names = [s for s in STAGES if s in self._samples] + \
+                [s for s in self._samples if s not in STAGES]
+        for name in names:
+            n = self._count[name]
+            samples = self._samples[name][:min(n, self.window)] / 1e6
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+            result[name] = {"count": n, "p50": float(p50), "p95": float(p95), "p99": float(p99),
+                            "max": float(samples.max())}
+        return result
+
+    def format(self):
+        lines = [f"{'stage':<10}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}  [ms]"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:<10}{s['p50']:8.2f}{s['p95']:8.2f}{s['p99']:8.2f}{s['max']:8.2f}")
+        return "\n".join(lines)
+
+    # 1フレームごとに呼ぶ。report_interval を過ぎていれば要約を表示して True を返す
+    def tick(self):
+        if not self.enabled or self.report_interval is None:
+            return False
+        now = time.monotonic()
+        if now - self._last_report < self.report_interval:
+            return False
+        self._last_report = now
+        print("\n" + self.format())
+        return True
+
+    # 統計を JSON で保存する（raw=True なら直近の生の計測値 [ns] も含める）
+    def dump(self, path, raw=False):
+        data = {"window": self.window, "stages": self.summary()}
+        if raw:
+            data["samples_ns"] = {name: self._samples[name][:min(self._count[name], self.window)].tolist()
+                                  for name in self._samples}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
@@ -1,67 +1,142 @@
-import cv2
-import numpy as np
-
-cap = cv2.VideoCapture(0)
-
-# HSV範囲（赤・青・黄）
-color_ranges = {
-    "red": [([150, 120, 0], [175, 255, 255])],
-    "blue": [([95, 195, 0], [125, 255, 255])],
-    "yellow": [([20, 34, 205], [30, 88, 255])]
-}
-
-draw_colors = {
-    "red": (0, 0, 255),
-    "blue": (255, 0, 0),
-    "yellow": (0, 255, 255)
-}
-# カーネル設定
-kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-# マスク作成
-def create_mask(hsv, ranges):
-    mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
-    for lower, upper in ranges:
-        mask |= cv2.inRange(hsv, np.array(lower), np.array(upper))
-    return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=2) #モルフォロジー処理により輪郭検出
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    blurred = cv2.medianBlur(frame, 11) #メディアンブラーによりノイズの除去
-    hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV) # HSVへ変換変換
-    gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY) # グレースケール化
-
-    max_radius = 0
-    max_center = None
-    max_color = None
-
-    for color, ranges in color_ranges.items():
-        mask = create_mask(hsv, ranges)
-        masked_gray = cv2.bitwise_and(gray, gray, mask=mask)
-        display_masked = cv2.cvtColor(masked_gray, cv2.COLOR_GRAY2BGR)
-        cv2.imshow(f"Hough Input - {color}", display_masked)
-
-        circles = cv2.HoughCircles(masked_gray, cv2.HOUGH_GRADIENT, dp=1.2, minDist=20,
-                                   param1=100, param2=20, minRadius=5, maxRadius=120)
-        if circles is not None:
-            for (x, y, r) in np.round(circles[0, :]).astype("int"):
-                if r > max_radius:
-                    max_radius = r
-                    max_center = (x, y)
-                    max_color = color
-
-    if max_center is not None:
-        cv2.circle(frame, max_center, max_radius, draw_colors[max_color], 2)
-        cv2.circle(frame, max_center, 5, (0, 0, 0), -1)
-        cv2.putText(frame, f"{max_color.capitalize()} Ball Pos: {max_center}", (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[max_color], 2)
-
-    cv2.imshow("Final Result", frame)
-
-    if cv2.waitKey(1) == 27:  # ESCキー
-        break
-
-cap.release()
-cv2.destroyAllWindows()
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from buffer_pool import BufferPool
+from color_lut import ColorClassifier
+from frame_source import FrameSource
+from hough_roi import detect_circles_in_blobs
+from preview import PreviewRenderer
+from virtual_camera import step_key
+
+# カメラ設定
+DEVICE = 0
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = FrameSource(DEVICE, pacing=PACING).start()
+
+# HSV範囲（赤・青・黄）
+color_ranges = {
+    "red": [([150, 120, 0], [175, 255, 255])],
+    "blue": [([95, 195, 0], [125, 255, 255])],
+    "yellow": [([20, 34, 205], [30, 88, 255])]
+}
+
+draw_colors = {
+    "red": (0, 0, 255),
+    "blue": (255, 0, 0),
+    "yellow": (0, 255, 255)
+}
+# カーネル設定
+kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+# 色分類テーブル（"hsv" または HSV変換を省略する "bgr"）
+classifier = ColorClassifier(color_ranges, space="hsv")
+# ハフ円検出モード
+# "roi"    : 色ブロブ周辺の切り出しだけでハフ変換（半径範囲はブロブの大きさから決める）
+# "radial" : ハフの代わりにブロブの円周上でマスクの内外を調べる簡易判定
+# "full"   : 色ごとに画像全体でハフ変換（従来どおり）
+# roi / radial が full と同じ円を返すか・ハフの時間は bench_hough.py で確認する
+HOUGH_MODE = "full"
+SHOW_HOUGH_INPUT = True  # full モードで色ごとのハフ入力画像を表示する
+# 表示モード（"window": 毎フレーム表示 / "preview": 別スレッドで間引き表示 / "none": 表示なし）
+DISPLAY_MODE = "window"
+PREVIEW_RATE = 5.0  # preview モードの表示レート [Hz]
+# 中間画像は毎フレーム確保せずに使い回す（DEBUG_ALLOC=True で確保の残っている段を表示）
+DEBUG_ALLOC = False
+pool = BufferPool(debug=DEBUG_ALLOC)
+# 色ごとの処理（マスク → ノイズ除去 → ハフ円検出）を並列に実行するスレッド数
+# None なら従来どおり1色ずつ順番に処理する（OpenCV の処理中は GIL が解放される）
+WORKERS = None  # 例: 3
+executor = ThreadPoolExecutor(max_workers=WORKERS) if WORKERS is not None and WORKERS > 1 else None
+# マスク作成（バッファは色ごとに別にして、並列実行でも共有しない）
+def create_mask(labels, color):
+    mask = classifier.mask(labels, color, out=pool.get(f"color_mask_{color}", labels.shape))
+    buf = pool.get(f"cleaned_{color}", labels.shape)
+    return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, dst=buf, iterations=2) #モルフォロジー処理により輪郭検出
+
+# 1色分の円検出。(円の配列または None, ハフ入力画像または None) を返す
+def detect_color(labels, gray, color, masked_gray):
+    mask = create_mask(labels, color)
+    if HOUGH_MODE == "full":
+        # mask を指定した bitwise_and は dst の範囲外を書き換えないので先に 0 にする
+        masked_gray.fill(0)
+        cv2.bitwise_and(gray, gray, dst=masked_gray, mask=mask)
+        circles = cv2.HoughCircles(masked_gray, cv2.HOUGH_GRADIENT, dp=1.2, minDist=20,
+                                   param1=100, param2=20, minRadius=5, maxRadius=120)
+        return circles, masked_gray
+    found = detect_circles_in_blobs(gray, mask, verify="radial" if HOUGH_MODE == "radial" else "hough",
+                                    min_radius=5, max_radius=120)
+    return (np.array([found], dtype=np.float32) if found else None), None
+
+# 検出結果の描画（preview モードでは表示スレッドで呼ばれる）
+def draw(image, result):
+    max_center, max_radius, max_color = result["max"]
+    if max_center is not None:
+        cv2.circle(image, max_center, max_radius, draw_colors[max_color], 2)
+        cv2.circle(image, max_center, 5, (0, 0, 0), -1)
+        cv2.putText(image, f"{max_color.capitalize()} Ball Pos: {max_center}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[max_color], 2)
+
+    windows = {f"Hough Input - {color}": img for color, img in result["hough_inputs"].items()}
+    windows["Final Result"] = image
+    return windows
+
+display = PreviewRenderer(draw, mode=DISPLAY_MODE, rate=PREVIEW_RATE, on_key=lambda key: step_key(cap, key))
+
+while True:
+    ret, frame = cap.read()
+    if not ret:
+        break
+    pool.next_frame()
+    shape = frame.shape[:2]
+
+    buf = pool.get("blurred", frame.shape)
+    blurred = pool.check("blurred", buf, cv2.medianBlur(frame, 11, dst=buf)) #メディアンブラーによりノイズの除去
+    labels = pool.get("labels", shape)
+    if classifier.space == "hsv":
+        buf = pool.get("hsv", frame.shape)
+        hsv = pool.check("hsv", buf, cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV, dst=buf)) # HSVへ変換変換
+        classifier.classify(hsv, out=labels) # 全色を1回で分類
+    else:
+        classifier.classify(blurred, out=labels)
+    buf = pool.get("gray", shape)
+    gray = pool.check("gray", buf, cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY, dst=buf)) # グレースケール化
+
+    max_radius = 0
+    max_center = None
+    max_color = None
+    hough_inputs = {}
+
+    # 色ごとのバッファは先に取り出しておく（プールはスレッドセーフではない）
+    for color in classifier.names:
+        pool.get(f"color_mask_{color}", shape)
+        pool.get(f"cleaned_{color}", shape)
+    jobs = [(labels, gray, color, pool.get(f"masked_gray_{color}", shape) if HOUGH_MODE == "full" else None)
+            for color in classifier.names]
+    if executor is not None:
+        results = list(executor.map(lambda job: detect_color(*job), jobs))
+    else:
+        results = [detect_color(*job) for job in jobs]
+
+    for color, (circles, masked_gray) in zip(classifier.names, results):
+        if masked_gray is not None and SHOW_HOUGH_INPUT:
+            hough_inputs[color] = masked_gray
+        if circles is not None:
+            for (x, y, r) in np.round(circles[0, :]).astype("int"):
+                if r > max_radius:
+                    max_radius = r
+                    max_center = (x, y)
+                    max_color = color
+
+    # ESCキー（表示なしのときは Ctrl+C）で終了
+    if not display.show(frame, {"max": (max_center, max_radius, max_color), "hough_inputs": hough_inputs}):
+        break
+
+cap.release()
+display.close()
+if executor is not None:
+    executor.shutdown()
+if DEBUG_ALLOC:
+    print(pool.report())
@@ -1,78 +1,114 @@
-import cv2
-import numpy as np
-
-cap = cv2.VideoCapture(0)
-
-# HSV色範囲（赤・青・黄）
-
-lower_red = np.array([145, 120, 120])
-upper_red = np.array([165, 240, 255])
-lower_blue = np.array([100, 105, 120])
-upper_blue = np.array([120, 225, 255])
-lower_yellow = np.array([0, 28, 108])
-upper_yellow = np.array([35, 255, 255])
-
-draw_colors = {
-    "red": (0, 0, 255),
-    "blue": (255, 0, 0),
-    "yellow": (0, 255, 255)
-}
-# カーネル定義（モルフォロジー処理用）
-kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-    # 前処理
-    blurred = cv2.medianBlur(frame, 11)
-    hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
-
-    masks = {
-        "red": cv2.inRange(hsv, lower_red, upper_red),
-        "blue": cv2.inRange(hsv, lower_blue, upper_blue),
-        "yellow": cv2.inRange(hsv, lower_yellow, upper_yellow)
-    }
-
-    # 最大円を記録する変数
-    max_radius = 0
-    max_center = None
-    max_color = None
-
-    for color, mask in masks.items():
-        # ノイズ除去
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=2)
-
-        # Cannyエッジ検出
-        edges = cv2.Canny(mask, 50, 150)
-
-        # 輪郭検出
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        # 小さい輪郭の削除
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            if area < 300:
-                continue
-
-            # 最小外接円を取得
-            (x, y), radius = cv2.minEnclosingCircle(cnt)
-            if radius > max_radius:
-                max_radius = radius
-                max_center = (int(x), int(y))
-                max_color = color
-
-    # 最大の円を描画
-    if max_center is not None:
-        cv2.circle(frame, max_center, int(max_radius), draw_colors[max_color], 2)
-        cv2.circle(frame, max_center, 5, (0, 0, 0), -1)
-        cv2.putText(frame, f"{max_color.capitalize()} Ball Pos: {max_center}", (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[max_color], 2)
-
-    # 表示
-    cv2.imshow("Canny + Contour", frame)
-
-    if cv2.waitKey(1) == 27:  # ESCキー
-        break
-
-cap.release()
-cv2.destroyAllWindows()
+import cv2
+import numpy as np
+
+from color_lut import ColorClassifier
+from frame_source import FrameSource
+from preview import PreviewRenderer
+from pyramid_detector import PyramidDetector
+from virtual_camera import step_key
+
+# カメラ設定
+DEVICE = 0
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+cap = FrameSource(DEVICE, pacing=PACING).start()
+
+# HSV色範囲（赤・青・黄）
+
+lower_red = np.array([145, 120, 120])
+upper_red = np.array([165, 240, 255])
+lower_blue = np.array([100, 105, 120])
+upper_blue = np.array([120, 225, 255])
+lower_yellow = np.array([0, 28, 108])
+upper_yellow = np.array([35, 255, 255])
+
+color_ranges = {
+    "red": (lower_red, upper_red),
+    "blue": (lower_blue, upper_blue),
+    "yellow": (lower_yellow, upper_yellow)
+}
+
+draw_colors = {
+    "red": (0, 0, 255),
+    "blue": (255, 0, 0),
+    "yellow": (0, 255, 255)
+}
+# カーネル定義（モルフォロジー処理用）
+kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+# 色分類テーブル（"hsv" または HSV変換を省略する "bgr"）
+classifier = ColorClassifier(color_ranges, space="hsv")
+
+# 検出モード
+# "canny"   : 元解像度で Canny + 輪郭
+# "pyramid" : 縮小画像で候補を探し、候補周辺だけ元解像度で検出（PYRAMID_LEVEL=2 で 1/4）
+DETECT_MODE = "canny"
+PYRAMID_LEVEL = 2
+pyramid = PyramidDetector(color_ranges, level=PYRAMID_LEVEL, blur_ksize=11, classifier=classifier)
+
+# 表示モード（"window": 毎フレーム表示 / "preview": 別スレッドで間引き表示 / "none": 表示なし）
+DISPLAY_MODE = "window"
+PREVIEW_RATE = 5.0  # preview モードの表示レート [Hz]
+
+# 最大の円を描画（preview モードでは表示スレッドで呼ばれる）
+def draw(frame, result):
+    max_center, max_radius, max_color = result
+    if max_center is not None:
+        cv2.circle(frame, max_center, int(max_radius), draw_colors[max_color], 2)
+        cv2.circle(frame, max_center, 5, (0, 0, 0), -1)
+        cv2.putText(frame, f"{max_color.capitalize()} Ball Pos: {max_center}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[max_color], 2)
+    return {"Canny + Contour": frame}
+
+display = PreviewRenderer(draw, mode=DISPLAY_MODE, rate=PREVIEW_RATE, on_key=lambda key: step_key(cap, key))
+
+while True:
+    ret, frame = cap.read()
+    if not ret:
+        break
+    if DETECT_MODE == "pyramid":
+        best = pyramid.detect_max(frame)
+        max_radius, max_center, max_color = best["radius"], best["center"], best["color"]
+    else:
+        # 前処理
+        blurred = cv2.medianBlur(frame, 11)
+        if classifier.space == "hsv":
+            hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
+            labels = classifier.classify(hsv)
+        else:
+            labels = classifier.classify(blurred)
+
+        # 最大円を記録する変数
+        max_radius = 0
+        max_center = None
+        max_color = None
+
+        for color in classifier.names:
+            # ノイズ除去
+            mask = cv2.morphologyEx(classifier.mask(labels, color), cv2.MORPH_OPEN, kernel, iterations=2)
+
+            # Cannyエッジ検出
+            edges = cv2.Canny(mask, 50, 150)
+
+            # 輪郭検出
+            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # 小さい輪郭の削除
+            for cnt in contours:
+                area = cv2.contourArea(cnt)
+                if area < 300:
+                    continue
+
+                # 最小外接円を取得
+                (x, y), radius = cv2.minEnclosingCircle(cnt)
+                if radius > max_radius:
+                    max_radius = radius
+                    max_center = (int(x), int(y))
+                    max_color = color
+
+    # 表示（ESCキー、表示なしのときは Ctrl+C で終了）
+    if not display.show(frame, (max_center, max_radius, max_color)):
+        break
+
+cap.release()
+display.close()
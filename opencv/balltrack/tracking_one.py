@@ -1,16 +1,38 @@
 import cv2
 import numpy as np
-import time
+from time import perf_counter_ns
+
+from ball_detector import BallDetector
+from buffer_pool import BufferPool
+from camshift_tracker import CamShiftTracker
+from color_lut import RANGES_PATH, shared_color_ranges
+from frame_source import FrameSource
+from preview import PreviewRenderer
+from quality import QualityController
+from roi_tracker import RoiTracker
+from stage_timer import StageTimer
+from virtual_camera import step_key
+from yuyv import as_yuyv, yuyv_to_bgr
 
 # カメラ設定
-cap = cv2.VideoCapture(0)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 675)
-cap.set(cv2.CAP_PROP_FPS, 15)
+DEVICE = 0
+# DEVICE にはカメラのほか 動画ファイル・画像フォルダ・録画ファイル・"synthetic" も指定できる（virtual_camera.py）
+# そのときの再生の速さ（"realtime": カメラと同じ fps / "fast": 待たない / "step": n・スペースで1フレームずつ）
+PACING = "realtime"
+# 取得形式（"bgr": 従来どおり BGR / "yuyv": カメラの YUYV をそのまま使い、BGR・HSV 変換を省略）
+CAPTURE_FORMAT = "bgr"
+if CAPTURE_FORMAT == "yuyv":
+    cap = FrameSource(DEVICE, width=1280, height=675, fps=15, fourcc="YUYV", convert_rgb=False,
+                      pacing=PACING)
+else:
+    cap = FrameSource(DEVICE, width=1280, height=675, fps=15, pacing=PACING)
 
 if not cap.isOpened():
     print(f"カメラ {DEVICE} を開けませんでした")
     exit()
+# 幅は取り込みスレッドを動かす前に聞く（スレッドと同時に cap.cap を触らない）
+frame_width = int(cap.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+cap.start()
 
 
 # HSV色範囲（赤・青・黄）
@@ -20,13 +42,49 @@ color_ranges = {
     "yellow": (np.array([10, 70, 140]), np.array([40, 135, 255]))
 }
 
+# hsv_tuner.py で作った共通の色範囲ファイル（あればその色は上の color_ranges より優先、None なら使わない）
+COLOR_RANGES_FILE = RANGES_PATH
+color_ranges = shared_color_ranges(color_ranges, COLOR_RANGES_FILE)
+
 draw_colors = {
     "red": (0, 0, 255),
     "blue": (255, 0, 0),
     "yellow": (0, 255, 255)
 }
 
-kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+# ボール検出器（色分類は "hsv" または HSV変換を省略する "bgr"）
+# 検出方法（"contours": 従来どおり輪郭ごとに最小外接円 / "blobs": 連結成分の統計量で判定、
+# 半径は面積からの等価半径になり、円形度・縦横比でも絞り込む）
+DETECT_METHOD = "contours"
+# 中間画像はキャプチャ解像度で先に確保したバッファを使い回す
+# DEBUG_ALLOC=True で毎フレーム確保の残っている段を終了時に表示
+DEBUG_ALLOC = False
+pool = BufferPool((675, 1280, 3), debug=DEBUG_ALLOC)
+# 処理段ごとの所要時間（LATENCY_REPORT 秒ごとに p50/p95/p99/最大を表示、終了時に LATENCY_DUMP へ保存）
+LATENCY_REPORT = 5.0   # None なら表示しない
+LATENCY_DUMP = None    # 例: "latency.json"
+timer = StageTimer(report_interval=LATENCY_REPORT)
+# 色ごとの処理を並列に実行するスレッド数（None: ラベル画像でまとめて処理、1: 色ごとに順番に処理）
+WORKERS = None
+detector = BallDetector(color_ranges, space="yuyv" if CAPTURE_FORMAT == "yuyv" else "hsv",
+                        method=DETECT_METHOD, pool=pool, timer=timer, workers=WORKERS)
+
+# 追跡モード
+# "roi"  : 検出後はカルマン予測の周辺だけを処理（見失い・定期更新時は全画面）
+# "camshift" : 検出後はボールの色ヒストグラムの逆投影と CamShift で追跡（信頼度が落ちたら全画面、CAPTURE_FORMAT = "bgr" のみ）
+# "full" : 毎フレーム全画面を処理（従来どおり）
+TRACK_MODE = "full"
+if TRACK_MODE == "camshift":
+    tracker = CamShiftTracker(detector, max_misses=3, refresh_interval=60)
+else:
+    tracker = RoiTracker(detector, max_misses=5, refresh_interval=30)
+
+# 目標処理時間 [ms]。指定すると処理が間に合わないときに解像度・ブラー・ノイズ除去・
+# 全画面/ROI を段階的に落とし、余裕が戻ったら元に戻す（TRACK_MODE は使わない）
+QUALITY_TARGET_MS = None  # 例: 33.0
+quality = QualityController(QUALITY_TARGET_MS) if QUALITY_TARGET_MS is not None else None
+if quality is not None:
+    quality.apply(detector)
 
 # 円の最大半径情報を更新する関数
 def update_max_circle(x, y, radius, color, current_max):
@@ -36,25 +94,65 @@ def update_max_circle(x, y, radius, color, current_max):
         current_max["color"] = color
     return current_max
 
+# 表示モード（"window": 毎フレーム表示 / "preview": 別スレッドで間引き表示 / "none": 表示なし）
+DISPLAY_MODE = "window"
+PREVIEW_RATE = 5.0  # preview モードの表示レート [Hz]
+
+# 検出結果の描画（preview モードでは表示スレッドで呼ばれる）
+def draw(image, result):
+    if CAPTURE_FORMAT == "yuyv":
+        image = yuyv_to_bgr(image)
+
+    # 最大円を描画＋距離測定
+    max_circle = result["max_circle"]
+    if max_circle["center"] is not None:
+        cv2.circle(image, max_circle["center"], int(max_circle["radius"]), draw_colors[max_circle["color"]], 2)
+        cv2.circle(image, max_circle["center"], 5, (0, 0, 0), -1)
+        cv2.putText(image, f"{max_circle['color'].capitalize()} Ball Pos: {max_circle['center']}",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[max_circle["color"]], 2)
+
+
+    # 処理した窓を表示
+    for x0, y0, x1, y1 in result["windows"]:
+        cv2.rectangle(image, (x0, y0), (x1 - 1, y1 - 1), (128, 128, 128), 1)
+
+    # 品質設定（QUALITY_TARGET_MS 指定時）
+    q = result["quality"]
+    if q is not None:
+        cv2.putText(image, f"Q{q['level']} x{q['scale']} blur{q['blur']} morph{q['morph']} {q['scan']}",
+                    (10, image.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+    windows = {"Hybrid Detection": image}
+    if result["mask"] is not None:
+        windows["Combined Mask"] = result["mask"]
+    return windows
+
+display = PreviewRenderer(draw, mode=DISPLAY_MODE, rate=PREVIEW_RATE, on_key=lambda key: step_key(cap, key))
+
 while True:
-    start_time = time.time()
+    frame_t0 = perf_counter_ns()
 
-    ret, frame = cap.read()
+    with timer.span("capture"):
+        ret, frame = cap.read()
     if not ret:
         print("フレーム取得に失敗")
         break
-
-    blurred = cv2.medianBlur(frame, 5)
-    hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
-
-    combined_mask = None
-    masks = {}
-
-    # 色ごとのマスク作成
-    for color, (lower, upper) in color_ranges.items():
-        mask = cv2.inRange(hsv, lower, upper)
-        masks[color] = mask
-        combined_mask = mask if combined_mask is None else combined_mask | mask
+    if CAPTURE_FORMAT == "yuyv":
+        frame = as_yuyv(frame, frame_width)
+    pool.next_frame()
+
+    process_t0 = perf_counter_ns()
+    scan = quality.settings["scan"] if quality is not None else TRACK_MODE
+    if scan != "full":
+        circles = tracker.update(frame)
+    else:
+        circles = detector.detect(frame)
+    # 処理時間（取得待ち・表示を除く）で品質を調整
+    if quality is not None and quality.update((perf_counter_ns() - process_t0) / 1e6):
+        quality.apply(detector)
+        # 全画面と ROI を切り替えたときは、古い追跡（カルマンの状態）を捨てて全画面からやり直す
+        if quality.settings["scan"] != scan:
+            tracker.reset()
 
     # 最大の円情報を格納
     max_circle = {
@@ -63,35 +161,36 @@ while True:
         "color": None
     }
 
-    for color, mask in masks.items():
-        mask_cleaned = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=2)
-        contours, _ = cv2.findContours(mask_cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            if area < 300:
-                continue
-            (x, y), radius = cv2.minEnclosingCircle(cnt)
-            max_circle = update_max_circle(x, y, radius, color, max_circle)
-
-    # 最大円を描画＋距離測定
-    if max_circle["center"] is not None:
-        cv2.circle(frame, max_circle["center"], int(max_circle["radius"]), draw_colors[max_circle["color"]], 2)
-        cv2.circle(frame, max_circle["center"], 5, (0, 0, 0), -1)
-        cv2.putText(frame, f"{max_circle['color'].capitalize()} Ball Pos: {max_circle['center']}",
-                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, draw_colors[max_circle["color"]], 2)
-
-
-    # 画面表示
-    cv2.imshow("Combined Mask", combined_mask)
-    cv2.imshow("Hybrid Detection", frame)
-
-    # FPS表示（ターミナル）
-    fps = 1 / (time.time() - start_time)
-    print(f"FPS: {fps:.2f}", end='\r')
-
-    if cv2.waitKey(1) & 0xFF == 27:
+    for x, y, radius, color in circles:
+        max_circle = update_max_circle(x, y, radius, color, max_circle)
+
+    # 画面表示（処理した窓は roi / camshift モードで部分処理したときだけ）
+    with timer.span("render"):
+        partial = scan != "full" and not tracker.full_scan
+        running = display.show(frame, {
+            "max_circle": max_circle,
+            "windows": tracker.windows if partial else [],
+            "mask": None if partial else detector.last_mask,
+            "quality": quality.settings if quality is not None else None,
+        })
+
+    # FPS表示（ターミナル、取得待ち・処理・表示を含む1フレームの時間から）
+    frame_ns = perf_counter_ns() - frame_t0
+    timer.record("frame", frame_ns)
+    fps = 1e9 / frame_ns
+    pixels = tracker.pixels if scan != "full" else frame.shape[0] * frame.shape[1]
+    level = f"  Quality: {quality.level}" if quality is not None else ""
+    print(f"FPS: {fps:.2f}  Dropped: {cap.dropped}  Pixels: {pixels}{level}  ", end='\r')
+    timer.tick()
+
+    if not running:
         break
 
 cap.release()
-cv2.destroyAllWindows()
+display.close()
+detector.close()
+if DEBUG_ALLOC:
+    print(pool.report())
+print("\n" + timer.format())
+if LATENCY_DUMP is not None:
+    timer.dump(LATENCY_DUMP)
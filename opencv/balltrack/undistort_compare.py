@@ -0,0 +1,117 @@
+import time
+
+import cv2
+import numpy as np
+
+from undistort_map import UndistortMap
+
+# 歪み補正の2方式を比較する
+#   フレーム方式: 生フレームを remap してから検出
+#   点方式      : 生フレームで検出し、検出座標だけ undistortPoints で補正
+# 生画像に格子状の点を描き、remap 後の重心と点方式の補正座標のずれを測る
+
+# ---------- 比較するカメラ（ボール用 / AprilTag用） ----------
+CAMERAS = {
+    "ball (ball_distance.py)": (
+        np.array([[750.10059546, 0.0, 704.54913907],
+                  [0.0, 746.54075486, 445.7714058],
+                  [0.0, 0.0, 1.0]]),
+        np.array([0.04739503, -0.07422041, 0.00880341, 0.0123376, 0.02295108]),
+    ),
+    "tag (tag_dis.py)": (
+        np.array([[1194.08741, 0.0, 602.932566],
+                  [0.0, 1206.03102, 325.538922],
+                  [0.0, 0.0, 1.0]]),
+        np.array([0.04022942, 0.32673529, -0.00922231, -0.01283776, -0.89408179]),
+    ),
+}
+
+SIZE = (1280, 720)
+GRID_STEP = 40      # 点の間隔 [px]
+DOT_RADIUS = 3      # 点の半径 [px]
+MARGIN = 20         # 画像端の余白 [px]
+REPEAT = 100        # 計測の繰り返し回数
+CONTOUR_POINTS = 120  # 点方式で1フレームに補正する点数（ボール輪郭＋タグ4隅程度）
+
+
+# 生画像上の格子点（サブピクセル位置にずらす）
+def make_grid(size):
+    xs = np.arange(MARGIN, size[0] - MARGIN, GRID_STEP) + 0.37
+    ys = np.arange(MARGIN, size[1] - MARGIN, GRID_STEP) + 0.61
+    gx, gy = np.meshgrid(xs, ys)
+    return np.stack([gx.ravel(), gy.ravel()], axis=1).astype(np.float32)
+
+
+# 点を描いた生画像（サブピクセル精度で描画）
+def draw_dots(points, size):
+    img = np.zeros((size[1], size[0]), dtype=np.uint8)
+    for x, y in points:
+        cv2.circle(img, (int(round(x * 16)), int(round(y * 16))), DOT_RADIUS * 16,
+                   255, -1, cv2.LINE_AA, shift=4)
+    return img
+
+
+# 画像中の各点の輝度重心
+def dot_centroids(img):
+    n, labels = cv2.connectedComponents((img > 0).astype(np.uint8))
+    w = img.astype(np.float64).ravel()
+    lab = labels.ravel()
+    ys, xs = np.indices(img.shape)
+    m00 = np.bincount(lab, weights=w, minlength=n)
+    m10 = np.bincount(lab, weights=w * xs.ravel(), minlength=n)
+    m01 = np.bincount(lab, weights=w * ys.ravel(), minlength=n)
+    valid = m00[1:] > 0
+    return np.stack([m10[1:][valid] / m00[1:][valid], m01[1:][valid] / m00[1:][valid]], axis=1)
+
+
+def compare(name, camera_matrix, dist_coeffs):
+    um = UndistortMap(camera_matrix, dist_coeffs, SIZE, cache_dir=None)
+    raw = make_grid(SIZE)
+
+    # フレーム方式: remap 後の重心
+    undistorted_img = um.undistort(draw_dots(raw, SIZE))
+    centroids = dot_centroids(undistorted_img)
+
+    # 点方式: 座標のみ補正
+    corrected = um.undistort_points(raw)
+
+    # 補正後の点が画像内に十分収まるものだけ対応付け
+    inside = ((corrected[:, 0] > DOT_RADIUS * 2) & (corrected[:, 0] < SIZE[0] - DOT_RADIUS * 2) &
+              (corrected[:, 1] > DOT_RADIUS * 2) & (corrected[:, 1] < SIZE[1] - DOT_RADIUS * 2))
+    errors = []
+    for p in corrected[inside]:
+        d = np.linalg.norm(centroids - p, axis=1)
+        i = np.argmin(d)
+        if d[i] < GRID_STEP / 2:
+            errors.append(d[i])
+    errors = np.array(errors)
+
+    # 1フレームあたりの処理時間
+    frame = np.random.randint(0, 256, (SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    out = np.empty_like(frame)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        um.undistort(frame, out=out)
+    t_frame = (time.perf_counter() - start) / REPEAT * 1000
+
+    pts = raw[np.random.choice(len(raw), CONTOUR_POINTS)]
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        um.undistort_points(pts)
+    t_points = (time.perf_counter() - start) / REPEAT * 1000
+
+    print(f"=== {name} ===")
+    print(f"対応点数       : {len(errors)} / {len(raw)}")
+    print(f"位置誤差 平均  : {errors.mean():.3f} px")
+    print(f"位置誤差 95%   : {np.percentile(errors, 95):.3f} px")
+    print(f"位置誤差 最大  : {errors.max():.3f} px")
+    print(f"判定           : {'OK (1px未満)' if errors.max() < 1.0 else 'NG (1px以上)'}")
+    print(f"フレーム方式   : {t_frame:.3f} ms/フレーム (remap {SIZE[0]}x{SIZE[1]})")
+    print(f"点方式         : {t_points:.3f} ms/フレーム ({CONTOUR_POINTS}点)")
+    print(f"速度比         : {t_frame / t_points:.1f} 倍")
+    print()
+
+
+if __name__ == "__main__":
+    for name, (camera_matrix, dist_coeffs) in CAMERAS.items():
+        compare(name, camera_matrix, dist_coeffs)
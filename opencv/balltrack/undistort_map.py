@@ -0,0 +1,103 @@
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+# 歪み補正テーブルのキャッシュ先（このファイルと同じフォルダ）
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".undistort_cache")
+
+# 点の歪み補正の反復条件（既定の5回では画像端で誤差が残るため）
+POINT_CRITERIA = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 20, 1e-4)
+
+
+# 入力パラメータからキャッシュキーを作る
+def map_key(camera_matrix, dist_coeffs, size, alpha):
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(camera_matrix, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(dist_coeffs, dtype=np.float64).ravel().tobytes())
+    h.update(np.array(size, dtype=np.int64).tobytes())
+    h.update(repr(alpha).encode())
+    return h.hexdigest()
+
+
+# -----------------------------
+# 歪み補正クラス
+# initUndistortRectifyMap のテーブルを一度だけ作り、毎フレーム remap で補正する
+# alpha=None のときは cv2.undistort(frame, K, D) と同じ結果（新カメラ行列 = K）
+# -----------------------------
+class UndistortMap:
+    def __init__(self, camera_matrix, dist_coeffs, size, alpha=None, cache_dir=CACHE_DIR):
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64)
+        self.size = (int(size[0]), int(size[1]))  # (w, h)
+        self.alpha = alpha
+
+        if alpha is None:
+            self.new_camera_matrix = self.camera_matrix.copy()
+            self.roi = (0, 0, self.size[0], self.size[1])
+        else:
+            self.new_camera_matrix, self.roi = cv2.getOptimalNewCameraMatrix(
+                self.camera_matrix, self.dist_coeffs, self.size, alpha, self.size)
+
+        self.key = map_key(self.camera_matrix, self.dist_coeffs, self.size, alpha)
+        self.map1, self.map2 = self._load_or_build(cache_dir)
+
+    def _load_or_build(self, cache_dir):
+        path = None
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, f"{self.key}.npz")
+            if os.path.exists(path):
+                try:
+                    data = np.load(path)
+                    return data["map1"], data["map2"]
+                except (OSError, KeyError, ValueError):
+                    pass  # 壊れたキャッシュは作り直す
+
+        # 固定小数点形式（CV_16SC2 + 補間テーブル）で作成
+        map1, map2 = cv2.initUndistortRectifyMap(
+            self.camera_matrix, self.dist_coeffs, None,
+            self.new_camera_matrix, self.size, cv2.CV_16SC2)
+
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = path + ".tmp.npz"
+            np.savez(tmp, map1=map1, map2=map2)
+            os.replace(tmp, path)
+        return map1, map2
+
+    # フレーム全体の歪み補正（out を渡すと再確保しない）
+    def undistort(self, frame, out=None):
+        h, w = frame.shape[:2]
+        if (w, h) != self.size:
+            raise ValueError(f"フレームサイズ {(w, h)} が補正テーブル {self.size} と一致しません")
+        return cv2.remap(frame, self.map1, self.map2, cv2.INTER_LINEAR, dst=out)
+
+    # 検出座標のみの歪み補正（生フレーム上の点 → 補正後画像の座標）
+    # 点群はまとめて1回の undistortPoints で補正する
+    def undistort_points(self, points):
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)
+        if len(pts) == 0:
+            return pts.reshape(0, 2)
+        out = cv2.undistortPointsIter(pts, self.camera_matrix, self.dist_coeffs, None,
+                                      self.new_camera_matrix, POINT_CRITERIA)
+        return out.reshape(-1, 2)
+
+    # 複数の輪郭を1回の呼び出しで補正し、輪郭ごとに分割して返す
+    def undistort_contours(self, contours):
+        if len(contours) == 0:
+            return []
+        lengths = [len(c) for c in contours]
+        pts = self.undistort_points(np.concatenate([c.reshape(-1, 2) for c in contours]))
+        return np.split(pts, np.cumsum(lengths)[:-1])
+
+
+# 同じパラメータのテーブルはプロセス内で使い回す
+_maps = {}
+
+
+def get_undistort_map(camera_matrix, dist_coeffs, size, alpha=None, cache_dir=CACHE_DIR):
+    key = map_key(camera_matrix, dist_coeffs, size, alpha)
+    if key not in _maps:
+        _maps[key] = UndistortMap(camera_matrix, dist_coeffs, size, alpha, cache_dir)
+    return _maps[key]
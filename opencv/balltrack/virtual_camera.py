@@ -0,0 +1,261 @@
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from yuyv import YuyvReplay, yuyv_to_bgr
+
+# カメラの代わりにファイルや合成画像からフレームを読む（カメラなしでの計測・デバッグ用）
+# open_capture() / FrameSource の device に次を渡すと、このクラスで開く
+#   動画ファイル                 : "run1.mp4" など（cv2.VideoCapture で読む）
+#   画像フォルダ                 : ファイル名順に読む
+#   録画ファイル                 : yuyv_record.py の出力（同じ名前の .json があるもの）
+#   scene_generator.py の出力    : frames.npy のあるフォルダ、または .npy ファイル
+#   "synthetic" / "synthetic:種" : SceneGenerator でその場で生成（ボールは等速で動く）
+# カメラ番号（0, 4, "4"）と "/dev/videoN" は従来どおり cv2.VideoCapture で開く
+#
+# 再生の速さ（pacing）
+#   "realtime" : fps（指定がなければファイルの fps、なければ 30）で進む（カメラと同じく、
+#                処理が間に合わなかったフレームは飛ばし、早すぎるときは次のフレームまで待つ）
+#   "fast"     : 待たずに次のフレームを返す（処理時間の計測用）
+#   "step"     : step() を呼ぶまで同じフレームを返す（1フレームずつ確認する用、step_key() 参照）
+
+PACINGS = ("realtime", "fast", "step")
+DEFAULT_FPS = 30.0
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+# device がカメラ以外（ファイル・フォルダ・合成）を指すか
+def is_virtual(device):
+    if isinstance(device, (int, np.integer)):
+        return False
+    device = str(device)
+    return not (device.isdigit() or device.startswith("/dev/video"))
+
+
+# ---------- フレームの読み出し元 ----------
+# どれも frame(i) で i 番目の画像を返す（範囲外は None）、count は枚数（不明・無限なら None）
+
+class _ImageFolder:
+    def __init__(self, path):
+        self.paths = sorted(p for p in glob.glob(os.path.join(path, "*")) if p.lower().endswith(IMAGE_EXTS))
+        self.count = len(self.paths)
+        self.fps = None
+
+    def frame(self, i):
+        return cv2.imread(self.paths[i]) if i < len(self.paths) else None
+
+
+class _Array:
+    def __init__(self, path):
+        self.frames = np.load(path, mmap_mode="r")
+        self.count = len(self.frames)
+        self.fps = None
+
+    def frame(self, i):
+        return self.frames[i] if i < len(self.frames) else None
+
+
+# 録画した YUYV（生データのまま返す、BGR への変換は VirtualCamera が行う）
+class _Yuyv:
+    def __init__(self, path):
+        self.replay = YuyvReplay(path)
+        self.count = len(self.replay)
+        self.fps = None
+
+    def frame(self, i):
+        return self.replay.frames[i] if i < self.count else None
+
+
+# 動画ファイル（少し先までは grab() で読み飛ばし、戻るときと大きく飛ぶときだけシークする）
+class _Video:
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.count = count if count > 0 else None
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps > 0 else None
+        self.pos = 0
+        self.last = None
+
+    def frame(self, i):
+        if i == self.pos - 1:
+            return self.last
+        if self.pos < i <= self.pos + 30:
+            for _ in range(i - self.pos):
+                self.cap.grab()
+        elif i != self.pos:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+        ret, img = self.cap.read()
+        self.pos = i + 1
+        self.last = img if ret else None
+        return self.last
+
+
+# SceneGenerator で生成（前に戻ることはできないので、直前のフレームを返す）
+# 飛ばしたフレームは生成しない（ボールは生成した1枚ごとに1フレーム分動く）
+class _Synthetic:
+    def __init__(self, size, seed):
+        from scene_generator import SceneGenerator
+        self.generator = SceneGenerator(size=size, motion="track", seed=seed)
+        self.count = None
+        self.fps = None
+        self.pos = -1
+        self.last = None
+        self.labels = None  # 直前のフレームの正解ラベル（scene_generator.LABEL_DTYPE）
+
+    def frame(self, i):
+        if i > self.pos:
+            self.last, self.labels = self.generator.render(out=self.last)
+            self.pos = i
+        return self.last
+
+
+def _open_reader(device, width, height):
+    if device == "synthetic" or device.startswith("synthetic:"):
+        seed = int(device.split(":", 1)[1]) if ":" in device else 0
+        return _Synthetic((width or 1280, height or 720), seed)
+    if os.path.isdir(device):
+        if os.path.isfile(os.path.join(device, "frames.npy")):
+            return _Array(os.path.join(device, "frames.npy"))
+        return _ImageFolder(device)
+    if device.endswith(".npy"):
+        return _Array(device)
+    if os.path.isfile(device + ".json"):
+        return _Yuyv(device)
+    return _Video(device)
+
+
+# -----------------------------
+# 仮想カメラ（cv2.VideoCapture と同じ read() / isOpened() / release() / get() / set()）
+# 解像度・fps・形式の set() はカメラと違って効かない（生成・変換はしない）ので、
+# 幅・高さは開くときに指定する（"synthetic" の解像度になる）
+# convert_rgb=False なら YUYV の生データを返す（録画ファイルはそのまま、それ以外は BGR から変換）
+# loop=True なら最後まで読んだら先頭に戻る
+# -----------------------------
+class VirtualCamera:
+    def __init__(self, device, width=None, height=None, fps=None, pacing="realtime", loop=False,
+                 convert_rgb=True):
+        if pacing not in PACINGS:
+            raise ValueError(f"未対応の再生方法です: {pacing}")
+        self.device = str(device)
+        self.reader = _open_reader(self.device, width, height)
+        self.fps = fps or self.reader.fps or DEFAULT_FPS
+        self.pacing = pacing
+        self.loop = loop
+        self.convert_rgb = convert_rgb
+        self.pos = 0         # 次に返すフレーム番号
+        self.current = None  # step モードで返しているフレーム番号
+        self._start = None   # realtime で pos 番目のフレームが来る時刻 = _start + pos / fps
+        self._opened = self.reader.count != 0
+        # 幅・高さは最初のフレームで決めておく（get() で読み出し元を触ると、FrameSource の
+        # スレッドが read() しているのと競合する）
+        first = self.reader.frame(0) if self._opened else None
+        if first is None:
+            self.width = self.height = 0
+        else:
+            self.height, self.width = first.shape[:2]
+            if not convert_rgb and not (first.ndim == 3 and first.shape[2] == 2):
+                self.width -= self.width % 2  # _bgr_to_yuyv で偶数に切り詰める
+
+    def isOpened(self):
+        return self._opened
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.reader.count or 0)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.pos)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.pos = self.current = max(0, int(value))
+            self._start = None
+            return True
+        return False
+
+    # step モードで n フレーム進める（負なら戻る、"synthetic" は戻れず直前のフレームのまま）
+    def step(self, n=1):
+        self.current = max(0, (self.pos if self.current is None else self.current) + n)
+
+    # realtime で次に返すフレーム番号（早すぎれば待ち、遅れていれば飛ばす）
+    def _realtime_index(self):
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now - self.pos / self.fps
+        due = self._start + self.pos / self.fps
+        if due > now:
+            time.sleep(due - now)
+            return self.pos
+        return max(self.pos, int((now - self._start) * self.fps))
+
+    def read(self, image=None):
+        if not self._opened:
+            return False, None
+        if self.pacing == "realtime":
+            i = self._realtime_index()
+        elif self.pacing == "step":
+            time.sleep(1.0 / self.fps)  # 待たないと FrameSource のスレッドが空回りする
+            if self.current is None:
+                self.current = self.pos
+            i = self.current
+        else:
+            i = self.pos
+        if self.loop and self.reader.count and i >= self.reader.count:
+            i %= self.reader.count
+            self._start = time.monotonic() - i / self.fps
+        img = self.reader.frame(i)
+        if img is None:
+            return False, None
+        self.pos = i + 1 if self.pacing != "step" else i
+
+        if img.ndim == 3 and img.shape[2] == 2:   # 録画した YUYV
+            if self.convert_rgb:
+                img = yuyv_to_bgr(img)
+        elif not self.convert_rgb:
+            img = _bgr_to_yuyv(img)
+
+        if image is not None and image.shape == img.shape and image.dtype == img.dtype:
+            np.copyto(image, img)
+            return True, image
+        return True, np.array(img)  # 読み出し元のバッファ・メモリマップを返さない
+
+    def release(self):
+        if isinstance(self.reader, _Video):
+            self.reader.cap.release()
+        self._opened = False
+
+
+# BGR → YUYV（(h, w, 2)、U・V は横2画素の平均）
+def _bgr_to_yuyv(bgr):
+    yuv = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV)
+    h, w = yuv.shape[:2]
+    w -= w % 2
+    out = np.empty((h, w, 2), dtype=np.uint8)
+    out[..., 0] = yuv[:, :w, 0]
+    uv = yuv[:, :w, 1:].reshape(h, w // 2, 2, 2).mean(axis=2, dtype=np.float32) + 0.5
+    out[:, 0::2, 1] = uv[..., 0]
+    out[:, 1::2, 1] = uv[..., 1]
+    return out
+
+
+# waitKey の結果で step モードを操作する（"n" / スペース: 次へ, "b": 前へ）
+# cap は VirtualCamera、またはそれを .cap に持つ FrameSource（それ以外は何もしない）
+def step_key(cap, key):
+    cam = getattr(cap, "cap", cap)
+    if not isinstance(cam, VirtualCamera) or cam.pacing != "step":
+        return
+    key &= 0xFF
+    if key in (ord("n"), ord(" ")):
+        cam.step(1)
+    elif key == ord("b"):
+        cam.step(-1)
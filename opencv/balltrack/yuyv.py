@@ -0,0 +1,115 @@
+import json
+
+import cv2
+import numpy as np
+
+# -----------------------------
+# カメラの YUYV（YUY2）フレームをそのまま使うための関数
+# open_capture(..., fourcc="YUYV", convert_rgb=False) で開くと、VideoCapture は BGR に変換せず
+# カメラの生データを返す（バックエンドによって (1, h*w*2) や (h, w, 2) の形になる）
+# (h, w, 2) にそろえると横2画素ごとに Y0 U Y1 V の並びで
+#   [..., 0] : 輝度 Y（AprilTag にそのまま渡せるグレー画像）
+#   [..., 1] : U, V の交互（偶数列が U、奇数列が V）
+# 色の分類は ColorClassifier(color_ranges, space="yuyv") で HSV の範囲のまま行う
+# -----------------------------
+
+
+# 生フレームを (h, w, 2) のビューにする（コピーしない）
+def as_yuyv(raw, width):
+    raw = np.asarray(raw)
+    if raw.ndim == 3 and raw.shape[2] == 2:
+        return raw
+    if raw.size % (2 * width) != 0:
+        raise ValueError(f"YUYV のフレームではありません: {raw.shape}（幅 {width}）")
+    return raw.reshape(-1, width, 2)
+
+
+# 輝度（Y）のビュー（コピーしない、列方向は2バイト飛び）
+def y_plane(yuyv):
+    return yuyv[..., 0]
+
+
+# 表示用に BGR へ変換する
+def yuyv_to_bgr(yuyv, out=None):
+    return cv2.cvtColor(yuyv, cv2.COLOR_YUV2BGR_YUYV, dst=out)
+
+
+# メディアンブラー（Y0 U Y1 V を4チャンネルとみなしてチャンネルごとに処理）
+# 横方向は2画素単位なので、BGR の ksize より横に2倍広い範囲を見ることになる
+def blur_yuyv(yuyv, ksize, out=None):
+    h, w = yuyv.shape[:2]
+    if out is None:
+        out = np.empty((h, w, 2), dtype=np.uint8)
+    cv2.medianBlur(yuyv.reshape(h, w // 2, 4), ksize, dst=out.reshape(h, w // 2, 4))
+    return out
+
+
+# 縮小（横2画素の組を崩さないよう4チャンネルのまま縮小、幅は偶数になる）
+def resize_yuyv(yuyv, size, out=None, interpolation=cv2.INTER_AREA):
+    h, w = yuyv.shape[:2]
+    half = max(1, size[0] // 2)
+    if out is None:
+        out = np.empty((size[1], half * 2, 2), dtype=np.uint8)
+    cv2.resize(yuyv.reshape(h, w // 2, 4), (half, size[1]), dst=out.reshape(size[1], half, 4),
+               interpolation=interpolation)
+    return out
+
+
+# -----------------------------
+# YUYV の録画（生データをそのままファイルに追記）
+# 画像の大きさとフレーム数は path + ".json" に保存する
+# -----------------------------
+class YuyvRecorder:
+    def __init__(self, path, width, height):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.count = 0
+        self._file = open(path, "wb")
+
+    def write(self, yuyv):
+        yuyv = as_yuyv(yuyv, self.width)
+        if yuyv.shape[:2] != (self.height, self.width):
+            raise ValueError(f"フレームの大きさが違います: {yuyv.shape[:2]}")
+        self._file.write(memoryview(np.ascontiguousarray(yuyv)).cast("B"))
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        with open(self.path + ".json", "w") as f:
+            json.dump({"width": self.width, "height": self.height, "frames": self.count, "format": "YUYV"}, f)
+
+
+# -----------------------------
+# 録画した YUYV の再生（cv2.VideoCapture と同じ read() / isOpened() / release()）
+# ファイルはメモリマップで開き、read() は (h, w, 2) の読み取り専用ビューを返す
+# loop=True なら最後まで読んだら先頭に戻る
+# -----------------------------
+class YuyvReplay:
+    def __init__(self, path, loop=False):
+        with open(path + ".json") as f:
+            info = json.load(f)
+        self.width = info["width"]
+        self.height = info["height"]
+        self.frames = np.memmap(path, dtype=np.uint8, mode="r").reshape(-1, self.height, self.width, 2)
+        self.loop = loop
+        self.pos = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def isOpened(self):
+        return self.frames is not None and len(self.frames) > 0
+
+    def read(self, image=None):
+        if self.frames is None or (self.pos >= len(self.frames) and not self.loop):
+            return False, None
+        frame = self.frames[self.pos % len(self.frames)]
+        self.pos += 1
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def release(self):
+        self.frames = None
@@ -0,0 +1,103 @@
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from color_lut import RANGES_PATH, ColorClassifier, shared_color_ranges
+from frame_source import open_capture
+from yuyv import YuyvRecorder, YuyvReplay, as_yuyv, y_plane, yuyv_to_bgr
+
+# YUYV の録画と、録画したフレームでの YUYV 分類の確認
+# 使い方:
+#   python yuyv_record.py record 保存先 [フレーム数]   カメラの YUYV をそのまま録画
+#   python yuyv_record.py check 保存先                 録画を読み、BGR → HSV の分類と比較
+# check では、従来の経路（YUYV → BGR → HSV → 分類）と YUYV を直接分類した結果の一致率と、
+# Y と BGR → グレー変換の差、それぞれの処理時間を表示する
+
+DEVICE = 0
+WIDTH, HEIGHT, FPS = 1280, 720, 15
+NUM_FRAMES = 100
+
+# HSV色範囲（tracking_one.py と同じ）
+color_ranges = {
+    "red": (np.array([165, 105, 115]), np.array([175, 250, 255])),
+    "blue": (np.array([90, 90, 100]), np.array([120, 225, 255])),
+    "yellow": (np.array([10, 70, 140]), np.array([40, 135, 255]))
+}
+
+# トラッカーと同じく、共通の色範囲ファイルがあればその色を優先する（None なら使わない）
+COLOR_RANGES_FILE = RANGES_PATH
+color_ranges = shared_color_ranges(color_ranges, COLOR_RANGES_FILE)
+
+
+def record(path, num_frames):
+    cap = open_capture(DEVICE, WIDTH, HEIGHT, FPS, fourcc="YUYV", convert_rgb=False)
+    if not cap.isOpened():
+        print(f"カメラ {DEVICE} を開けませんでした")
+        return
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    recorder = YuyvRecorder(path, width, height)
+    try:
+        while recorder.count < num_frames:
+            ret, raw = cap.read()
+            if not ret:
+                print("フレーム取得に失敗")
+                break
+            recorder.write(as_yuyv(raw, width))
+            print(f"{recorder.count}/{num_frames}", end="\r")
+    finally:
+        recorder.close()
+        cap.release()
+    print(f"\n{path}: {recorder.count} フレーム（{width}x{height}）")
+
+
+def check(path):
+    replay = YuyvReplay(path)
+    hsv_classifier = ColorClassifier(color_ranges, space="hsv")
+    yuyv_classifier = ColorClassifier(color_ranges, space="yuyv")
+    names = hsv_classifier.names
+    print(f"フレーム数: {len(replay)}  解像度: {replay.width}x{replay.height}")
+
+    t_bgr, t_yuyv, agree, gray_diff = [], [], [], []
+    hits = np.zeros((2, len(names)), dtype=np.int64)
+    while True:
+        ret, frame = replay.read()
+        if not ret:
+            break
+        t0 = time.perf_counter()
+        bgr = yuyv_to_bgr(frame)
+        ref = hsv_classifier.classify(cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV))
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        t1 = time.perf_counter()
+        labels = yuyv_classifier.classify(frame)
+        y = y_plane(frame)
+        t2 = time.perf_counter()
+
+        t_bgr.append((t1 - t0) * 1000)
+        t_yuyv.append((t2 - t1) * 1000)
+        agree.append(np.count_nonzero(labels == ref) / labels.size)
+        gray_diff.append(float(np.mean(cv2.absdiff(np.ascontiguousarray(y), gray))))
+        for i in range(len(names)):
+            hits[0, i] += np.count_nonzero(ref == i + 1)
+            hits[1, i] += np.count_nonzero(labels == i + 1)
+
+    if not t_bgr:
+        return
+    print(f"BGR → HSV → 分類: {np.median(t_bgr):7.2f} ms/フレーム")
+    print(f"YUYV 直接分類    : {np.median(t_yuyv):7.2f} ms/フレーム")
+    print(f"ラベル一致率: 平均 {np.mean(agree) * 100:.2f} %  最小 {np.min(agree) * 100:.2f} %")
+    print(f"Y とグレー画像の差: 平均 {np.mean(gray_diff):.2f}")
+    for i, name in enumerate(names):
+        print(f"  {name:<8} 画素数 HSV {hits[0, i]:>10}  YUYV {hits[1, i]:>10}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("record", "check"):
+        print("使い方: python yuyv_record.py record|check 保存先 [フレーム数]")
+        sys.exit(1)
+    if sys.argv[1] == "record":
+        record(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else NUM_FRAMES)
+    else:
+        check(sys.argv[2])